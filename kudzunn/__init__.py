@@ -2,6 +2,8 @@
 
 """Top-level package for KudzuNN."""
 
+import importlib
+
 __author__ = "Rahul Dave"
 __email__ = "rahuldave@gmail.com"
 # Do not edit this string manually, always use bumpversion
@@ -13,4 +15,80 @@ def get_module_version():
     return __version__
 
 
-from .example import Example  # noqa: F401
+# Public names and the submodule that defines them. Submodules are only
+# imported on first attribute access, so `import kudzunn` stays cheap for
+# short-lived scripts that need one piece of the package.
+_LAZY = {
+    "Example": "kudzunn.example",
+    "Function": "kudzunn.function",
+    "ZeroBiasAffine": "kudzunn.function",
+    "Linear": "kudzunn.function",
+    "Embedding": "kudzunn.function",
+    "Sequential": "kudzunn.function",
+    "Activation": "kudzunn.function",
+    "ReLU": "kudzunn.function",
+    "LeakyReLU": "kudzunn.function",
+    "Sigmoid": "kudzunn.function",
+    "Tanh": "kudzunn.function",
+    "GELU": "kudzunn.function",
+    "Softmax": "kudzunn.function",
+    "Loss": "kudzunn.loss",
+    "PointwiseLoss": "kudzunn.loss",
+    "MSE": "kudzunn.loss",
+    "MAE": "kudzunn.loss",
+    "Huber": "kudzunn.loss",
+    "LogCosh": "kudzunn.loss",
+    "BinaryCrossEntropy": "kudzunn.loss",
+    "SoftmaxCrossEntropy": "kudzunn.loss",
+    "Optimizer": "kudzunn.optim",
+    "GD": "kudzunn.optim",
+    "LBFGS": "kudzunn.optim",
+    "Adam": "kudzunn.optim",
+    "Learner": "kudzunn.train",
+    "Callback": "kudzunn.callbacks",
+    "AccCallback": "kudzunn.callbacks",
+    "ScheduleCallback": "kudzunn.callbacks",
+    "EarlyStoppingCallback": "kudzunn.callbacks",
+    "MetricsCallback": "kudzunn.metrics",
+    "Metric": "kudzunn.metrics",
+    "MeanSquaredError": "kudzunn.metrics",
+    "MeanAbsoluteError": "kudzunn.metrics",
+    "R2Score": "kudzunn.metrics",
+    "AUC": "kudzunn.metrics",
+    "MemoryCallback": "kudzunn.callbacks",
+    "TelemetryCallback": "kudzunn.telemetry",
+    "Data": "kudzunn.data",
+    "Sampler": "kudzunn.data",
+    "WeightedSampler": "kudzunn.data",
+    "StratifiedSampler": "kudzunn.data",
+    "BucketSampler": "kudzunn.data",
+    "Dataloader": "kudzunn.data",
+    "BatchCache": "kudzunn.cache",
+    "SampleCache": "kudzunn.cache",
+    "Normalizer": "kudzunn.normalize",
+    "RunningStats": "kudzunn.normalize",
+    "CSVReader": "kudzunn.readers",
+    "ColumnarReader": "kudzunn.readers",
+    "StreamingDataloader": "kudzunn.readers",
+    "CSRMatrix": "kudzunn.sparse",
+    "SparseGrad": "kudzunn.sparse",
+    "set_backend": "kudzunn.backend",
+    "get_backend": "kudzunn.backend",
+    "get_namespace": "kudzunn.backend",
+    "save": "kudzunn.serialize",
+    "load": "kudzunn.serialize",
+}
+
+__all__ = ["get_module_version", *_LAZY]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
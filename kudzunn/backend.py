@@ -0,0 +1,107 @@
+import importlib
+from types import ModuleType
+from typing import Union
+import numpy as np
+
+# The namespace for arrays kudzunn creates itself, e.g. replicated
+# parameters. Functions given arrays use the namespace of those arrays.
+_BACKEND: ModuleType = np
+
+REQUIRED = ("asarray", "zeros", "zeros_like", "full", "sum", "mean", "tanh", "where")
+
+
+def set_backend(backend: Union[str, ModuleType]) -> ModuleType:
+    """
+    Choose the array library that kudzunn uses to create new arrays.
+
+    The namespace must follow the Python array API standard, e.g.
+    `array_api_strict`; NumPy is the default. Only some components have
+    portable code paths: `ZeroBiasAffine`, `ReLU`, `Sigmoid`, `Tanh`,
+    `Sequential` of those, the `MSE` loss and the `GD` optimizer (without
+    sparse gradients). The other functions, losses and optimizers, and
+    `Data`, raise `TypeError` on arrays of another library (see
+    `require_numpy`). Callbacks reducing losses, like `AccCallback` and
+    `EarlyStoppingCallback`, use NumPy and need losses it can convert.
+
+    Parameters
+    ----------
+    backend: str or module
+        The namespace, or the name of a module to import
+
+    Returns
+    -------
+    previous: module
+        The namespace used until now, to restore it later
+    """
+    global _BACKEND
+    if isinstance(backend, str):
+        backend = importlib.import_module(backend)
+    missing = [name for name in REQUIRED if not hasattr(backend, name)]
+    if missing:
+        raise ValueError(f"{backend.__name__} lacks {', '.join(missing)}")
+    previous, _BACKEND = _BACKEND, backend
+    return previous
+
+
+def get_backend() -> ModuleType:
+    "The namespace set by `set_backend`"
+    return _BACKEND
+
+
+def get_namespace(*arrays) -> ModuleType:
+    """
+    The array namespace of some arrays, in the style of the array API
+    standard's `__array_namespace__`. Python scalars have none, so if no
+    argument is an array the backend from `set_backend` is returned.
+
+    Returns
+    -------
+    xp: module
+        The namespace, `numpy` for NumPy arrays
+
+    Raises
+    ------
+    ValueError
+        If the arrays come from different libraries
+    """
+    found = None
+    for arr in arrays:
+        if isinstance(arr, (np.ndarray, np.generic)):
+            xp = np
+        elif hasattr(arr, "__array_namespace__"):
+            xp = arr.__array_namespace__()
+        else:
+            continue
+        if found is not None and xp is not found:
+            raise ValueError(f"Mixed array namespaces {found.__name__}, {xp.__name__}")
+        found = xp
+    return _BACKEND if found is None else found
+
+
+def require_numpy(what: str, *arrays) -> None:
+    """
+    Guard for components without a portable code path.
+
+    Parameters
+    ----------
+    what: str
+        The component, for the message
+    arrays:
+        The arrays it was given; Python scalars and other objects pass
+
+    Raises
+    ------
+    TypeError
+        If an array comes from another library than NumPy
+    """
+    xp = get_namespace(*arrays)
+    if any(hasattr(arr, "__array_namespace__") for arr in arrays) and not is_numpy(xp):
+        raise TypeError(f"{what} only supports NumPy arrays, not {xp.__name__}")
+
+
+def is_numpy(xp: ModuleType) -> bool:
+    """
+    Whether `xp` is NumPy itself, whose `out=` arguments and in-place
+    ufuncs the fast paths use. Other namespaces take the portable path.
+    """
+    return xp is np
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time the fused ZeroBiasAffine + MSE + GD training step against the usual
+one at several batch sizes. Installed as the `kudzunn-bench-fused` console
+script.
+"""
+
+import argparse
+import logging
+import sys
+import time
+import traceback
+
+from kudzunn import get_module_version
+
+###############################################################################
+
+log = logging.getLogger()
+logging.basicConfig(
+    level=logging.INFO, format="[%(levelname)4s:%(lineno)4s %(asctime)s] %(message)s"
+)
+
+###############################################################################
+
+
+class Args(argparse.Namespace):
+
+    DEFAULT_BATCH_SIZES = [1, 8, 64, 512, 4096]
+    DEFAULT_SAMPLES = 2**15
+
+    def __init__(self):
+        # Arguments that could be passed in through the command line
+        self.batch_sizes = self.DEFAULT_BATCH_SIZES
+        self.samples = self.DEFAULT_SAMPLES
+        self.repeat = 3
+        self.debug = False
+        #
+        self.__parse()
+
+    def __parse(self):
+        p = argparse.ArgumentParser(
+            prog="kudzunn-bench-fused",
+            description="Benchmark the fused linear/MSE training step",
+        )
+
+        p.add_argument(
+            "-v",
+            "--version",
+            action="version",
+            version="%(prog)s " + get_module_version(),
+        )
+        p.add_argument(
+            "-b",
+            "--batch-sizes",
+            action="store",
+            dest="batch_sizes",
+            type=int,
+            nargs="+",
+            default=self.batch_sizes,
+            help="Batch sizes to time",
+        )
+        p.add_argument(
+            "-n",
+            "--samples",
+            action="store",
+            dest="samples",
+            type=int,
+            default=self.samples,
+            help="Samples per epoch",
+        )
+        p.add_argument(
+            "-r",
+            "--repeat",
+            action="store",
+            dest="repeat",
+            type=int,
+            default=self.repeat,
+            help="Timed epochs per setting; the best is reported",
+        )
+        p.add_argument(
+            "--debug",
+            action="store_true",
+            dest="debug",
+            help=argparse.SUPPRESS,
+        )
+        p.parse_args(namespace=self)
+
+
+###############################################################################
+
+
+class Batches:
+    "pre-cut batches, so the timing is of the training step alone"
+
+    def __init__(self, x, y, batch_size):
+        self.batches = [
+            (x[i : i + batch_size], y[i : i + batch_size])
+            for i in range(0, len(x), batch_size)
+        ]
+        self.current_batch = 0
+
+    def __iter__(self):
+        return iter(self.batches)
+
+
+def time_epoch(batches, fused, repeat):
+    "best time of one epoch, after a warm-up epoch (which compiles the kernel)"
+    from kudzunn.function import ZeroBiasAffine
+    from kudzunn.loss import MSE
+    from kudzunn.optim import GD
+    from kudzunn.train import Learner
+
+    learner = Learner(GD(0.01), MSE(), ZeroBiasAffine(winit=0.0), 1, fused=fused)
+    learner.train_loop(batches)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        learner.train_loop(batches)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    dbg = False
+    try:
+        args = Args()
+        dbg = args.debug
+
+        # Imported here so that --help and --version stay fast
+        import numpy as np
+        from kudzunn.fused import HAVE_NUMBA
+
+        rng = np.random.default_rng(0)
+        x = rng.standard_normal(args.samples)
+        y = 2.0 * x + 0.1 * rng.standard_normal(args.samples)
+        kernel = "numba" if HAVE_NUMBA else "numpy"
+        print(f"fused kernel: {kernel}, {args.samples} samples per epoch")
+        print(
+            f"{'batch':>8} {'usual us/batch':>15} {'fused us/batch':>15} {'speedup':>8}"
+        )
+        for bs in args.batch_sizes:
+            batches = Batches(x, y, bs)
+            n = len(batches.batches)
+            usual = time_epoch(batches, False, args.repeat) / n * 1e6
+            fused = time_epoch(batches, True, args.repeat) / n * 1e6
+            print(f"{bs:>8} {usual:>15.2f} {fused:>15.2f} {usual / fused:>7.2f}x")
+
+    except Exception as e:
+        log.error("=============================================")
+        if dbg:
+            log.error("\n\n" + traceback.format_exc())
+            log.error("=============================================")
+        log.error("\n\n" + str(e) + "\n")
+        log.error("=============================================")
+        sys.exit(1)
+
+
+###############################################################################
+# Allow caller to directly run this module (usually in development scenarios)
+
+if __name__ == "__main__":
+    main()
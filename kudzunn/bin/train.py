@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Train a model described by a TOML or JSON config file. Installed as the
+`kudzunn-train` console script.
+"""
+
+import argparse
+import logging
+import sys
+import traceback
+from pathlib import Path
+
+from kudzunn import get_module_version
+
+###############################################################################
+
+log = logging.getLogger()
+logging.basicConfig(
+    level=logging.INFO, format="[%(levelname)4s:%(lineno)4s %(asctime)s] %(message)s"
+)
+
+###############################################################################
+
+
+class Args(argparse.Namespace):
+    def __init__(self):
+        # Arguments that could be passed in through the command line
+        self.config = None
+        self.output = None
+        self.debug = False
+        #
+        self.__parse()
+
+    def __parse(self):
+        p = argparse.ArgumentParser(
+            prog="kudzunn-train",
+            description="Train a kudzunn model from a config file",
+        )
+
+        p.add_argument(
+            "-v",
+            "--version",
+            action="version",
+            version="%(prog)s " + get_module_version(),
+        )
+        p.add_argument(
+            "config",
+            help="A .toml or .json training config",
+        )
+        p.add_argument(
+            "-o",
+            "--output",
+            action="store",
+            dest="output",
+            default=self.output,
+            help="Save the trained model here (overrides output.model)",
+        )
+        p.add_argument(
+            "--debug",
+            action="store_true",
+            dest="debug",
+            help=argparse.SUPPRESS,
+        )
+        p.parse_args(namespace=self)
+
+
+###############################################################################
+
+
+def main():
+    dbg = False
+    try:
+        args = Args()
+        dbg = args.debug
+
+        # Imported here so that --help and --version stay fast
+        from kudzunn.config import build, load_config
+        from kudzunn.serialize import save
+
+        config = load_config(args.config)
+        learner, dl = build(config, root=Path(args.config).parent)
+        finalloss = learner.train_loop(dl)
+        log.info(f"Final loss {finalloss}")
+
+        output = args.output or config.get("output", {}).get("model")
+        if output:
+            save(learner.func, output)
+            log.info(f"Saved model to {output}")
+
+    except Exception as e:
+        log.error("=============================================")
+        if dbg:
+            log.error("\n\n" + traceback.format_exc())
+            log.error("=============================================")
+        log.error("\n\n" + str(e) + "\n")
+        log.error("=============================================")
+        sys.exit(1)
+
+
+###############################################################################
+# Allow caller to directly run this module (usually in development scenarios)
+
+if __name__ == "__main__":
+    main()
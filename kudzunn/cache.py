@@ -0,0 +1,269 @@
+import hashlib
+import os
+from collections import OrderedDict
+from types import CodeType
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import numpy as np
+from numpy import ndarray
+from kudzunn.sparse import CSRMatrix
+
+Batch = Tuple[ndarray, ndarray]
+
+
+def fingerprint(obj) -> str:
+    """
+    A digest of the contents of an array, a `CSRMatrix` or a `Data`-like
+    object with `x` and `y`, for cache keys.
+    """
+    h = hashlib.sha1()
+
+    def feed(arr) -> None:
+        if isinstance(arr, CSRMatrix):
+            for part in (arr.data, arr.indices, arr.indptr):
+                feed(part)
+            return
+        arr = np.asarray(arr)
+        h.update(f"{arr.dtype.str}{arr.shape}".encode())
+        h.update(np.ascontiguousarray(arr).data)
+
+    if hasattr(obj, "x") and hasattr(obj, "y"):
+        feed(obj.x)
+        feed(obj.y)
+    else:
+        feed(obj)
+    return h.hexdigest()
+
+
+def _code_key(code: CodeType) -> str:
+    "a digest of the bytecode, constants and names of a code object"
+    h = hashlib.sha1(code.co_code)
+    for const in code.co_consts:
+        h.update(
+            (_code_key(const) if isinstance(const, CodeType) else repr(const)).encode()
+        )
+    h.update(repr(code.co_names).encode())
+    return h.hexdigest()
+
+
+def _callable_key(t: Callable, seen: frozenset = frozenset()) -> str:
+    """
+    A key for a transform without `cache_key()`: its qualified name, and
+    for Python functions (or the `__call__` of a callable object) the
+    code, default arguments and closure contents.
+    """
+    kind = t if hasattr(t, "__qualname__") else type(t)
+    parts = [f"{kind.__module__}.{kind.__qualname__}"]
+    func = t if hasattr(t, "__code__") else getattr(type(t), "__call__", None)
+    if hasattr(func, "__code__") and id(func) not in seen:
+        seen = seen | {id(func)}
+        parts.append(_code_key(func.__code__))
+        values = list(func.__defaults__ or ())
+        for cell in func.__closure__ or ():
+            try:
+                values.append(cell.cell_contents)
+            except ValueError:  # a cell not bound yet
+                values.append(None)
+        for value in values:
+            if isinstance(value, (ndarray, CSRMatrix)):
+                parts.append(fingerprint(value))
+            elif callable(value):
+                parts.append(_callable_key(value, seen))
+            else:
+                parts.append(repr(value))
+    return "|".join(parts)
+
+
+def transform_key(transforms: Sequence[Callable]) -> str:
+    """
+    A key for a chain of transforms. A transform with state that changes
+    its output (like a fitted `Normalizer`) must provide a `cache_key()`
+    method; otherwise the key covers its name and, for Python functions
+    and lambdas, their code, defaults and closure contents, so that
+    different or edited functions do not share cached batches.
+    """
+    parts = []
+    for t in transforms:
+        if hasattr(t, "cache_key"):
+            parts.append(t.cache_key())
+        else:
+            parts.append(_callable_key(t))
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _frozen(arr: ndarray) -> ndarray:
+    "a private, read-only copy, safe from reused buffers and in-place layers"
+    arr = np.array(arr)
+    arr.flags.writeable = False
+    return arr
+
+
+class BatchCache:
+    """
+    Memoizes transformed batches, keyed by the data, the transforms and
+    the indexes of the batch. The most recently used batches are kept in
+    RAM up to `budget` bytes; older ones are spilled to `.npy` files in
+    `directory` and read back memory-mapped. Without a directory they are
+    dropped. The files are named by key, so they are reused by later runs
+    over the same data and transforms.
+
+    Batches only repeat when the sampler yields the same indexes every
+    epoch (no shuffling); use `SampleCache` with shuffling samplers.
+    Cached batches are read-only.
+
+    Parameters
+    ----------
+    budget: int
+        Bytes of batches to keep in RAM
+    directory: str
+        Where to spill batches beyond the budget
+    """
+
+    def __init__(self, budget: int = 2**28, directory: str = None) -> None:
+        self.budget = budget
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.ram: "OrderedDict[str, Batch]" = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return tuple(os.path.join(self.directory, f"{key}-{v}.npy") for v in "xy")
+
+    def _spill(self, key: str, batch: Batch) -> None:
+        if self.directory is not None:
+            for path, arr in zip(self._paths(key), batch):
+                np.save(path, arr)
+
+    def get(self, key: str) -> Optional[Batch]:
+        "The cached batch, or `None`"
+        if key in self.ram:
+            self.ram.move_to_end(key)
+            return self.ram[key]
+        if self.directory is not None:
+            xpath, ypath = self._paths(key)
+            if os.path.exists(ypath):
+                return np.load(xpath, mmap_mode="r"), np.load(ypath, mmap_mode="r")
+        return None
+
+    def put(self, key: str, batch: Batch) -> Batch:
+        "Cache a batch, evicting the least recently used ones beyond budget"
+        batch = tuple(_frozen(arr) for arr in batch)
+        self.ram[key] = batch
+        self.nbytes += sum(arr.nbytes for arr in batch)
+        while self.nbytes > self.budget and self.ram:
+            old, evicted = self.ram.popitem(last=False)
+            self.nbytes -= sum(arr.nbytes for arr in evicted)
+            self._spill(old, evicted)
+        return batch
+
+    def fetch(
+        self, prefix: str, rows: ndarray, n: int, compute: Callable[[], Batch]
+    ) -> Batch:
+        """
+        The batch of `rows`, from the cache or from `compute`.
+
+        Parameters
+        ----------
+        prefix: str
+            The key of the data and transforms
+        rows: ndarray
+            Indexes of the batch in the data
+        n: int
+            Length of the data (unused here, see `SampleCache`)
+        compute: Callable
+            Makes the transformed batch on a miss
+        """
+        h = hashlib.sha1(prefix.encode())
+        h.update(np.ascontiguousarray(rows, dtype=np.int64).data)
+        key = h.hexdigest()
+        batch = self.get(key)
+        if batch is not None:
+            self.hits += 1
+            return batch
+        self.misses += 1
+        return self.put(key, compute())
+
+
+class SampleCache:
+    """
+    Memoizes transformed samples: each computed batch is scattered into a
+    transformed copy of the dataset, and a batch whose rows are all done
+    is gathered from it. Works with shuffling samplers, but the transforms
+    must be row-wise (each output row depends only on its own input row),
+    like `Normalizer`.
+
+    The transformed copy lives in RAM if it fits in `budget` bytes and in
+    memory-mapped `.npy` files in `directory` otherwise. Those files,
+    together with the mask of rows done, are named by the key of the data
+    and transforms, so later runs pick up where earlier ones stopped.
+
+    Parameters
+    ----------
+    budget: int
+        Largest transformed dataset to keep in RAM
+    directory: str
+        Where to keep larger ones
+    """
+
+    def __init__(self, budget: int = 2**28, directory: str = None) -> None:
+        self.budget = budget
+        self.directory = directory
+        self.stores: Dict[str, Tuple[ndarray, ndarray, ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _allocate(self, prefix: str, n: int, batch: Batch):
+        specs = [((n,) + arr.shape[1:], arr.dtype) for arr in batch]
+        specs.append(((n,), np.dtype(bool)))
+        total = sum(int(np.prod(shape)) * dtype.itemsize for shape, dtype in specs)
+        if total <= self.budget:
+            return tuple(np.zeros(shape, dtype) for shape, dtype in specs)
+        if self.directory is None:
+            raise MemoryError(f"{total} bytes of samples exceed the budget")
+        os.makedirs(self.directory, exist_ok=True)
+        arrays = []
+        for name, (shape, dtype) in zip("xym", specs):
+            path = os.path.join(self.directory, f"{prefix}-{name}.npy")
+            if os.path.exists(path):
+                arrays.append(np.load(path, mmap_mode="r+"))
+            else:
+                arrays.append(np.lib.format.open_memmap(path, "w+", dtype, shape))
+        return tuple(arrays)
+
+    def fetch(
+        self, prefix: str, rows: ndarray, n: int, compute: Callable[[], Batch]
+    ) -> Batch:
+        """
+        The batch of `rows`, from the cache or from `compute`.
+
+        Parameters
+        ----------
+        prefix: str
+            The key of the data and transforms
+        rows: ndarray
+            Indexes of the batch in the data
+        n: int
+            Length of the data
+        compute: Callable
+            Makes the transformed batch on a miss
+        """
+        store = self.stores.get(prefix)
+        if store is not None and store[2][rows].all():
+            self.hits += 1
+            return store[0][rows], store[1][rows]
+        self.misses += 1
+        batch = compute()
+        if not all(isinstance(arr, ndarray) for arr in batch):
+            raise TypeError("SampleCache needs dense batches")
+        if store is None:
+            store = self.stores[prefix] = self._allocate(prefix, n, batch)
+        xs, ys, done = store
+        xs[rows], ys[rows] = batch
+        # copies, like a gather from the store: the batch may be a reused
+        # buffer
+        batch = xs[rows], ys[rows]
+        # marked last, so an interrupted run never trusts a partial row
+        done[rows] = True
+        return batch
@@ -1,7 +1,12 @@
 from collections import defaultdict
+import tracemalloc
+import warnings
 import numpy as np
-from kudzunn.train import Learner
-from typing import List, Dict
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    # Only for annotations: kudzunn.train imports this module at runtime.
+    from kudzunn.train import Learner
 
 
 class Callback:
@@ -10,14 +15,15 @@ class Callback:
     lifecycle of a training loop. In kudzunn, callbacks are instances of the
     class `Callback` and its derived classes. The methods of these classes
     are run at different times. Here we support callbacks at fit start and
-    end, batch start and end, epoch start and end, and finally, after the loss
-    is computed in each epoch. Callback methods must return `True` on proper
+    end, batch start and end, epoch start and end, after the loss is computed
+    in each batch, and finally after backpropagation, just before the
+    optimizer step. Callback methods must return `True` on proper
     completion: this is how we signal that the next callback can be run at
     that moment. The next callback will be the same method of another callback
     instance.
     """
 
-    def __init__(self, learner: Learner) -> None:
+    def __init__(self, learner: "Learner") -> None:
         self.learner = learner
 
     def fit_start(self) -> bool:
@@ -35,6 +41,9 @@ class Callback:
     def after_loss(self, loss: float) -> bool:
         return True
 
+    def after_backward(self) -> bool:
+        return True
+
     def batch_end(self) -> bool:
         return True
 
@@ -49,7 +58,7 @@ class AccCallback(Callback):
     training run.
     """
 
-    def __init__(self, learner: Learner) -> None:
+    def __init__(self, learner: "Learner") -> None:
         "Sets up history lists for each parameter, and for the losses"
         super().__init__(learner)
         self.losses: List[float] = []
@@ -88,7 +97,229 @@ class AccCallback(Callback):
             print(f"{name}, {fnval}, {grval}\n---")
             self.paramhist[name].append(fnval)
             self.gradhist[name].append(grval)
-        avloss = np.mean(self.batch_losses[-(self.batch_counter + 1) :])
+        avloss = np.mean(self.batch_losses[-(self.batch_counter + 1) :], axis=0)
         print(f"Epoch {self.epoch}:\nLoss {avloss}")
         self.losses.append(avloss)
         return True
+
+
+class ScheduleCallback(Callback):
+    """
+    A schedule callback sets the learning rate of the learner's optimizer
+    at the start of every epoch.
+
+    Parameters
+    ----------
+    learner: Learner
+        The learner whose optimizer `lr` is scheduled
+    schedule: Callable[[int], float]
+        Maps the epoch number to a learning rate
+    """
+
+    def __init__(self, learner: "Learner", schedule: Callable[[int], float]) -> None:
+        super().__init__(learner)
+        self.schedule = schedule
+
+    def epoch_start(self, epoch: int) -> bool:
+        self.learner.opt.lr = self.schedule(epoch)
+        return True
+
+
+class EarlyStoppingCallback(Callback):
+    """
+    An early stopping callback tracks the mean training loss of every epoch
+    and stops the learner once it has not improved by `min_delta` for
+    `patience` epochs.
+
+    Parameters
+    ----------
+    learner: Learner
+        The learner to stop
+    patience: int
+        Epochs without improvement before stopping. `None` never stops but
+        still records the epoch losses.
+    min_delta: float
+        The smallest decrease in loss that counts as an improvement
+    """
+
+    def __init__(
+        self, learner: "Learner", patience: Optional[int] = 5, min_delta: float = 0.0
+    ) -> None:
+        super().__init__(learner)
+        self.patience = patience
+        self.min_delta = min_delta
+
+    def fit_start(self) -> bool:
+        self.losses: List[float] = []
+        self.best = np.inf
+        self.best_epoch = -1
+        self.stopped_epoch: Optional[int] = None
+        return True
+
+    def epoch_start(self, epoch: int) -> bool:
+        self.epoch = epoch
+        self.total = 0.0
+        self.count = 0
+        return True
+
+    def after_loss(self, loss: float) -> bool:
+        self.total += loss
+        self.count += 1
+        return True
+
+    def epoch_end(self) -> bool:
+        loss = self.total / max(self.count, 1)
+        self.losses.append(loss)
+        # For replicated functions the loss is an array; any replica
+        # improving counts as progress.
+        if np.any(loss < self.best - self.min_delta):
+            self.best = np.minimum(self.best, loss)
+            self.best_epoch = self.epoch
+        elif (
+            self.patience is not None and self.epoch - self.best_epoch >= self.patience
+        ):
+            self.stopped_epoch = self.epoch
+            self.learner.stop = True
+        return True
+
+
+class MemoryCallback(Callback):
+    """
+    A memory profiling callback. Traces allocations with `tracemalloc`,
+    which also sees NumPy's array buffers, and records for every epoch:
+
+    - per phase, the net bytes allocated (summed over batches) and the
+      largest transient peak above the start of the phase. The phases are
+      "data" (producing the batch, e.g. the copies in `Data.__getitem__`),
+      "forward" (the function and the loss), "backward" and "step".
+    - the net growth over the epoch and the peak traced memory.
+
+    It also records the bytes that each layer keeps cached for `backward`
+    after the forward pass (`layers`), and flags batches after `warmup`
+    whose net allocation exceeds `tolerance` in `leaks`, with a
+    `ResourceWarning`: in a steady state a batch should free what it
+    allocates.
+
+    Tracing slows training down several times, so only add this callback
+    when looking into memory.
+
+    Parameters
+    ----------
+    learner: Learner
+        The learner to profile
+    warmup: int
+        Batches to let caches and buffers settle before flagging growth
+    tolerance: int
+        Net bytes a batch may allocate before it is flagged
+    verbose: bool
+        Print a summary line at the end of every epoch
+    """
+
+    PHASES = ("data", "forward", "backward", "step")
+
+    def __init__(
+        self,
+        learner: "Learner",
+        warmup: int = 2,
+        tolerance: int = 4096,
+        verbose: bool = False,
+    ) -> None:
+        super().__init__(learner)
+        self.warmup = warmup
+        self.tolerance = tolerance
+        self.verbose = verbose
+
+    def _mark(self, phase: Optional[str]) -> None:
+        "close the current phase and open `phase`"
+        current, peak = tracemalloc.get_traced_memory()
+        if self.phase is not None:
+            stats = self.epochs[-1][self.phase]
+            stats["allocated"] += current - self.start
+            stats["peak"] = max(stats["peak"], peak - self.start)
+            self.epochs[-1]["epoch"]["peak"] = max(
+                self.epochs[-1]["epoch"]["peak"], peak
+            )
+        tracemalloc.reset_peak()
+        self.phase = phase
+        self.start = current
+
+    def _layers(self) -> List[Tuple[str, object]]:
+        func = self.learner.func
+        layers = getattr(func, "layers", None)
+        if layers is None:
+            return [(type(func).__name__, func)]
+        return [(f"{i}.{type(f).__name__}", f) for i, f in enumerate(layers)]
+
+    def fit_start(self) -> bool:
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        self.epochs: List[Dict[str, Dict[str, int]]] = []
+        self.layers: Dict[str, int] = {}
+        self.leaks: List[Tuple[int, int, int]] = []
+        self.batches = 0
+        self.batch_mark = None
+        self.phase: Optional[str] = None
+        return True
+
+    def epoch_start(self, epoch: int) -> bool:
+        self.epoch = epoch
+        stats = {p: {"allocated": 0, "peak": 0} for p in self.PHASES}
+        stats["epoch"] = {"allocated": tracemalloc.get_traced_memory()[0], "peak": 0}
+        self.epochs.append(stats)
+        self.batch_mark: Optional[int] = None
+        self._mark("data")
+        return True
+
+    def batch_start(self, current_batch: int) -> bool:
+        self._mark("forward")
+        self.batch = current_batch
+        return True
+
+    def after_loss(self, loss: float) -> bool:
+        self._mark("backward")
+        for name, layer in self._layers():
+            cached = sum(
+                value.nbytes
+                for key, value in vars(layer).items()
+                if isinstance(value, np.ndarray)
+            )
+            self.layers[name] = max(self.layers.get(name, 0), cached)
+        return True
+
+    def after_backward(self) -> bool:
+        self._mark("step")
+        return True
+
+    def batch_end(self) -> bool:
+        # net allocation of the whole batch, from the end of the previous one
+        before = self.batch_mark
+        self._mark("data")
+        self.batch_mark = self.start
+        self.batches += 1
+        if before is not None and self.batches > self.warmup:
+            growth = self.batch_mark - before
+            if growth > self.tolerance:
+                self.leaks.append((self.epoch, self.batch, growth))
+                warnings.warn(
+                    f"Epoch {self.epoch} batch {self.batch} kept {growth} bytes",
+                    ResourceWarning,
+                )
+        return True
+
+    def epoch_end(self) -> bool:
+        self._mark(None)
+        stats = self.epochs[-1]["epoch"]
+        stats["allocated"] = self.start - stats["allocated"]
+        if self.verbose:
+            phases = ", ".join(f"{p} {self.epochs[-1][p]['peak']}" for p in self.PHASES)
+            print(
+                f"Epoch {self.epoch}: grew {stats['allocated']} bytes, "
+                f"peak {stats['peak']} bytes\nPhase peaks {phases}"
+            )
+        return True
+
+    def fit_end(self) -> bool:
+        if self.started:
+            tracemalloc.stop()
+        return True
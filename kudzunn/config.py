@@ -0,0 +1,183 @@
+import inspect
+import json
+import math
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
+from numpy import ndarray
+from kudzunn import function, loss, optim
+from kudzunn.callbacks import ScheduleCallback
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.rng import spawn
+from kudzunn.train import Learner
+
+SECTIONS = ("data", "model", "loss", "optimizer", "schedule", "train", "output")
+TRAIN_KEYS = ("epochs", "batch_size", "shuffle", "drop_last", "seed", "fused")
+
+
+def load_config(path: str) -> Dict[str, Any]:
+    """
+    Read a training configuration from a TOML or JSON file.
+
+    Parameters
+    ----------
+    path: str
+        A `.toml` or `.json` file
+
+    Returns
+    -------
+    config: Dict
+        The configuration, one table per section in `SECTIONS`
+    """
+    path = Path(path)
+    if path.suffix == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    elif path.suffix == ".json":
+        with open(path) as f:
+            config = json.load(f)
+    else:
+        raise ValueError(f"Config {path} must be a .toml or .json file")
+    unknown = set(config) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown config sections: {sorted(unknown)}")
+    return config
+
+
+def _load_array(path: Path, column: Any = None, skip_header: int = 0) -> ndarray:
+    if path.suffix == ".npy":
+        return np.load(path)
+    arr = np.loadtxt(path, delimiter=",", skiprows=skip_header, ndmin=2)
+    return arr[:, 0 if column is None else column]
+
+
+def load_data(spec: Dict[str, Any], root: Path = Path(".")) -> Data:
+    """
+    Build a `Data` from the `data` section of a config.
+
+    Either `x` and `y` name two `.npy` or `.csv` files, or `path` names one
+    `.csv` file with `x_column` and `y_column` (default 0 and 1). Relative
+    paths are resolved against `root`.
+
+    Parameters
+    ----------
+    spec: Dict
+        The `data` section
+    root: Path
+        Directory of the config file
+
+    Returns
+    -------
+    data: Data
+        The loaded data
+    """
+    skip = spec.get("skip_header", 0)
+    if "path" in spec:
+        path = root / spec["path"]
+        x = _load_array(path, spec.get("x_column", 0), skip)
+        y = _load_array(path, spec.get("y_column", 1), skip)
+    else:
+        x = _load_array(root / spec["x"], spec.get("x_column"), skip)
+        y = _load_array(root / spec["y"], spec.get("y_column"), skip)
+    return Data(x, y)
+
+
+def _construct(module, base: type, spec: Dict[str, Any], rng=None) -> Any:
+    kwargs = dict(spec)
+    name = kwargs.pop("name")
+    cls = getattr(module, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, base)):
+        raise ValueError(f"{name} is not a {base.__name__} in {module.__name__}")
+    if rng is not None and "rng" in inspect.signature(cls).parameters:
+        kwargs.setdefault("rng", rng)
+    return cls(**kwargs)
+
+
+def make_schedule(
+    spec: Dict[str, Any], lr: float, epochs: int = 1
+) -> Callable[[int], float]:
+    """
+    Build a learning rate schedule from the `schedule` section of a config.
+
+    Supported names are `constant`, `step` (multiply by `gamma` every
+    `step_size` epochs), `exponential` (multiply by `gamma` every epoch) and
+    `cosine` (anneal to `min_lr` over `epochs`, by default the number of
+    training epochs).
+
+    Parameters
+    ----------
+    spec: Dict
+        The `schedule` section
+    lr: float
+        The initial learning rate
+    epochs: int
+        The number of training epochs
+
+    Returns
+    -------
+    schedule: Callable[[int], float]
+        Maps the epoch number to a learning rate
+    """
+    name = spec.get("name", "constant")
+    gamma = spec.get("gamma", 0.1)
+    if name == "constant":
+        return lambda epoch: lr
+    if name == "step":
+        step_size = spec["step_size"]
+        return lambda epoch: lr * gamma ** (epoch // step_size)
+    if name == "exponential":
+        return lambda epoch: lr * gamma**epoch
+    if name == "cosine":
+        # at least one, so a zero-epoch run does not divide by zero
+        epochs = max(spec.get("epochs", epochs), 1)
+        min_lr = spec.get("min_lr", 0.0)
+        return lambda epoch: min_lr + 0.5 * (lr - min_lr) * (
+            1 + math.cos(math.pi * min(epoch, epochs) / epochs)
+        )
+    raise ValueError(f"Unknown schedule {name}")
+
+
+def build(config: Dict[str, Any], root: Path = Path(".")) -> Tuple[Learner, Dataloader]:
+    """
+    Build a learner and a dataloader from a configuration.
+
+    Parameters
+    ----------
+    config: Dict
+        As returned by `load_config`
+    root: Path
+        Directory that relative data paths are resolved against
+
+    Returns
+    -------
+    learner, dataloader: (Learner, Dataloader)
+        Ready for `learner.train_loop(dataloader)`
+    """
+    train = config.get("train", {})
+    unknown = set(train) - set(TRAIN_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown train settings: {sorted(unknown)}")
+    # One child stream per component, so a seeded run replays exactly
+    initrng, samplerrng = spawn(train.get("seed"), 2)
+    data = load_data(config["data"], root)
+    sampler = Sampler(
+        data,
+        train.get("batch_size", len(data)),
+        shuffle=train.get("shuffle", True),
+        rng=samplerrng,
+        drop_last=train.get("drop_last", False),
+    )
+    func = _construct(function, function.Function, config["model"], initrng)
+    lossfn = _construct(loss, loss.Loss, config.get("loss", {"name": "MSE"}))
+    opt = _construct(optim, optim.Optimizer, config.get("optimizer", {"name": "GD"}))
+    learner = Learner(
+        opt, lossfn, func, train.get("epochs", 1), fused=train.get("fused", False)
+    )
+    if "schedule" in config:
+        schedule = make_schedule(config["schedule"], opt.lr, learner.epochs)
+        learner.set_callbacks([ScheduleCallback(learner, schedule)])
+    return learner, Dataloader(data, sampler)
@@ -1,6 +1,9 @@
 import numpy as np
 from numpy import ndarray
-from typing import Tuple, Generator, List
+from typing import Callable, Generator, List, Optional, Sequence, Tuple, Union
+from kudzunn.backend import require_numpy
+from kudzunn.cache import fingerprint, transform_key
+from kudzunn.rng import RNGLike, as_generator
 
 
 class Data:
@@ -10,32 +13,78 @@ class Data:
     Parameters
     ----------
     x: ndarray
-        Independent Variable in 1D
+        Independent Variable in 1D, or a `kudzunn.sparse.CSRMatrix` of
+        feature rows
     actual: ndarray
         Dependent variable in 1D
-    shuffle: bool
-        Should we shuffle the data?
+    shuffle: bool or str
+        How `shuffle()` reorders the data, one of `SHUFFLE_MODES`:
+
+        - "none": leave the data alone
+        - "copy": return shuffled copies of x and y (`True`)
+        - "inplace": permute x and y in place, with no copy of the data
+        - "index": permute only an index array that `__getitem__` reads
+          through
+
+        `False` means "none".
+    rng: Generator or int
+        Random generator or seed for shuffling
+
+    The data is held as NumPy arrays; to train with another array library
+    (see `kudzunn.backend`), convert the batches in a `Dataloader`
+    transform.
     """
 
-    def __init__(self, x: ndarray, y: ndarray, shuffle: bool = True) -> None:
+    SHUFFLE_MODES = ("none", "copy", "inplace", "index")
+
+    def __init__(
+        self,
+        x: ndarray,
+        y: ndarray,
+        shuffle: Union[bool, str] = True,
+        rng: RNGLike = None,
+    ) -> None:
+        if shuffle is True or shuffle is False:
+            shuffle = "copy" if shuffle else "none"
+        if shuffle not in self.SHUFFLE_MODES:
+            raise ValueError(f"shuffle must be one of {self.SHUFFLE_MODES}")
+        require_numpy("Data", x, y)
+        if shuffle == "inplace" and not isinstance(x, ndarray):
+            raise ValueError("inplace shuffling needs ndarrays, use 'index'")
         self.x = x
         self.y = y
+        self.shuffle_mode = shuffle
+        self.rng = as_generator(rng)
         self.length = len(self)
         # Start an array index for later
         self.starts = np.arange(0, self.length)
 
     def shuffle(self):
         """
-        Shuffle the data.
+        Shuffle the data according to `shuffle_mode`.
+
+        The "inplace" mode runs the same Fisher-Yates swap sequence over x
+        and y by giving each a generator seeded identically, so the pairs
+        stay aligned and the only extra memory is one row.
 
         Returns
         -------
-        shuffled: (ndarray, ndarray)
-            A tuple of shuffled ndarrays, x first, y second
+        shuffled: (ndarray, ndarray) or ndarray
+            A tuple of ndarrays, x first, y second. These are copies in
+            "copy" mode and the (permuted) data itself in "none" and
+            "inplace" mode. In "index" mode, the permuted index array.
         """
-        if self.shuffle:
-            np.random.shuffle(self.starts)
-        return self.x[self.starts], self.y[self.starts]
+        if self.shuffle_mode == "copy":
+            self.rng.shuffle(self.starts)
+            return self.x[self.starts], self.y[self.starts]
+        if self.shuffle_mode == "inplace":
+            seed = self.rng.integers(2**63)
+            np.random.default_rng(seed).shuffle(self.x)
+            np.random.default_rng(seed).shuffle(self.y)
+        elif self.shuffle_mode == "index":
+            self.rng.shuffle(self.starts)
+            return self.starts
+        return self.x, self.y
 
     def __len__(self) -> int:
         """
@@ -57,34 +106,275 @@ class Data:
         xy: (int, int)
             The (x, y) tuple at an index i
         """
+        if self.shuffle_mode == "index":
+            i = self.starts[i]
         return self.x[i], self.y[i]
 
 
 # idea+implementation taken from fast.ai
 class Sampler:
-    def __init__(self, data: Data, bs: int, shuffle: bool = False):
-        "initialize sampler which will give us a batch of shuffled indexes"
+    def __init__(
+        self,
+        data: Data,
+        bs: int,
+        shuffle: bool = False,
+        rng: RNGLike = None,
+        drop_last: bool = False,
+    ):
+        """
+        initialize sampler which will give us a batch of shuffled indexes.
+        With `drop_last` a ragged final batch is dropped, so every batch has
+        exactly `bs` indexes and downstream buffers can be reused.
+        """
         self.n = len(data.y)
         self.idxs = np.arange(0, self.n)
         self.bs = bs
         self.shuffle = shuffle
+        self.rng = as_generator(rng)
+        self.drop_last = drop_last
+        # indexes per epoch
+        self.num_samples = self.n
+
+    def order(self) -> ndarray:
+        "the indexes for one epoch, in the order they are to be batched"
+        if self.shuffle:
+            self.rng.shuffle(self.idxs)
+        return self.idxs
+
+    def __len__(self) -> int:
+        "the number of batches per epoch"
+        if self.drop_last:
+            return self.num_samples // self.bs
+        return -(-self.num_samples // self.bs)
 
     def __iter__(self) -> Generator[List[int], None, None]:
         "a generator for a batch size sized list of indexes"
-        if self.shuffle:
-            np.random.shuffle(self.idxs)
-        for i in range(0, self.n, self.bs):
-            yield self.idxs[i : i + self.bs]
+        idxs = self.order()
+        stop = len(idxs) - len(idxs) % self.bs if self.drop_last else len(idxs)
+        for i in range(0, stop, self.bs):
+            yield idxs[i : i + self.bs]
+
+
+class WeightedSampler(Sampler):
+    """
+    Draws `num_samples` indexes with replacement, with probability
+    proportional to `weights`. Uses Vose's alias method: the table is built
+    once in O(n) and each index then costs one uniform integer, one uniform
+    float and a comparison.
+
+    Parameters
+    ----------
+    data: Data
+        The data to sample
+    bs: int
+        Batch size
+    weights: ndarray
+        One non-negative weight per data point
+    num_samples: int
+        Indexes drawn per epoch, by default `len(data)`
+    rng: Generator or int
+        Random generator or seed
+    drop_last: bool
+        Drop a ragged last batch
+    """
+
+    def __init__(
+        self,
+        data: Data,
+        bs: int,
+        weights: ndarray,
+        num_samples: int = None,
+        rng: RNGLike = None,
+        drop_last: bool = False,
+    ):
+        super().__init__(data, bs, shuffle=True, rng=rng, drop_last=drop_last)
+        self.num_samples = self.n if num_samples is None else num_samples
+        self.prob, self.alias = self.alias_table(weights)
+
+    @staticmethod
+    def alias_table(weights: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Build the alias table for a discrete distribution.
+
+        Returns
+        -------
+        prob, alias: (ndarray, ndarray)
+            Index i is kept with probability prob[i], else alias[i] is used
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        n = len(weights)
+        scaled = weights * (n / weights.sum())
+        prob = np.ones(n)
+        alias = np.arange(n)
+        small = list(np.flatnonzero(scaled < 1.0))
+        large = list(np.flatnonzero(scaled >= 1.0))
+        while small and large:
+            s, g = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # leftovers are 1 up to rounding
+        return prob, alias
+
+    def order(self) -> ndarray:
+        i = self.rng.integers(0, self.n, size=self.num_samples)
+        keep = self.rng.random(self.num_samples) < self.prob[i]
+        return np.where(keep, i, self.alias[i])
+
+
+class StratifiedSampler(Sampler):
+    """
+    Shuffles so that every batch holds each stratum in proportion to its
+    size in the data. Strata are the distinct labels, or the bins of a
+    continuous label given `bins`.
+
+    Parameters
+    ----------
+    data: Data
+        The data to sample
+    bs: int
+        Batch size
+    labels: ndarray
+        Stratum label per data point, by default `data.y`
+    bins: ndarray
+        Bin edges for continuous labels, see `np.digitize`
+    rng: Generator or int
+        Random generator or seed
+    drop_last: bool
+        Drop a ragged last batch
+    """
+
+    def __init__(
+        self,
+        data: Data,
+        bs: int,
+        labels: ndarray = None,
+        bins: ndarray = None,
+        rng: RNGLike = None,
+        drop_last: bool = False,
+    ):
+        super().__init__(data, bs, shuffle=True, rng=rng, drop_last=drop_last)
+        labels = np.asarray(data.y if labels is None else labels)
+        if bins is not None:
+            labels = np.digitize(labels, bins)
+        _, self.strata, self.counts = np.unique(
+            labels, return_inverse=True, return_counts=True
+        )
+        self.strata = self.strata.ravel()
+
+    def order(self) -> ndarray:
+        # Give each point a random rank within its stratum and spread the
+        # ranks evenly over [0, 1); sorting on that interleaves the strata.
+        noise = self.rng.random(self.n)
+        bystratum = np.lexsort((noise, self.strata))
+        rank = np.empty(self.n)
+        starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        rank[bystratum] = np.arange(self.n) - np.repeat(starts, self.counts)
+        position = (rank + self.rng.random(self.n)) / self.counts[self.strata]
+        return np.argsort(position, kind="stable")
+
+
+class BucketSampler(Sampler):
+    """
+    Batches points of similar length together, then shuffles the order of
+    the batches, so that padding per batch is small.
+
+    Parameters
+    ----------
+    data: Data
+        The data to sample
+    bs: int
+        Batch size
+    lengths: ndarray
+        Length of every data point
+    rng: Generator or int
+        Random generator or seed
+    drop_last: bool
+        Drop the one ragged batch
+    """
+
+    def __init__(
+        self,
+        data: Data,
+        bs: int,
+        lengths: ndarray,
+        rng: RNGLike = None,
+        drop_last: bool = False,
+    ):
+        super().__init__(data, bs, shuffle=True, rng=rng, drop_last=drop_last)
+        self.lengths = np.asarray(lengths)
+
+    def order(self) -> ndarray:
+        # random tie break so equal lengths are batched differently
+        idxs = np.lexsort((self.rng.random(self.n), self.lengths))
+        full = self.n - self.n % self.bs
+        batches = idxs[:full].reshape(-1, self.bs)
+        self.rng.shuffle(batches)
+        # the ragged batch goes last so drop_last can drop it
+        return np.concatenate((batches.ravel(), idxs[full:]))
 
 
 # this dataloader uses the Sampler
 class Dataloader:
-    def __init__(self, data: Data, sampler: Sampler):
+    def __init__(
+        self,
+        data: Data,
+        sampler: Sampler,
+        transforms: Sequence[Callable[[ndarray, ndarray], Tuple]] = (),
+        cache=None,
+    ):
+        """
+        initialize the dataloader. Each `(x, y)` batch is passed through the
+        `transforms` in order, e.g. a `kudzunn.normalize.Normalizer`. With
+        a `kudzunn.cache.BatchCache` or `SampleCache` as `cache`, transformed
+        batches are memoized so later epochs skip the transforms. The cache
+        key covers the data and the transforms (see `kudzunn.cache`).
+        """
         self.data = data
         self.sampler = sampler
+        self.transforms = list(transforms)
+        self.cache = cache
+        self.data_key: Optional[str] = None
+        self.cache_prefix: Optional[str] = None
         self.current_batch = 0
 
+    def _load(self, idxsample) -> Tuple:
+        batch = self.data[idxsample]
+        for transform in self.transforms:
+            batch = transform(*batch)
+        return batch
+
+    def _prefix(self) -> str:
+        """
+        The cache key of the data and the transforms. Hashing the data is
+        expensive and done once; the transform key is cheap and redone
+        every epoch, so refitting a `Normalizer` invalidates the cache.
+        """
+        if self.data.shuffle_mode == "inplace":
+            raise ValueError("inplace shuffling moves the data under the cache")
+        if self.data_key is None:
+            self.data_key = fingerprint(self.data)
+        return self.data_key + transform_key(self.transforms)
+
+    def _cached(self, idxsample) -> Tuple:
+        rows = np.asarray(idxsample)
+        if self.data.shuffle_mode == "index":
+            rows = self.data.starts[rows]
+        return self.cache.fetch(
+            self.cache_prefix, rows, len(self.data), lambda: self._load(idxsample)
+        )
+
     def __iter__(self):
+        # "inplace" and "index" shuffles change what data[i] returns, so
+        # they give a fresh order every epoch without copying the data.
+        if self.data.shuffle_mode in ("inplace", "index"):
+            self.data.shuffle()
+        if self.cache is not None:
+            self.cache_prefix = self._prefix()
         for idxsample in self.sampler:
-            yield self.data[idxsample]
+            if self.cache is None:
+                yield self._load(idxsample)
+            else:
+                yield self._cached(idxsample)
             self.current_batch += 1
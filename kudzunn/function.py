@@ -1,6 +1,10 @@
 import numpy as np
 from numpy import ndarray
-from typing import Dict
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple
+from kudzunn.backend import get_backend, get_namespace, is_numpy, require_numpy
+from kudzunn.rng import RNGLike, as_generator
+from kudzunn.sparse import CSRMatrix, SparseGrad
 
 
 class Function:
@@ -9,8 +13,13 @@ class Function:
     of the function. Dunder `__call__` actually calls it, using these
     parameters as state. The gradient of the function with respect to its
     inputs and parameters must be provided using `backward`.
+
+    `__call__` may keep arrays for `backward` as attributes, named in
+    `cache`, which `release` drops.
     """
 
+    cache: Tuple[str, ...] = ()
+
     def __init__(self) -> None:
         self.params: Dict[str, float] = {}
         self.grads: Dict[str, float] = {}
@@ -51,6 +60,11 @@ class Function:
         """
         raise NotImplementedError
 
+    def release(self) -> None:
+        "Drop the arrays kept for `backward`"
+        for name in self.cache:
+            self.__dict__.pop(name, None)
+
     def params_and_grads(self):
         """
         Obtain a list of parameter values and their gradients.
@@ -75,25 +89,50 @@ class ZeroBiasAffine(Function):
     A function that defines a linear tranform in 1-D. It multiplies the input
     by a single parameter.
 
+    With `replicas=K` the function holds K independent parameters stacked in
+    a `(K,)` array `w` and maps inputs of shape `(N,)` (shared) or `(K, N)`
+    (one row per replica) to outputs of shape `(K, N)`, so that K models are
+    trained at once in one set of array operations.
+
     Parameters
     ----------
     winit: float
         An initialization to provide the function parameter w.
     wgrad: float
         An initialization to provide the gradient dJ/dw.
+    replicas: int
+        The number of independent copies of w to train, `None` for one
+        scalar w.
+    rng: Generator or int
+        Random generator or seed used to draw w when `winit` is not given.
 
     """
 
-    def __init__(self, winit=None, wgrad=None) -> None:
+    cache = ("inputs",)
+
+    def __init__(
+        self, winit=None, wgrad=None, replicas=None, rng: RNGLike = None
+    ) -> None:
         super().__init__()
-        if winit:
-            self.params["w"] = winit
+        self.replicas = replicas
+        # replicated parameters are arrays of the backend's library
+        xp = get_backend()
+        shape = () if replicas is None else (replicas,)
+        if winit is not None:
+            self.params["w"] = winit if replicas is None else xp.full(shape, winit)
+        elif replicas is None:
+            self.params["w"] = as_generator(rng).standard_normal()
         else:
-            self.params["w"] = np.random.randn()
-        if wgrad:
-            self.grads["w"] = wgrad
+            self.params["w"] = xp.asarray(as_generator(rng).standard_normal(replicas))
+        if wgrad is not None:
+            self.grads["w"] = wgrad if replicas is None else xp.full(shape, wgrad)
         else:
-            self.grads["w"] = 0.0
+            self.grads["w"] = 0.0 if replicas is None else xp.zeros(shape)
+
+    def _w(self):
+        "w, with a trailing axis to broadcast over samples when replicated"
+        w = self.params["w"]
+        return w[..., None] if np.ndim(w) else w
 
     def __call__(self, inputs: ndarray) -> ndarray:
         """
@@ -111,7 +150,7 @@ class ZeroBiasAffine(Function):
             A numpy array representing output of the function call.
         """
         self.inputs = inputs
-        return inputs * self.params["w"]
+        return inputs * self._w()
 
     def backward(self, grad: ndarray) -> ndarray:
         """
@@ -132,5 +171,603 @@ class ZeroBiasAffine(Function):
             A numpy array representing gradient of the loss with
             respect to the inputs of this function.
         """
-        self.grads["w"] = grad @ self.inputs
-        return self.params["w"] * grad
+        if self.inputs.ndim == 1:
+            # shared inputs: (N,) or (K, N) @ (N,)
+            self.grads["w"] = grad @ self.inputs
+        elif is_numpy(get_namespace(grad)):
+            # one row of inputs per replica
+            self.grads["w"] = np.einsum("kn,kn->k", grad, self.inputs)
+        else:
+            self.grads["w"] = get_namespace(grad).sum(grad * self.inputs, axis=-1)
+        return self._w() * grad
+
+    def design(self, inputs: ndarray) -> ndarray:
+        """
+        The design matrix of this linear function: output = design @ coef.
+        Used by `Learner.fit_exact` to solve least squares directly.
+
+        Parameters
+        ----------
+        inputs: ndarray
+            Shared inputs of shape `(N,)`
+
+        Returns
+        -------
+        design: ndarray
+            Shape `(N, 1)`
+        """
+        if inputs.ndim != 1:
+            raise ValueError("fit_exact needs shared 1-D inputs")
+        return inputs[:, None]
+
+    def set_solution(self, coef: ndarray) -> None:
+        "Set w from least squares coefficients of shape `(1,)`"
+        w = coef[0]
+        self.params["w"] = (
+            float(w)
+            if np.ndim(self.params["w"]) == 0
+            else (np.full(np.shape(self.params["w"]), w))
+        )
+
+
+class Linear(Function):
+    """
+    An affine map x @ W + b for inputs of shape `(N, D)`, dense or a
+    `kudzunn.sparse.CSRMatrix`. With sparse inputs the forward pass is a
+    sparse-dense product and the gradient of W is a `SparseGrad` over the
+    features present in the batch, which optimizers apply to those rows
+    only.
+
+    Parameters
+    ----------
+    n_in: int
+        Number of input features D
+    n_out: int
+        Number of outputs K, `None` for `(N,)` outputs and a `(D,)` W
+    bias: bool
+        Include the bias b
+    winit: ndarray
+        Initial W, by default normal draws scaled by 1/sqrt(D)
+    rng: Generator or int
+        Random generator or seed used to draw W when `winit` is not given.
+    """
+
+    cache = ("inputs",)
+
+    def __init__(
+        self,
+        n_in: int,
+        n_out: Optional[int] = None,
+        bias: bool = True,
+        winit: ndarray = None,
+        rng: RNGLike = None,
+    ) -> None:
+        super().__init__()
+        shape = (n_in,) if n_out is None else (n_in, n_out)
+        if winit is None:
+            winit = as_generator(rng).standard_normal(shape) / np.sqrt(n_in)
+        self.params["w"] = np.array(winit, dtype=np.float64).reshape(shape)
+        self.grads["w"] = np.zeros(shape)
+        if bias:
+            self.params["b"] = 0.0 if n_out is None else np.zeros(n_out)
+            self.grads["b"] = 0.0 if n_out is None else np.zeros(n_out)
+
+    def __call__(self, inputs) -> ndarray:
+        """
+        Call x @ W + b.
+
+        Parameters
+        ----------
+        inputs: ndarray or CSRMatrix
+            The inputs, shape `(N, D)`
+
+        Returns
+        -------
+
+        output: ndarray
+            Shape `(N,)` or `(N, K)`
+        """
+        require_numpy("Linear", inputs)
+        self.inputs = inputs
+        if isinstance(inputs, CSRMatrix):
+            out = inputs.dot(self.params["w"])
+        else:
+            out = inputs @ self.params["w"]
+        if "b" in self.params:
+            out += self.params["b"]
+        return out
+
+    def backward(self, grad: ndarray) -> Optional[ndarray]:
+        """
+        Store x^T grad for W (sparse for sparse inputs) and the sum of grad
+        over samples for b.
+
+        Parameters
+        ----------
+        grad: ndarray
+            Gradient of the loss with respect to this function
+
+        Returns
+        -------
+
+        outgrads: ndarray
+            grad @ W^T for dense inputs. `None` for sparse inputs, which
+            are data and never need a gradient.
+        """
+        require_numpy("Linear", grad)
+        w = self.params["w"]
+        if "b" in self.params:
+            self.grads["b"] = grad.sum(axis=0)
+        if isinstance(self.inputs, CSRMatrix):
+            self.grads["w"] = self.inputs.tdot(grad)
+            return None
+        self.grads["w"] = self.inputs.T @ grad
+        return np.multiply.outer(grad, w) if w.ndim == 1 else grad @ w.T
+
+    def design(self, inputs) -> ndarray:
+        """
+        The design matrix of this linear function: output = design @ coef.
+        Used by `Learner.fit_exact` to solve least squares directly.
+
+        Parameters
+        ----------
+        inputs: ndarray or CSRMatrix
+            The inputs, shape `(N, D)`. Sparse inputs are made dense, as
+            the normal equations are `(D+1, D+1)` and dense anyway.
+
+        Returns
+        -------
+        design: ndarray
+            Shape `(N, D+1)`, the inputs and a column of ones for b, or
+            `(N, D)` without a bias
+        """
+        require_numpy("Linear", inputs)
+        if isinstance(inputs, CSRMatrix):
+            inputs = inputs.toarray()
+        if "b" not in self.params:
+            return inputs
+        return np.column_stack((inputs, np.ones(len(inputs), dtype=inputs.dtype)))
+
+    def set_solution(self, coef: ndarray) -> None:
+        "Set W and b from least squares coefficients of shape `(D+1,)` or `(D+1, K)`"
+        n_in = self.params["w"].shape[0]
+        self.params["w"] = np.array(coef[:n_in], dtype=np.float64)
+        if "b" in self.params:
+            b = coef[n_in]
+            self.params["b"] = float(b) if np.ndim(b) == 0 else np.array(b)
+
+
+class Embedding(Function):
+    """
+    A lookup table mapping integer ids to rows of a `(vocab, dim)` table,
+    e.g. for categorical features or tokens. Only the rows whose ids are
+    in the batch get a gradient, so `backward` stores a `SparseGrad` and
+    optimizers update just those rows.
+
+    Parameters
+    ----------
+    vocab: int
+        The number of ids
+    dim: int
+        The size of every row
+    winit: ndarray
+        Initial table, by default standard normal draws
+    rng: Generator or int
+        Random generator or seed used to draw the table when `winit` is
+        not given.
+    """
+
+    cache = ("ids",)
+
+    def __init__(
+        self, vocab: int, dim: int, winit: ndarray = None, rng: RNGLike = None
+    ) -> None:
+        super().__init__()
+        if winit is None:
+            winit = as_generator(rng).standard_normal((vocab, dim))
+        self.params["w"] = np.array(winit, dtype=np.float64).reshape(vocab, dim)
+        self.grads["w"] = SparseGrad(
+            np.zeros(0, np.intp), np.zeros((0, dim)), (vocab, dim)
+        )
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        """
+        Look the ids up.
+
+        Parameters
+        ----------
+        inputs: ndarray
+            Integer ids of any shape
+
+        Returns
+        -------
+
+        output: ndarray
+            The rows, shape `inputs.shape + (dim,)`
+        """
+        require_numpy("Embedding", inputs)
+        self.ids = inputs
+        return self.params["w"][inputs]
+
+    def backward(self, grad: ndarray) -> None:
+        """
+        Sum the incoming gradient of every occurrence of an id into its row,
+        over the unique ids of the batch only.
+
+        Parameters
+        ----------
+        grad: ndarray
+            Gradient of the loss with respect to this function
+
+        Returns
+        -------
+
+        outgrads: None
+            Ids have no gradient
+        """
+        require_numpy("Embedding", grad)
+        w = self.params["w"]
+        rows, inverse = np.unique(self.ids, return_inverse=True)
+        values = np.zeros((len(rows), w.shape[1]), dtype=np.result_type(grad, w))
+        np.add.at(values, inverse.ravel(), grad.reshape(-1, w.shape[1]))
+        self.grads["w"] = SparseGrad(rows, values, w.shape)
+        return None
+
+
+class _PrefixedDict(MutableMapping):
+    """
+    A view of one dict per layer (e.g. every layer's `params`) as a single
+    dict with keys "<layer index>.<name>". Assigning a key writes through to
+    the layer, which is how optimizers update a container.
+    """
+
+    def __init__(self, dicts: List[Dict]) -> None:
+        self.dicts = dicts
+
+    def _split(self, key: str):
+        index, _, name = key.partition(".")
+        try:
+            d = self.dicts[int(index)]
+        except (ValueError, IndexError):
+            raise KeyError(key) from None
+        if name not in d:
+            raise KeyError(key)
+        return d, name
+
+    def __getitem__(self, key: str):
+        d, name = self._split(key)
+        return d[name]
+
+    def __setitem__(self, key: str, value) -> None:
+        d, name = self._split(key)
+        d[name] = value
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Cannot delete parameters of a layer")
+
+    def __iter__(self) -> Iterator[str]:
+        for i, d in enumerate(self.dicts):
+            for name in d:
+                yield f"{i}.{name}"
+
+    def __len__(self) -> int:
+        return sum(len(d) for d in self.dicts)
+
+
+def _edge(layer: Function, end: int) -> Function:
+    "the first (`end=0`) or last (`end=-1`) layer inside nested Sequentials"
+    while isinstance(layer, Sequential) and layer.layers:
+        layer = layer.layers[end]
+    return layer
+
+
+def _overwrites_inputs(layer: Function) -> bool:
+    "whether calling `layer` writes into its inputs, through nested Sequentials"
+    layer = _edge(layer, 0)
+    return getattr(layer, "inplace", False) and getattr(layer, "inplace_forward", False)
+
+
+class Sequential(Function):
+    """
+    A container that calls functions one after the other, feeding each the
+    output of the previous one. Its `params` and `grads` are views over
+    those of the layers, keyed "<layer index>.<name>", so optimizers,
+    callbacks and `kudzunn.serialize` treat it like any other function.
+
+    With `checkpoint=k` the layers are split into segments of k and only
+    the input of each segment is kept during the forward pass; the caches
+    of the layers inside are released. `backward` recomputes a segment's
+    forward pass just before backpropagating through it, so activation
+    memory goes from one cache per layer to one input per segment plus the
+    caches of a single segment, for one extra forward pass.
+
+    Parameters
+    ----------
+    layers: Function
+        The functions, in the order they are called
+    checkpoint: int
+        Layers per recomputed segment, `None` to keep every cache
+
+    Raises
+    ------
+    ValueError
+        If an in-place activation follows a layer that caches its output
+    """
+
+    def __init__(self, *layers: Function, checkpoint: Optional[int] = None) -> None:
+        for before, after in zip(layers, layers[1:]):
+            before, after = _edge(before, -1), _edge(after, 0)
+            if _overwrites_inputs(after) and "output" in before.cache:
+                raise ValueError(
+                    f"In-place {type(after).__name__} would overwrite the output "
+                    f"{type(before).__name__} caches for backward"
+                )
+        self.layers = list(layers)
+        self.params = _PrefixedDict([layer.params for layer in self.layers])
+        self.grads = _PrefixedDict([layer.grads for layer in self.layers])
+        self.checkpoint = checkpoint
+        self.checkpoints: List[ndarray] = []
+
+    def _segments(self) -> List[List[Function]]:
+        k = self.checkpoint or len(self.layers)
+        return [self.layers[i : i + k] for i in range(0, len(self.layers), k)]
+
+    @staticmethod
+    def _forward(layers: List[Function], inputs: ndarray) -> ndarray:
+        for layer in layers:
+            inputs = layer(inputs)
+        return inputs
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        """
+        Call every layer in turn.
+
+        Parameters
+        ----------
+        inputs: ndarray
+            The inputs to the first layer.
+
+        Returns
+        -------
+
+        output: ndarray
+            The output of the last layer.
+        """
+        if not self.checkpoint:
+            return self._forward(self.layers, inputs)
+        *segments, last = self._segments()
+        self.checkpoints = []
+        for segment in segments:
+            # an in-place first layer would overwrite the kept input
+            keep = inputs.copy() if _overwrites_inputs(segment[0]) else inputs
+            self.checkpoints.append(keep)
+            inputs = self._forward(segment, inputs)
+            for layer in segment:
+                layer.release()
+        return self._forward(last, inputs)
+
+    def backward(self, grad: ndarray) -> ndarray:
+        """
+        Backpropagate through the layers in reverse order.
+
+        Parameters
+        ----------
+        grad: ndarray
+            Gradient of the loss with respect to the output of the last layer
+
+        Returns
+        -------
+
+        outgrads: ndarray
+            Gradient of the loss with respect to the inputs of the first layer
+        """
+        segments = self._segments()
+        for i, segment in reversed(list(enumerate(segments))):
+            if i < len(segments) - 1:
+                # recompute the caches, then free them and the checkpoint
+                self._forward(segment, self.checkpoints.pop())
+            for layer in reversed(segment):
+                grad = layer.backward(grad)
+            if i < len(segments) - 1:
+                for layer in segment:
+                    layer.release()
+        return grad
+
+    def release(self) -> None:
+        "Drop the arrays every layer kept for `backward`, and the checkpoints"
+        for layer in self.layers:
+            layer.release()
+        self.checkpoints = []
+
+
+class Activation(Function):
+    """
+    Base class for parameter-free elementwise nonlinearities.
+
+    Parameters
+    ----------
+    inplace: bool
+        Overwrite the inputs with the outputs in `__call__`, and the
+        incoming gradient with the outgoing one in `backward`, instead of
+        allocating new arrays. Only safe when nothing else holds on to the
+        inputs: not on a batch of data, and not after a layer that caches
+        its output for `backward` (`Sigmoid`, `Tanh`, `Softmax`), whose
+        gradient would silently go wrong. Layers that cache their inputs
+        instead (`ZeroBiasAffine`, `Linear`, `GELU`) return fresh arrays,
+        so an in-place activation after them is safe. `Sequential` rejects
+        the unsafe case.
+    """
+
+    # whether `inplace` overwrites the inputs, not only the gradient
+    inplace_forward = True
+
+    def __init__(self, inplace: bool = False) -> None:
+        super().__init__()
+        self.inplace = inplace
+
+    def _out(self, arr: ndarray):
+        "where to write a result computed from `arr`"
+        return arr if self.inplace else None
+
+
+class ReLU(Activation):
+    """
+    max(x, 0). Caches only a boolean mask of the positive inputs for
+    `backward`, one byte per element instead of a copy of the inputs.
+    """
+
+    cache = ("mask",)
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        self.mask = inputs > 0
+        xp = get_namespace(inputs)
+        if not is_numpy(xp):
+            return xp.where(self.mask, inputs, xp.zeros_like(inputs))
+        return np.maximum(inputs, 0, out=self._out(inputs))
+
+    def backward(self, grad: ndarray) -> ndarray:
+        xp = get_namespace(grad)
+        if not is_numpy(xp):
+            return xp.where(self.mask, grad, xp.zeros_like(grad))
+        return np.multiply(grad, self.mask, out=self._out(grad))
+
+
+class LeakyReLU(Activation):
+    """
+    x for positive x, `slope` * x otherwise. Caches only a boolean mask.
+
+    Parameters
+    ----------
+    slope: float
+        Slope for negative inputs
+    inplace: bool
+        Reuse the inputs and gradients as outputs
+    """
+
+    cache = ("mask",)
+
+    def __init__(self, slope: float = 0.01, inplace: bool = False) -> None:
+        super().__init__(inplace)
+        self.slope = slope
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        require_numpy("LeakyReLU", inputs)
+        self.mask = inputs > 0
+        out = inputs if self.inplace else inputs.astype(np.result_type(inputs, 1.0))
+        np.multiply(out, self.slope, out=out, where=~self.mask)
+        return out
+
+    def backward(self, grad: ndarray) -> ndarray:
+        require_numpy("LeakyReLU", grad)
+        out = grad if self.inplace else grad.copy()
+        np.multiply(out, self.slope, out=out, where=~self.mask)
+        return out
+
+
+class Sigmoid(Activation):
+    """
+    1 / (1 + exp(-x)), computed as 0.5 * (1 + tanh(x / 2)) so it never
+    overflows. Caches only its output, since the derivative is s * (1 - s).
+    """
+
+    cache = ("output",)
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        xp = get_namespace(inputs)
+        if not is_numpy(xp):
+            self.output = 0.5 * (1.0 + xp.tanh(0.5 * inputs))
+            return self.output
+        out = np.multiply(inputs, 0.5, out=self._out(inputs))
+        np.tanh(out, out=out)
+        out += 1.0
+        out *= 0.5
+        self.output = out
+        return out
+
+    def backward(self, grad: ndarray) -> ndarray:
+        if not is_numpy(get_namespace(grad)):
+            return grad * self.output * (1.0 - self.output)
+        out = np.multiply(grad, self.output, out=self._out(grad))
+        out *= 1.0 - self.output
+        return out
+
+
+class Tanh(Activation):
+    """
+    tanh(x). Caches only its output, since the derivative is 1 - tanh^2.
+    """
+
+    cache = ("output",)
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        xp = get_namespace(inputs)
+        if not is_numpy(xp):
+            self.output = xp.tanh(inputs)
+            return self.output
+        self.output = np.tanh(inputs, out=self._out(inputs))
+        return self.output
+
+    def backward(self, grad: ndarray) -> ndarray:
+        if not is_numpy(get_namespace(grad)):
+            return grad * (1.0 - self.output * self.output)
+        # in place, the cached output is no longer needed and holds 1 - t^2
+        local = np.multiply(self.output, self.output, out=self._out(self.output))
+        np.subtract(1.0, local, out=local)
+        return np.multiply(grad, local, out=self._out(grad))
+
+
+class GELU(Activation):
+    """
+    Gaussian error linear unit, with the tanh approximation
+    0.5 x (1 + tanh(sqrt(2/pi) (x + 0.044715 x^3))). The derivative needs
+    the inputs, so they are cached and the forward pass is never in place;
+    `inplace` only applies to `backward`.
+    """
+
+    cache = ("inputs",)
+    inplace_forward = False
+
+    C = np.sqrt(2.0 / np.pi)
+    A = 0.044715
+
+    def _tanh(self, x: ndarray) -> ndarray:
+        return np.tanh(self.C * (x + self.A * x**3))
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        require_numpy("GELU", inputs)
+        self.inputs = inputs
+        return 0.5 * inputs * (1.0 + self._tanh(inputs))
+
+    def backward(self, grad: ndarray) -> ndarray:
+        require_numpy("GELU", grad)
+        x = self.inputs
+        t = self._tanh(x)
+        dt = self.C * (1.0 + 3.0 * self.A * x**2) * (1.0 - t**2)
+        local = 0.5 * (1.0 + t) + 0.5 * x * dt
+        return np.multiply(grad, local, out=self._out(grad))
+
+
+class Softmax(Activation):
+    """
+    Softmax over the last axis, with the maximum subtracted for stability.
+    Caches only its output: the gradient is s * (g - sum(g * s)).
+    """
+
+    cache = ("output",)
+
+    def __call__(self, inputs: ndarray) -> ndarray:
+        require_numpy("Softmax", inputs)
+        out = np.subtract(
+            inputs, inputs.max(axis=-1, keepdims=True), out=self._out(inputs)
+        )
+        np.exp(out, out=out)
+        out /= out.sum(axis=-1, keepdims=True)
+        self.output = out
+        return out
+
+    def backward(self, grad: ndarray) -> ndarray:
+        require_numpy("Softmax", grad)
+        dot = (grad * self.output).sum(axis=-1, keepdims=True)
+        out = np.subtract(grad, dot, out=self._out(grad))
+        out *= self.output
+        return out
@@ -0,0 +1,189 @@
+import importlib
+import numpy as np
+from numpy import ndarray
+from typing import Dict, Iterable, List, Tuple
+from kudzunn.function import Function
+from kudzunn.loss import Loss
+from kudzunn.rng import RNGLike, as_generator
+from kudzunn.sparse import dense
+
+
+class GradcheckError(AssertionError):
+    "Raised when analytical and numerical gradients disagree"
+
+
+def _tolerances(dtype: np.dtype) -> Tuple[float, float, float]:
+    "step, relative and absolute tolerance suited to a floating dtype"
+    if np.dtype(dtype) == np.float32:
+        return 1e-3, 1e-2, 1e-3
+    return 1e-6, 1e-5, 1e-7
+
+
+def _check(numerical: float, analytical: float, rtol: float, atol: float, what):
+    if not np.isclose(numerical, analytical, rtol=rtol, atol=atol):
+        raise GradcheckError(
+            f"{what}: numerical directional derivative {numerical} "
+            f"!= analytical {analytical}"
+        )
+
+
+def gradcheck(
+    func: Function,
+    inputs: ndarray,
+    directions: int = 4,
+    eps: float = None,
+    rtol: float = None,
+    atol: float = None,
+    rng: RNGLike = None,
+) -> bool:
+    """
+    Check `func.backward` against central differences.
+
+    Rather than perturbing one element at a time, each probe perturbs every
+    parameter and every input at once along a random direction v, so it
+    costs two forward calls whatever the number of parameters:
+
+        (L(theta + eps v) - L(theta - eps v)) / (2 eps)  ~  grad L . v
+
+    where L = sum(u * func(inputs)) for a random cotangent u and grad L
+    comes from `backward(u)`. Integer inputs (e.g. ids) and sparse inputs
+    are not perturbed.
+
+    Parameters
+    ----------
+    func: Function
+        The function to check. Its parameters are restored afterwards.
+    inputs: ndarray
+        Where to check
+    directions: int
+        Number of random probes
+    eps: float
+        Finite difference step, by default chosen from the dtype
+    rtol: float
+        Relative tolerance, by default chosen from the dtype
+    atol: float
+        Absolute tolerance, by default chosen from the dtype
+    rng: Generator or int
+        Random generator or seed for the probes
+
+    Returns
+    -------
+    ok: bool
+        True. A mismatch raises `GradcheckError`.
+    """
+    rng = as_generator(rng)
+    floating = isinstance(inputs, ndarray) and np.issubdtype(inputs.dtype, np.floating)
+    defaults = _tolerances(inputs.dtype if floating else np.float64)
+    eps, rtol, atol = (
+        d if v is None else v for v, d in zip((eps, rtol, atol), defaults)
+    )
+    names: List[str] = list(func.params)
+    saved: Dict[str, object] = {n: np.copy(func.params[n]) for n in names}
+
+    out = func(inputs.copy())
+    u = rng.standard_normal(np.shape(out)).astype(np.result_type(out, np.float32))
+    ingrad = func.backward(u.copy())
+    pgrads = {n: np.copy(dense(func.grads[n])) for n in names}
+
+    def loss(sign: float, vin: ndarray, vparams: Dict[str, ndarray]) -> float:
+        for n in names:
+            func.params[n] = saved[n] + sign * eps * vparams[n]
+        x = inputs + sign * eps * vin if floating else inputs.copy()
+        return float(np.sum(u * func(x), dtype=np.float64))
+
+    try:
+        for probe in range(directions):
+            vin = rng.standard_normal(inputs.shape).astype(inputs.dtype)
+            if not floating:
+                vin = np.zeros(inputs.shape)
+            vparams = {
+                n: rng.standard_normal(np.shape(saved[n])).astype(
+                    np.result_type(saved[n], np.float32)
+                )
+                for n in names
+            }
+            analytical = (
+                float(np.sum(ingrad * vin, dtype=np.float64)) if floating else 0
+            )
+            for n in names:
+                analytical += float(np.sum(pgrads[n] * vparams[n], dtype=np.float64))
+            numerical = (loss(1.0, vin, vparams) - loss(-1.0, vin, vparams)) / (2 * eps)
+            _check(
+                numerical,
+                analytical,
+                rtol,
+                atol,
+                f"{type(func).__name__} probe {probe}",
+            )
+    finally:
+        for n in names:
+            func.params[n] = saved[n] if np.ndim(saved[n]) else saved[n].item()
+    return True
+
+
+def losscheck(
+    loss: Loss,
+    predicted: ndarray,
+    actual: ndarray,
+    weights: ndarray = None,
+    directions: int = 4,
+    eps: float = None,
+    rtol: float = None,
+    atol: float = None,
+    rng: RNGLike = None,
+) -> bool:
+    """
+    Check `loss.backward` against central differences along random
+    directions in prediction space, as in `gradcheck`. Replicated losses
+    are summed over replicas.
+
+    Returns
+    -------
+    ok: bool
+        True. A mismatch raises `GradcheckError`.
+    """
+    rng = as_generator(rng)
+    defaults = _tolerances(predicted.dtype)
+    eps, rtol, atol = (
+        d if v is None else v for v, d in zip((eps, rtol, atol), defaults)
+    )
+    grad = loss.backward(predicted, actual, weights)
+    for probe in range(directions):
+        v = rng.standard_normal(predicted.shape).astype(predicted.dtype)
+        up = np.sum(loss(predicted + eps * v, actual, weights), dtype=np.float64)
+        down = np.sum(loss(predicted - eps * v, actual, weights), dtype=np.float64)
+        numerical = float(up - down) / (2 * eps)
+        analytical = float(np.sum(grad * v, dtype=np.float64))
+        _check(
+            numerical, analytical, rtol, atol, f"{type(loss).__name__} probe {probe}"
+        )
+    return True
+
+
+def all_subclasses(cls: type) -> List[type]:
+    "every subclass of `cls`, recursively, in definition order"
+    found = []
+    for sub in cls.__subclasses__():
+        found.append(sub)
+        found.extend(all_subclasses(sub))
+    return found
+
+
+def implementations(base: type, abstract: Iterable[type] = ()) -> List[type]:
+    """
+    Every subclass of `base` defined in the package, after importing all of
+    the package's public modules so none are missed. Classes defined in
+    tests and those listed in `abstract` are left out.
+    """
+    import kudzunn
+
+    for module in sorted(set(kudzunn._LAZY.values())):
+        importlib.import_module(module)
+    skip = set(abstract)
+    return [
+        cls
+        for cls in all_subclasses(base)
+        if cls not in skip
+        and cls.__module__.startswith("kudzunn.")
+        and not cls.__module__.startswith("kudzunn.tests")
+    ]
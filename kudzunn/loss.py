@@ -1,5 +1,15 @@
 import numpy as np
 from numpy import ndarray
+from kudzunn.backend import get_namespace, is_numpy, require_numpy
+
+
+def _buffer(predicted: ndarray, actual: ndarray) -> ndarray:
+    """
+    A gradient buffer for `predicted`, floating even when the predictions
+    or targets are integers (float32 inputs keep float32)
+    """
+    dtype = np.result_type(predicted, actual, 1.0)
+    return np.empty(np.shape(predicted), dtype=dtype)
 
 
 class Loss:
@@ -11,7 +21,9 @@ class Loss:
 
     """
 
-    def __call__(self, predicted: ndarray, actual: ndarray) -> float:
+    def __call__(
+        self, predicted: ndarray, actual: ndarray, weights: ndarray = None
+    ) -> float:
         """
         How the loss is called given the predictions and the ys.
 
@@ -21,6 +33,8 @@ class Loss:
             An array of predictions of the dependent variable
         actual: ndarray
             An array of actual values of the dependent variable
+        weights: ndarray
+            Optional per-sample weights. The loss is then the weighted mean.
 
         Returns
         -------
@@ -31,7 +45,13 @@ class Loss:
         """
         raise NotImplementedError
 
-    def backward(self, predicted: ndarray, actual: ndarray) -> ndarray:
+    def backward(
+        self,
+        predicted: ndarray,
+        actual: ndarray,
+        weights: ndarray = None,
+        out: ndarray = None,
+    ) -> ndarray:
         """
         Gradient of the loss with respect to the prediction function.
 
@@ -41,6 +61,11 @@ class Loss:
             An array of predictions of the dependent variable
         actual: ndarray
             An array of actual values of the dependent variable
+        weights: ndarray
+            Optional per-sample weights
+        out: ndarray
+            Optional array, shaped like `predicted`, to write the gradient
+            into instead of allocating a new one
 
         Returns
         -------
@@ -51,13 +76,51 @@ class Loss:
         raise NotImplementedError
 
 
-class MSE(Loss):
+class PointwiseLoss(Loss):
     """
-    MSE loss. Computes the square of the residual, sums it up over all
-    points and divides by the number of points.
+    Base class for losses that are the mean of a function of each
+    prediction and its actual value. Subclasses provide `pointwise` and
+    `derivative`; this class handles the (weighted) mean, the scaling of the
+    gradient and the replica axis. Subclasses whose `pointwise` and
+    `derivative` work in any array API namespace set `portable`; the
+    others only take NumPy arrays (see `kudzunn.backend`).
+
+    Parameters
+    ----------
+    replicas: bool
+        Treat the first axis of `predicted` as a replica axis (see
+        `ZeroBiasAffine`). The loss is then a `(K,)` array with one mean
+        per replica and the gradient is scaled by the number of points per
+        replica. `actual` may be shared `(N,)` or per replica `(K, N)`.
     """
 
-    def __call__(self, predicted: ndarray, actual: ndarray) -> float:
+    portable = False
+
+    def __init__(self, replicas: bool = False) -> None:
+        self.replicas = replicas
+
+    def pointwise(self, predicted: ndarray, actual: ndarray) -> ndarray:
+        "the loss at every point"
+        raise NotImplementedError
+
+    def derivative(self, predicted: ndarray, actual: ndarray, out: ndarray) -> ndarray:
+        "the derivative of `pointwise` wrt `predicted`, written into `out`"
+        raise NotImplementedError
+
+    def _axes(self, predicted: ndarray):
+        return tuple(range(1, predicted.ndim)) if self.replicas else None
+
+    def _weights(self, predicted: ndarray, weights: ndarray) -> ndarray:
+        xp = get_namespace(predicted)
+        w = xp.asarray(weights)
+        if not self.replicas:
+            # per-sample weights run along the first axis
+            w = xp.reshape(w, w.shape + (1,) * (predicted.ndim - w.ndim))
+        return xp.broadcast_to(w, predicted.shape)
+
+    def __call__(
+        self, predicted: ndarray, actual: ndarray, weights: ndarray = None
+    ) -> float:
         """
         Parameters
         ----------
@@ -65,18 +128,32 @@ class MSE(Loss):
             An array of predictions of the dependent variable
         actual: ndarray
             An array of actual values of the dependent variable
-
+        weights: ndarray
+            Optional per-sample weights
 
         Returns
         -------
 
         loss: float
-            The current value of the loss
-
+            The (weighted) mean of `pointwise`
         """
-        return np.mean((predicted - actual) ** 2)
+        if not self.portable:
+            require_numpy(type(self).__name__, predicted, actual)
+        xp = get_namespace(predicted, actual)
+        losses = self.pointwise(predicted, actual)
+        axes = self._axes(predicted)
+        if weights is None:
+            return xp.mean(losses, axis=axes)
+        w = self._weights(predicted, weights)
+        return xp.sum(w * losses, axis=axes) / xp.sum(w, axis=axes)
 
-    def backward(self, predicted: ndarray, actual: ndarray) -> ndarray:
+    def backward(
+        self,
+        predicted: ndarray,
+        actual: ndarray,
+        weights: ndarray = None,
+        out: ndarray = None,
+    ) -> ndarray:
         """
         Parameters
         ----------
@@ -84,13 +161,256 @@ class MSE(Loss):
             An array of predictions of the dependent variable
         actual: ndarray
             An array of actual values of the dependent variable
+        weights: ndarray
+            Optional per-sample weights
+        out: ndarray
+            Optional array to write the gradient into
+
+        Returns
+        -------
+
+        grads: ndarray
+            `derivative` divided by the number of points, or multiplied by
+            the normalized weights
+        """
+        if not self.portable:
+            require_numpy(type(self).__name__, predicted, actual)
+        if out is None and is_numpy(get_namespace(predicted, actual)):
+            out = _buffer(predicted, actual)
+        out = self.derivative(predicted, actual, out)
+        if weights is None:
+            N = predicted[0, ...].size if self.replicas else predicted.size
+            out *= 1.0 / N
+        else:
+            w = self._weights(predicted, weights)
+            out *= w
+            xp = get_namespace(predicted)
+            out /= xp.sum(w, axis=self._axes(predicted), keepdims=True)
+        return out
+
+
+class MSE(PointwiseLoss):
+    """
+    MSE loss. Computes the square of the residual, sums it up over all
+    points and divides by the number of points.
+
+    Parameters
+    ----------
+    replicas: bool
+        Treat the first axis of `predicted` as a replica axis
+    """
+
+    portable = True
+
+    def pointwise(self, predicted: ndarray, actual: ndarray) -> ndarray:
+        return (predicted - actual) ** 2
+
+    def derivative(self, predicted: ndarray, actual: ndarray, out: ndarray) -> ndarray:
+        """
+        For the squared error the gradient of the loss is 2/N *(residual)
+        """
+        if not is_numpy(get_namespace(predicted, actual)):
+            return 2.0 * (predicted - actual)
+        out = np.subtract(predicted, actual, out=out)
+        out *= 2.0
+        return out
+
+
+class MAE(PointwiseLoss):
+    """
+    Mean absolute error. Robust to outliers; the gradient is the sign of
+    the residual.
+
+    Parameters
+    ----------
+    replicas: bool
+        Treat the first axis of `predicted` as a replica axis
+    """
+
+    def pointwise(self, predicted: ndarray, actual: ndarray) -> ndarray:
+        return np.abs(predicted - actual)
+
+    def derivative(self, predicted: ndarray, actual: ndarray, out: ndarray) -> ndarray:
+        out = np.subtract(predicted, actual, out=out)
+        return np.sign(out, out=out)
+
+
+class Huber(PointwiseLoss):
+    """
+    Huber loss: quadratic for residuals up to `delta`, linear beyond.
+
+    Parameters
+    ----------
+    delta: float
+        Where the loss turns from quadratic to linear
+    replicas: bool
+        Treat the first axis of `predicted` as a replica axis
+    """
+
+    def __init__(self, delta: float = 1.0, replicas: bool = False) -> None:
+        super().__init__(replicas)
+        self.delta = delta
+
+    def pointwise(self, predicted: ndarray, actual: ndarray) -> ndarray:
+        r = np.abs(predicted - actual)
+        quadratic = np.minimum(r, self.delta)
+        # 0.5 q^2 + delta * (r - q) is 0.5 r^2 below delta and linear above
+        return 0.5 * quadratic**2 + self.delta * (r - quadratic)
+
+    def derivative(self, predicted: ndarray, actual: ndarray, out: ndarray) -> ndarray:
+        out = np.subtract(predicted, actual, out=out)
+        return np.clip(out, -self.delta, self.delta, out=out)
+
+
+class LogCosh(PointwiseLoss):
+    """
+    Log-cosh loss, a smooth Huber-like loss. Computed as
+    |r| + log1p(exp(-2|r|)) - log 2 so large residuals do not overflow.
+
+    Parameters
+    ----------
+    replicas: bool
+        Treat the first axis of `predicted` as a replica axis
+    """
+
+    def pointwise(self, predicted: ndarray, actual: ndarray) -> ndarray:
+        r = np.abs(predicted - actual)
+        return r + np.log1p(np.exp(-2.0 * r)) - np.log(2.0)
+
+    def derivative(self, predicted: ndarray, actual: ndarray, out: ndarray) -> ndarray:
+        out = np.subtract(predicted, actual, out=out)
+        return np.tanh(out, out=out)
+
+
+class BinaryCrossEntropy(PointwiseLoss):
+    """
+    Binary cross-entropy for targets in [0, 1].
+
+    Parameters
+    ----------
+    from_logits: bool
+        `predicted` holds logits rather than probabilities. This is the
+        numerically stable choice: the loss is computed as
+        max(z, 0) - z*y + log1p(exp(-|z|)) and the gradient is simply
+        sigmoid(z) - y.
+    eps: float
+        Probabilities are clipped to [eps, 1 - eps] when not from logits
+    replicas: bool
+        Treat the first axis of `predicted` as a replica axis
+    """
+
+    def __init__(
+        self, from_logits: bool = True, eps: float = 1e-12, replicas: bool = False
+    ) -> None:
+        super().__init__(replicas)
+        self.from_logits = from_logits
+        self.eps = eps
+
+    def pointwise(self, predicted: ndarray, actual: ndarray) -> ndarray:
+        if self.from_logits:
+            z = predicted
+            return np.maximum(z, 0) - z * actual + np.log1p(np.exp(-np.abs(z)))
+        p = np.clip(predicted, self.eps, 1 - self.eps)
+        return -(actual * np.log(p) + (1 - actual) * np.log1p(-p))
+
+    def derivative(self, predicted: ndarray, actual: ndarray, out: ndarray) -> ndarray:
+        if self.from_logits:
+            # sigmoid(z) = 0.5 * (1 + tanh(z / 2)) never overflows
+            out = np.multiply(predicted, 0.5, out=out)
+            np.tanh(out, out=out)
+            out += 1.0
+            out *= 0.5
+            out -= actual
+            return out
+        p = np.clip(predicted, self.eps, 1 - self.eps)
+        out = np.subtract(p, actual, out=out)
+        out /= p * (1 - p)
+        return out
+
+
+class SoftmaxCrossEntropy(Loss):
+    """
+    Cross-entropy of a softmax over the last axis of `predicted` (logits of
+    shape `(N, C)`). `actual` is either integer class labels of shape `(N,)`
+    or target probabilities of shape `(N, C)`. Uses log-sum-exp with the
+    maximum logit subtracted, so large logits do not overflow; the gradient
+    is softmax(z) - target.
+    """
+
+    def _log_softmax(self, predicted: ndarray) -> ndarray:
+        shifted = predicted - predicted.max(axis=-1, keepdims=True)
+        shifted -= np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+        return shifted
+
+    def _per_sample(self, predicted: ndarray, actual: ndarray) -> ndarray:
+        logp = self._log_softmax(predicted)
+        if actual.ndim == predicted.ndim:
+            return -(actual * logp).sum(axis=-1)
+        return -np.take_along_axis(logp, actual[..., None], axis=-1)[..., 0]
+
+    def __call__(
+        self, predicted: ndarray, actual: ndarray, weights: ndarray = None
+    ) -> float:
+        """
+        Parameters
+        ----------
+        predicted: ndarray
+            Logits, shape `(N, C)`
+        actual: ndarray
+            Labels `(N,)` or target probabilities `(N, C)`
+        weights: ndarray
+            Optional per-sample weights, shape `(N,)`
+
+        Returns
+        -------
+
+        loss: float
+            The (weighted) mean cross-entropy
+        """
+        require_numpy("SoftmaxCrossEntropy", predicted, actual)
+        losses = self._per_sample(predicted, actual)
+        if weights is None:
+            return np.mean(losses)
+        return np.sum(weights * losses) / np.sum(weights)
+
+    def backward(
+        self,
+        predicted: ndarray,
+        actual: ndarray,
+        weights: ndarray = None,
+        out: ndarray = None,
+    ) -> ndarray:
+        """
+        Parameters
+        ----------
+        predicted: ndarray
+            Logits, shape `(N, C)`
+        actual: ndarray
+            Labels `(N,)` or target probabilities `(N, C)`
+        weights: ndarray
+            Optional per-sample weights, shape `(N,)`
+        out: ndarray
+            Optional `(N, C)` array to write the gradient into
 
         Returns
         -------
 
         grads: ndarray
-            The gradient of the loss with respect to the function. For
-            the squared error this loss is 2/N *(residual)
+            (softmax(z) - target) / N, or weighted
         """
-        N = actual.shape[0]
-        return (2.0 / N) * (predicted - actual)
+        require_numpy("SoftmaxCrossEntropy", predicted, actual)
+        if out is None:
+            out = _buffer(predicted, predicted)
+        out = np.subtract(predicted, predicted.max(axis=-1, keepdims=True), out=out)
+        np.exp(out, out=out)
+        out /= out.sum(axis=-1, keepdims=True)
+        if actual.ndim == predicted.ndim:
+            out -= actual
+        else:
+            rows = np.arange(len(actual))
+            out[rows, actual] -= 1.0
+        if weights is None:
+            out /= predicted.shape[0]
+        else:
+            out *= (weights / np.sum(weights))[:, None]
+        return out
@@ -0,0 +1,308 @@
+import copy
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from numpy import ndarray
+from kudzunn.callbacks import Callback
+from kudzunn.function import Function
+
+if TYPE_CHECKING:
+    from kudzunn.train import Learner
+
+Batches = Union[Iterable[Tuple[ndarray, ndarray]], Tuple[ndarray, ndarray]]
+
+
+class Metric:
+    """
+    Abstract Class for streaming metrics. A metric accumulates sufficient
+    statistics batch by batch with `update`; accumulators computed on
+    different batches, threads or processes combine with `merge`, and
+    `result` turns the statistics into the value of the metric.
+
+    `STATS` names the attributes holding the statistics, which `merge`
+    adds up.
+    """
+
+    STATS: Tuple[str, ...] = ()
+
+    def reset(self) -> None:
+        "Forget everything seen"
+        raise NotImplementedError
+
+    def update(self, predicted: ndarray, actual: ndarray) -> None:
+        """
+        Add a batch.
+
+        Parameters
+        ----------
+        predicted: ndarray
+            Predictions of the dependent variable
+        actual: ndarray
+            Actual values of the dependent variable
+        """
+        raise NotImplementedError
+
+    def merge(self, other: "Metric") -> "Metric":
+        """
+        Fold in an accumulator of the same metric.
+
+        Returns
+        -------
+        metric: Metric
+            self, for chaining
+        """
+        for name, value in vars(other).items():
+            if name in self.STATS:
+                setattr(self, name, getattr(self, name) + value)
+        return self
+
+    def result(self) -> float:
+        "The value of the metric over everything seen, NaN if nothing was"
+        raise NotImplementedError
+
+    def empty(self) -> "Metric":
+        "A fresh accumulator with the same settings"
+        new = copy.copy(self)
+        new.reset()
+        return new
+
+
+class MeanSquaredError(Metric):
+    "Mean squared error"
+
+    STATS = ("n", "sse")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.n = 0
+        self.sse = 0.0
+
+    def update(self, predicted: ndarray, actual: ndarray) -> None:
+        r = predicted - actual
+        self.n += r.size
+        self.sse += float(np.vdot(r, r))
+
+    def result(self) -> float:
+        return self.sse / self.n if self.n else np.nan
+
+
+class MeanAbsoluteError(Metric):
+    "Mean absolute error"
+
+    STATS = ("n", "sae")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.n = 0
+        self.sae = 0.0
+
+    def update(self, predicted: ndarray, actual: ndarray) -> None:
+        self.n += np.size(actual)
+        self.sae += float(np.abs(predicted - actual).sum())
+
+    def result(self) -> float:
+        return self.sae / self.n if self.n else np.nan
+
+
+class R2Score(Metric):
+    """
+    Coefficient of determination, 1 - SSE / SST, from the sums of y, y^2
+    and squared residuals.
+    """
+
+    STATS = ("n", "sy", "syy", "sse")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.n = 0
+        self.sy = 0.0
+        self.syy = 0.0
+        self.sse = 0.0
+
+    def update(self, predicted: ndarray, actual: ndarray) -> None:
+        r = predicted - actual
+        self.n += np.size(actual)
+        self.sy += float(np.sum(actual))
+        self.syy += float(np.vdot(actual, actual))
+        self.sse += float(np.vdot(r, r))
+
+    def result(self) -> float:
+        if not self.n:
+            return np.nan
+        sst = self.syy - self.sy**2 / self.n
+        return 1.0 - self.sse / sst
+
+
+class AUC(Metric):
+    """
+    Area under the ROC curve for binary targets, from histograms of the
+    scores of the positives and of the negatives. Merging adds histograms,
+    so memory does not grow with the data; scores within a bin count as
+    ties, which bounds the error by the mass sharing bins.
+
+    Parameters
+    ----------
+    bins: int
+        Number of score bins on [0, 1]
+    from_logits: bool
+        Scores are logits and go through a sigmoid first. Otherwise they
+        must be probabilities in [0, 1].
+    """
+
+    STATS = ("pos", "neg")
+
+    def __init__(self, bins: int = 1000, from_logits: bool = False) -> None:
+        self.bins = bins
+        self.from_logits = from_logits
+        self.reset()
+
+    def reset(self) -> None:
+        self.pos = np.zeros(self.bins)
+        self.neg = np.zeros(self.bins)
+
+    def update(self, predicted: ndarray, actual: ndarray) -> None:
+        scores = np.ravel(predicted)
+        if self.from_logits:
+            scores = 0.5 * (1.0 + np.tanh(0.5 * scores))
+        elif scores.size and (scores.min() < 0.0 or scores.max() > 1.0):
+            raise ValueError("AUC scores must be in [0, 1]; use from_logits=True")
+        b = np.minimum((scores * self.bins).astype(np.intp), self.bins - 1)
+        positive = np.ravel(actual) > 0.5
+        self.pos += np.bincount(b[positive], minlength=self.bins)
+        self.neg += np.bincount(b[~positive], minlength=self.bins)
+
+    def result(self) -> float:
+        # a positive beats every negative in a lower bin and ties its own
+        below = np.cumsum(self.neg) - self.neg
+        wins = np.sum(self.pos * (below + 0.5 * self.neg))
+        pairs = self.pos.sum() * self.neg.sum()
+        return float(wins / pairs) if pairs else np.nan
+
+
+def evaluate(
+    func: Function, batches: Batches, metrics: Dict[str, Metric]
+) -> Dict[str, float]:
+    """
+    Run `func` over `(x, y)` batches and compute metrics.
+
+    Parameters
+    ----------
+    func: Function
+        The function to evaluate
+    batches: Iterable or (ndarray, ndarray)
+        A `Dataloader` or other iterable of batches, or a single `(x, y)`
+    metrics: Dict[str, Metric]
+        Accumulators, updated in place
+
+    Returns
+    -------
+    results: Dict[str, float]
+        The result of every metric
+    """
+    if isinstance(batches, tuple):
+        batches = [batches]
+    for x, y in batches:
+        predicted = func(x)
+        for metric in metrics.values():
+            metric.update(predicted, y)
+    return {name: metric.result() for name, metric in metrics.items()}
+
+
+class MetricsCallback(Callback):
+    """
+    A metrics callback. Updates streaming metrics on the training batches
+    (cheap reductions over `learner.predicted` and `learner.targets`), and
+    at the end of every `every`-th epoch evaluates the metrics on
+    validation data in the background, against a snapshot of the function,
+    so the training loop carries on meanwhile. `fit_end` waits for the
+    evaluations still running.
+
+    Results go to `history`, one dict per epoch with "train_<name>" keys
+    and, once evaluated, "val_<name>" keys.
+
+    Parameters
+    ----------
+    learner: Learner
+        The learner to watch
+    metrics: Dict[str, Metric]
+        Name to metric; fresh copies are made with `Metric.empty`
+    validation: Iterable or (ndarray, ndarray)
+        Validation batches, e.g. a `Dataloader`, or `None`
+    every: int
+        Epochs between validation runs
+    executor: Executor
+        Runs the validation. By default one background thread, since
+        NumPy releases the GIL in large array operations. A process pool
+        works too if the function and data pickle.
+    """
+
+    def __init__(
+        self,
+        learner: "Learner",
+        metrics: Dict[str, Metric],
+        validation: Optional[Batches] = None,
+        every: int = 1,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        super().__init__(learner)
+        self.metrics = metrics
+        self.validation = validation
+        self.every = every
+        self.owned = executor is None
+        self.executor = executor
+        self.history: List[Dict[str, float]] = []
+        self.pending: List[Tuple[Dict[str, float], Future]] = []
+
+    def fit_start(self) -> bool:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.history = []
+        self.pending = []
+        return True
+
+    def epoch_start(self, epoch: int) -> bool:
+        self.epoch = epoch
+        self.train = {name: m.empty() for name, m in self.metrics.items()}
+        return True
+
+    def after_loss(self, loss: float) -> bool:
+        for metric in self.train.values():
+            metric.update(self.learner.predicted, self.learner.targets)
+        return True
+
+    def epoch_end(self) -> bool:
+        row = {f"train_{name}": m.result() for name, m in self.train.items()}
+        self.history.append(row)
+        if self.validation is not None and (self.epoch + 1) % self.every == 0:
+            snapshot = copy.deepcopy(self.learner.func)
+            snapshot.release()
+            fresh = {name: m.empty() for name, m in self.metrics.items()}
+            future = self.executor.submit(evaluate, snapshot, self.validation, fresh)
+            self.pending.append((row, future))
+        self._collect(wait=False)
+        return True
+
+    def _collect(self, wait: bool) -> None:
+        "record finished evaluations, re-raising any that failed"
+        pending = []
+        for row, future in self.pending:
+            if wait or future.done():
+                row.update({f"val_{k}": v for k, v in future.result().items()})
+            else:
+                pending.append((row, future))
+        self.pending = pending
+
+    def fit_end(self) -> bool:
+        try:
+            self._collect(wait=True)
+        finally:
+            if self.owned:
+                self.executor.shutdown()
+                self.executor = None
+        return True
@@ -0,0 +1,188 @@
+import hashlib
+import threading
+import numpy as np
+from numpy import ndarray
+from typing import Dict, Iterable, Tuple
+from kudzunn.function import Function
+
+
+class RunningStats:
+    """
+    Streaming mean and variance along the first axis.
+
+    Each batch is reduced with vectorized NumPy calls and folded into the
+    running totals with Chan et al.'s parallel form of Welford's update,
+    which is also how two `RunningStats` computed on different shards (or
+    in different workers) are merged.
+    """
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _combine(self, n: int, mean, m2) -> None:
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta**2 * (self.n * n / total)
+        self.n = total
+
+    def update(self, batch: ndarray) -> "RunningStats":
+        """
+        Add a batch of observations.
+
+        Parameters
+        ----------
+        batch: ndarray
+            Observations along the first axis
+
+        Returns
+        -------
+        stats: RunningStats
+            self, for chaining
+        """
+        n = len(batch)
+        if n:
+            mean = batch.mean(axis=0)
+            m2 = ((batch - mean) ** 2).sum(axis=0)
+            self._combine(n, mean, m2)
+        return self
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """
+        Fold in statistics computed on another shard of the data.
+
+        Returns
+        -------
+        stats: RunningStats
+            self, for chaining
+        """
+        if other.n:
+            self._combine(other.n, other.mean, other.m2)
+        return self
+
+    @property
+    def var(self):
+        "the population variance"
+        return self.m2 / self.n
+
+    @property
+    def std(self):
+        "the population standard deviation"
+        return np.sqrt(self.var)
+
+
+class Normalizer:
+    """
+    A `Dataloader` transform that standardizes x and/or y per batch.
+
+    Statistics come from one streaming pass (`fit`) so the dataset is
+    never copied. Batches are written into buffers that are reused from
+    batch to batch, so a returned batch is only valid until the next one
+    is produced. Every thread has its own buffers, so one normalizer can
+    serve the training loader and a validation loader run in the
+    background by `MetricsCallback`.
+
+    Parameters
+    ----------
+    x: bool
+        Standardize the inputs
+    y: bool
+        Standardize the targets
+    eps: float
+        Added to the standard deviation to avoid dividing by zero
+    """
+
+    def __init__(self, x: bool = True, y: bool = True, eps: float = 1e-12) -> None:
+        self.x = x
+        self.y = y
+        self.eps = eps
+        self.xstats = RunningStats()
+        self.ystats = RunningStats()
+        self.buffers: Dict[Tuple, ndarray] = {}
+
+    def fit(self, batches: Iterable[Tuple[ndarray, ndarray]]) -> "Normalizer":
+        """
+        Compute the statistics in one pass over `(x, y)` batches, e.g. a
+        `Dataloader` without this transform.
+
+        Returns
+        -------
+        normalizer: Normalizer
+            self, for chaining
+        """
+        for x, y in batches:
+            self.xstats.update(x)
+            self.ystats.update(y)
+        return self
+
+    def merge(self, other: "Normalizer") -> "Normalizer":
+        "Fold in statistics fitted on another shard of the data"
+        self.xstats.merge(other.xstats)
+        self.ystats.merge(other.ystats)
+        return self
+
+    def cache_key(self) -> str:
+        "identifies the fitted statistics, for `kudzunn.cache`"
+        parts = [self.x, self.y, self.eps]
+        for stats in (self.xstats, self.ystats):
+            parts += [stats.n, np.asarray(stats.mean).tobytes()]
+            parts.append(np.asarray(stats.m2).tobytes())
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def _scale(self, stats: RunningStats):
+        return stats.std + self.eps
+
+    def _standardize(self, name: str, arr: ndarray, stats: RunningStats) -> ndarray:
+        dtype = np.result_type(arr, np.float64)
+        key = (threading.get_ident(), name, arr.shape, dtype)
+        out = self.buffers.get(key)
+        if out is None:
+            out = self.buffers[key] = np.empty(arr.shape, dtype=dtype)
+        np.subtract(arr, stats.mean, out=out)
+        out /= self._scale(stats)
+        return out
+
+    def __call__(self, x: ndarray, y: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Standardize a batch.
+
+        Returns
+        -------
+        xy: (ndarray, ndarray)
+            The standardized batch, in reused buffers
+        """
+        if self.x:
+            x = self._standardize("x", x, self.xstats)
+        if self.y:
+            y = self._standardize("y", y, self.ystats)
+        return x, y
+
+    def inverse_y(self, y: ndarray) -> ndarray:
+        "Map standardized targets (or predictions) back to original units"
+        if not self.y:
+            return y
+        return y * self._scale(self.ystats) + self.ystats.mean
+
+    def predict(self, func: Function, x: ndarray) -> ndarray:
+        """
+        Predict in original units with a function trained on normalized
+        batches: standardize x, call the function, and undo the target
+        standardization.
+
+        Parameters
+        ----------
+        func: Function
+            The trained function
+        x: ndarray
+            Inputs in original units
+
+        Returns
+        -------
+        predicted: ndarray
+            Predictions in original units
+        """
+        if self.x:
+            x = (x - self.xstats.mean) / self._scale(self.xstats)
+        return self.inverse_y(func(x))
@@ -1,8 +1,136 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from kudzunn.backend import get_namespace, is_numpy, require_numpy
+from kudzunn.sparse import SparseGrad, dense
+
+
 class Optimizer:
     """
     Abstract Class for Optimizer.
+
+    Regularization and gradient clipping live here so every optimizer gets
+    them: `step` implementations iterate over `regularized(func)` instead of
+    `func.params_and_grads()`. The global norm is one reduction per
+    parameter, and clipping, scaling and the penalty terms are then applied
+    to each gradient in the same single pass.
+
+    A `kudzunn.sparse.SparseGrad` is regularized lazily: the penalties only
+    apply to the rows it touches, and `step` implementations should update
+    just those rows.
+
+    Parameters
+    ----------
+    weight_decay: float
+        L2 penalty coefficient
+    decoupled: bool
+        Apply weight decay directly to the parameters (AdamW style, see
+        `decay`) instead of adding it to the gradient
+    l1: float
+        L1 penalty coefficient, adds l1 * sign(param) to the gradient
+    clip_norm: float
+        Rescale all gradients together so their global L2 norm is at most
+        this. For replicated functions (see `ZeroBiasAffine`) every replica
+        is clipped by its own norm along the leading axis, so one diverging
+        replica does not slow the others; `grad_norm` is then the norm
+        over all of them.
+    clip_value: float
+        Clip every gradient element to [-clip_value, clip_value]
     """
 
+    def __init__(
+        self,
+        weight_decay: float = 0.0,
+        decoupled: bool = False,
+        l1: float = 0.0,
+        clip_norm: Optional[float] = None,
+        clip_value: Optional[float] = None,
+    ) -> None:
+        self.weight_decay = weight_decay
+        self.decoupled = decoupled
+        self.l1 = l1
+        self.clip_norm = clip_norm
+        self.clip_value = clip_value
+        self.grad_norm: Optional[float] = None
+        self.state: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def slot(self, name: str, key: str, param) -> np.ndarray:
+        "per-parameter optimizer state such as momentum, zeros at first"
+        if (name, key) not in self.state:
+            xp = get_namespace(param)
+            self.state[(name, key)] = xp.zeros_like(xp.asarray(param, dtype=xp.float64))
+        return self.state[(name, key)]
+
+    def regularized(self, func) -> List[Tuple]:
+        """
+        The parameters of `func` with clipped and penalized gradients.
+
+        Parameters
+        ----------
+        func: Function
+            The function whose parameters need to be stepped
+
+        Returns
+        -------
+        pglist: List
+            (name, param, grad) tuples, like `func.params_and_grads()`
+        """
+        pglist = func.params_and_grads()
+        scale = 1.0
+        if self.clip_norm is not None and getattr(func, "replicas", None):
+            scale = self._replica_scale([grad for _, _, grad in pglist])
+        elif self.clip_norm is not None:
+            values = [_values(grad) for _, _, grad in pglist]
+            self.grad_norm = float(np.sqrt(sum(_sqnorm(v) for v in values)))
+            if self.grad_norm > self.clip_norm:
+                scale = self.clip_norm / self.grad_norm
+        l2 = 0.0 if self.decoupled else self.weight_decay
+        if (
+            np.ndim(scale) == 0
+            and scale == 1.0
+            and not (l2 or self.l1 or self.clip_value is not None)
+        ):
+            return pglist
+        out = []
+        for name, param, grad in pglist:
+            xp = get_namespace(param, _values(grad))
+            values = _values(grad)
+            values = values * (
+                scale if np.ndim(scale) == 0 else _rows(xp, scale, values)
+            )
+            touched = param[grad.rows] if isinstance(grad, SparseGrad) else param
+            if not is_numpy(xp):
+                # a Python float parameter with gradients of another library
+                touched = xp.asarray(touched)
+            if self.clip_value is not None:
+                values = xp.clip(values, -self.clip_value, self.clip_value)
+            if l2:
+                values = values + l2 * touched
+            if self.l1:
+                values = values + self.l1 * xp.sign(touched)
+            if isinstance(grad, SparseGrad):
+                values = SparseGrad(grad.rows, values, grad.shape)
+            out.append((name, param, values))
+        return out
+
+    def _replica_scale(self, grads):
+        "per-replica clipping factors, `1.0` when no replica is clipped"
+        xp = get_namespace(*grads)
+        sqnorms = sum(xp.sum(g * g, axis=tuple(range(1, g.ndim))) for g in grads)
+        norms = xp.sqrt(sqnorms)
+        self.grad_norm = float(xp.sqrt(xp.sum(sqnorms)))
+        if not float(xp.max(norms)) > self.clip_norm:
+            return 1.0
+        capped = xp.where(
+            norms > self.clip_norm, norms, xp.full_like(norms, self.clip_norm)
+        )
+        return self.clip_norm / capped
+
+    def decay(self, param, lr):
+        "shrink a parameter by decoupled weight decay, if enabled"
+        if self.decoupled and self.weight_decay:
+            return param * (1.0 - lr * self.weight_decay)
+        return param
+
     def step(self, func) -> None:
         """
         Parameters
@@ -13,6 +141,24 @@ class Optimizer:
         raise NotImplementedError
 
 
+def _sqnorm(values) -> float:
+    "the squared L2 norm of dense gradient values"
+    xp = get_namespace(values)
+    if is_numpy(xp):
+        return np.vdot(values, values)
+    return float(xp.sum(values * values))
+
+
+def _rows(xp, scale, values):
+    "a (K,) `scale` shaped to broadcast along the leading axis of `values`"
+    return xp.reshape(scale, (-1,) + (1,) * (values.ndim - 1))
+
+
+def _values(grad):
+    "the stored values of a dense or sparse gradient"
+    return grad.values if isinstance(grad, SparseGrad) else grad
+
+
 class GD(Optimizer):
     """
     Gradient Descent Optimizer.
@@ -20,12 +166,27 @@ class GD(Optimizer):
     Parameters
     ----------
     lr: float
-        The learing rate to scale the gradient with
+        The learing rate to scale the gradient with. For replicated
+        functions this may be a `(K,)` array, one rate per replica.
+    momentum: float
+        Heavy ball momentum. With sparse gradients the velocity of a row
+        only decays when the row is touched.
+    inplace: bool
+        Update array parameters in place instead of assigning new arrays,
+        so that parameters in shared memory see the update (see
+        `kudzunn.parallel.train_async`)
+    kwargs:
+        Regularization and clipping settings, see `Optimizer`
 
     """
 
-    def __init__(self, lr: float = 0.001):
+    def __init__(
+        self, lr: float = 0.001, momentum: float = 0.0, inplace: bool = False, **kwargs
+    ):
+        super().__init__(**kwargs)
         self.lr = lr
+        self.momentum = momentum
+        self.inplace = inplace
 
     def step(self, func) -> None:
         """
@@ -36,5 +197,164 @@ class GD(Optimizer):
         func: Function
             The function whose parameters need to be stepped
         """
-        for name, param, grad in func.params_and_grads():
-            func.params[name] = param - self.lr * grad
+        for name, param, grad in self.regularized(func):
+            if isinstance(grad, SparseGrad):
+                # update only the touched rows, in place
+                rows, values = grad.rows, grad.values
+                if self.momentum:
+                    velocity = self.slot(name, "velocity", param)
+                    values = velocity[rows] = self.momentum * velocity[rows] + values
+                param[rows] = self.decay(param[rows], self.lr) - self.lr * values
+            else:
+                if self.momentum:
+                    velocity = self.slot(name, "velocity", param)
+                    velocity *= self.momentum
+                    velocity += grad
+                    grad = velocity
+                if self.inplace and isinstance(param, np.ndarray):
+                    np.subtract(self.decay(param, self.lr), self.lr * grad, out=param)
+                else:
+                    func.params[name] = self.decay(param, self.lr) - self.lr * grad
+
+
+class Adam(Optimizer):
+    """
+    Adam: steps by running means of the gradient and of its square, with
+    their bias corrected. With `decoupled=True` weight decay makes it AdamW.
+
+    Sparse gradients get lazy updates: only the touched rows of the moments
+    and of the parameter change, so a step costs the number of rows in the
+    batch, however large the table. The bias correction uses the global
+    step count.
+
+    Parameters
+    ----------
+    lr: float
+        The step size
+    betas: (float, float)
+        Decay rates of the first and second moment estimates
+    eps: float
+        Added to the root of the second moment to avoid dividing by zero
+    kwargs:
+        Regularization and clipping settings, see `Optimizer`
+    """
+
+    def __init__(
+        self,
+        lr: float = 0.001,
+        betas: Tuple[float, float] = (0.9, 0.999),
+        eps: float = 1e-8,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.lr = lr
+        self.betas = betas
+        self.eps = eps
+        self.t = 0
+
+    def _update(self, m, v, grad) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        "new moments from the old ones, and the step to take"
+        b1, b2 = self.betas
+        m = b1 * m + (1 - b1) * grad
+        v = b2 * v + (1 - b2) * grad * grad
+        mhat = m / (1 - b1**self.t)
+        vhat = v / (1 - b2**self.t)
+        return m, v, self.lr * mhat / (np.sqrt(vhat) + self.eps)
+
+    def step(self, func) -> None:
+        """
+        Makes an Adam step for all parameters
+
+        Parameters
+        ----------
+        func: Function
+            The function whose parameters need to be stepped
+        """
+        require_numpy("Adam", *func.params.values(), *func.grads.values())
+        self.t += 1
+        for name, param, grad in self.regularized(func):
+            m, v = self.slot(name, "m", param), self.slot(name, "v", param)
+            if isinstance(grad, SparseGrad):
+                rows = grad.rows
+                m[rows], v[rows], update = self._update(m[rows], v[rows], grad.values)
+                param[rows] = self.decay(param[rows], self.lr) - update
+            else:
+                m[...], v[...], update = self._update(m, v, grad)
+                func.params[name] = self.decay(param, self.lr) - update
+
+
+class LBFGS(Optimizer):
+    """
+    Limited-memory BFGS. Keeps the last `history` parameter and gradient
+    differences and uses the two-loop recursion to turn the gradient into a
+    quasi-Newton direction. There is no line search: the step is `lr` times
+    that direction, so this is meant for full-batch (or large-batch)
+    training of smooth losses.
+
+    Parameters
+    ----------
+    lr: float
+        Step length along the quasi-Newton direction
+    history: int
+        Number of correction pairs to keep
+    kwargs:
+        Regularization and clipping settings, see `Optimizer`
+    """
+
+    def __init__(self, lr: float = 1.0, history: int = 10, **kwargs):
+        super().__init__(**kwargs)
+        self.lr = lr
+        self.history = history
+        self.pairs: List[Tuple[np.ndarray, np.ndarray, float]] = []
+        self.prev: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def direction(self, grad: np.ndarray) -> np.ndarray:
+        "the two-loop recursion: -H grad from the stored pairs"
+        q = grad.copy()
+        alphas = []
+        for s, y, rho in reversed(self.pairs):
+            alpha = rho * (s @ q)
+            q -= alpha * y
+            alphas.append(alpha)
+        if self.pairs:
+            s, y, _ = self.pairs[-1]
+            q *= (s @ y) / (y @ y)
+        else:
+            # no curvature yet: a cautious gradient step
+            q *= min(1.0, 1.0 / max(np.abs(grad).sum(), 1e-12))
+        for (s, y, rho), alpha in zip(self.pairs, reversed(alphas)):
+            beta = rho * (y @ q)
+            q += (alpha - beta) * s
+        return -q
+
+    def step(self, func) -> None:
+        """
+        Makes an L-BFGS step for all parameters
+
+        Parameters
+        ----------
+        func: Function
+            The function whose parameters need to be stepped
+        """
+        require_numpy("LBFGS", *func.params.values(), *func.grads.values())
+        pglist = self.regularized(func)
+        x = np.concatenate([np.ravel(param) for _, param, _ in pglist])
+        g = np.concatenate([np.ravel(dense(grad)) for _, _, grad in pglist])
+        if self.prev is not None:
+            s, y = x - self.prev[0], g - self.prev[1]
+            sy = s @ y
+            # skip pairs without positive curvature to keep H positive definite
+            if sy > 1e-10:
+                self.pairs.append((s, y, 1.0 / sy))
+                del self.pairs[: -self.history]
+        self.prev = (x, g)
+        x = x + self.lr * self.direction(g)
+        start = 0
+        for name, param, _ in pglist:
+            size = np.size(param)
+            value = x[start : start + size]
+            start += size
+            if isinstance(param, np.ndarray):
+                func.params[name] = self.decay(value.reshape(param.shape), self.lr)
+            else:
+                func.params[name] = float(self.decay(value[0], self.lr))
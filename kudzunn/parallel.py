@@ -0,0 +1,303 @@
+import copy
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from kudzunn.callbacks import Callback
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import Function
+from kudzunn.rng import RNGLike, spawn
+from kudzunn.train import Learner
+
+
+class SharedData:
+    """
+    A picklable handle to a `Data` whose arrays live in `.npy` files.
+
+    Worker processes call `data()` to map the arrays read-only, so every
+    worker shares the page-cached copy instead of receiving its own pickled
+    copy of the dataset.
+
+    Parameters
+    ----------
+    data: Data
+        The data to share
+    directory: str
+        Where to write the arrays. A temporary directory, removed by
+        `close`, is used if not given.
+    """
+
+    def __init__(self, data: Data, directory: str = None) -> None:
+        self.owned = directory is None
+        self.directory = (
+            tempfile.mkdtemp(prefix="kudzunn-") if self.owned else directory
+        )
+        self.xpath = os.path.join(self.directory, "x.npy")
+        self.ypath = os.path.join(self.directory, "y.npy")
+        np.save(self.xpath, data.x)
+        np.save(self.ypath, data.y)
+
+    def data(self) -> Data:
+        """
+        Map the shared arrays read-only.
+
+        Returns
+        -------
+        data: Data
+            A `Data` backed by the shared files
+        """
+        x = np.load(self.xpath, mmap_mode="r")
+        y = np.load(self.ypath, mmap_mode="r")
+        return Data(x, y)
+
+    def close(self) -> None:
+        "Remove the files if we created them"
+        if self.owned:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> "SharedData":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SharedParams:
+    """
+    A picklable handle to the parameters of a `Function`, copied into
+    `.npy` files that worker processes map read-write. Scalar parameters
+    are stored as 0-d arrays so they can be updated in place too.
+
+    Parameters
+    ----------
+    func: Function
+        The function whose parameters to share
+    directory: str
+        Where to write the arrays. A temporary directory, removed by
+        `close`, is used if not given.
+    """
+
+    def __init__(self, func: Function, directory: str = None) -> None:
+        self.owned = directory is None
+        self.directory = (
+            tempfile.mkdtemp(prefix="kudzunn-") if self.owned else directory
+        )
+        # parameter names may hold dots ("0.w"), so files are numbered
+        self.paths = {
+            name: os.path.join(self.directory, f"param{i}.npy")
+            for i, name in enumerate(func.params)
+        }
+        self.scalars = {name for name in func.params if np.ndim(func.params[name]) == 0}
+        for name, path in self.paths.items():
+            np.save(path, np.asarray(func.params[name], dtype=np.float64))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        "Map the shared parameters read-write"
+        return {
+            name: np.load(path, mmap_mode="r+") for name, path in self.paths.items()
+        }
+
+    def attach(self, func: Function) -> Dict[str, np.ndarray]:
+        """
+        Point the parameters of `func` at the shared arrays.
+
+        Returns
+        -------
+        arrays: Dict[str, ndarray]
+            The shared arrays
+        """
+        arrays = self.arrays()
+        for name, arr in arrays.items():
+            func.params[name] = arr
+        return arrays
+
+    def load(self, func: Function) -> None:
+        "Copy the shared values back into ordinary parameters of `func`"
+        for name, arr in self.arrays().items():
+            func.params[name] = float(arr) if name in self.scalars else np.array(arr)
+
+    def close(self) -> None:
+        "Remove the files if we created them"
+        if self.owned:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> "SharedParams":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# set in each worker by `_init_worker`; a lock can only reach a process
+# when it is created
+_LOCK = None
+
+
+def _init_worker(lock) -> None:
+    global _LOCK
+    _LOCK = lock
+
+
+class _SyncCallback(Callback):
+    """
+    Bounded staleness: train on a private copy of the parameters and every
+    `every` batches add the change since the last sync to the shared
+    parameters, under a lock, then continue from the shared values.
+    """
+
+    def __init__(
+        self, learner: Learner, shared: Dict[str, np.ndarray], every: int, lock
+    ) -> None:
+        super().__init__(learner)
+        self.shared = shared
+        self.every = every
+        self.lock = lock
+
+    def _pull(self) -> None:
+        self.snapshot = {name: np.array(arr) for name, arr in self.shared.items()}
+        for name, value in self.snapshot.items():
+            self.learner.func.params[name] = value.copy()
+
+    def _push(self) -> None:
+        params = self.learner.func.params
+        with self.lock:
+            for name, arr in self.shared.items():
+                arr += params[name] - self.snapshot[name]
+            self._pull()
+
+    def fit_start(self) -> bool:
+        self.batches = 0
+        with self.lock:
+            self._pull()
+        return True
+
+    def batch_end(self) -> bool:
+        self.batches += 1
+        if self.batches % self.every == 0:
+            self._push()
+        return True
+
+    def fit_end(self) -> bool:
+        if self.batches % self.every:
+            self._push()
+        return True
+
+
+def _async_worker(
+    learner: Learner,
+    data: SharedData,
+    params: SharedParams,
+    index: int,
+    workers: int,
+    bs: int,
+    sync_every: Optional[int],
+    rng: np.random.Generator,
+    lock=None,
+) -> float:
+    # in a pool the lock comes from `_init_worker`, since a process lock
+    # cannot be pickled with the task
+    lock = _LOCK if lock is None else lock
+    full = data.data()
+    # a strided view of the memory map: this worker's shard, not a copy
+    shard = Data(full.x[index::workers], full.y[index::workers], shuffle=False)
+    dl = Dataloader(shard, Sampler(shard, bs, shuffle=True, rng=rng))
+    if sync_every is None:
+        params.attach(learner.func)
+        learner.opt.inplace = True
+    else:
+        learner.set_callbacks(
+            [_SyncCallback(learner, params.arrays(), sync_every, lock)]
+        )
+    return float(np.mean(learner.train_loop(dl)))
+
+
+def train_async(
+    learner: Learner,
+    data: Data,
+    bs: int,
+    workers: int = 2,
+    sync_every: Optional[int] = None,
+    seed: RNGLike = None,
+) -> List[float]:
+    """
+    Asynchronous data-parallel training over local processes.
+
+    Every worker trains a copy of `learner` on its own shard of the data
+    (every `workers`-th point) against parameters in shared memory:
+
+    - `sync_every=None` is Hogwild: workers update the shared parameters
+      in place, without locks. Updates may overwrite each other, which
+      costs little when they are small or, for sparse models such as
+      `Embedding` or `Linear` on CSR inputs, rarely touch the same rows.
+    - `sync_every=k` bounds the staleness: a worker trains k batches on a
+      private copy and then adds its change to the shared parameters
+      under a lock and picks up everyone else's. This plays the role of a
+      parameter server without a separate process.
+
+    The trained parameters are copied back into `learner.func`.
+
+    Parameters
+    ----------
+    learner: Learner
+        Copied to every worker. In Hogwild mode its optimizer must support
+        in-place updates (`GD`).
+    data: Data
+        The training data, shared read-only like in `SharedData`
+    bs: int
+        Batch size in every worker
+    workers: int
+        Number of processes. `0` trains in this process on all the data,
+        which is useful for debugging.
+    sync_every: int
+        Batches between synchronizations, `None` for Hogwild
+    seed: Generator or int
+        Root seed, spawned into one stream per worker for shuffling
+
+    Returns
+    -------
+    losses: List[float]
+        The last batch loss of every worker
+    """
+    if sync_every is None and not hasattr(learner.opt, "inplace"):
+        raise TypeError("Hogwild training needs an optimizer with in-place updates")
+    rngs = spawn(seed, max(workers, 1))
+    with SharedData(data) as shared, SharedParams(learner.func) as params:
+        args = (shared, params)
+        if workers == 0:
+            losses = [
+                _async_worker(
+                    copy.deepcopy(learner),
+                    *args,
+                    0,
+                    1,
+                    bs,
+                    sync_every,
+                    rngs[0],
+                    threading.Lock(),
+                )
+            ]
+        else:
+            lock = multiprocessing.Lock()
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(lock,)
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        _async_worker,
+                        learner,
+                        *args,
+                        i,
+                        workers,
+                        bs,
+                        sync_every,
+                        rngs[i],
+                    )
+                    for i in range(workers)
+                ]
+                losses = [f.result() for f in futures]
+        params.load(learner.func)
+    return losses
@@ -0,0 +1,379 @@
+import hashlib
+import itertools
+import json
+import os
+import queue
+import threading
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+import numpy as np
+from numpy import ndarray
+from kudzunn.rng import RNGLike, as_generator
+
+Chunk = Dict[str, ndarray]
+META = "meta.json"
+
+
+class Prefetcher:
+    """
+    Runs an iterator in a background thread, keeping at most `depth` items
+    ready in a queue. Bounds memory while overlapping parsing with training.
+
+    Parameters
+    ----------
+    iterable: Iterable
+        The items to produce in the background
+    depth: int
+        The largest number of items waiting in the queue
+    """
+
+    _DONE = object()
+
+    def __init__(self, iterable: Iterable, depth: int = 2) -> None:
+        self.queue: queue.Queue = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._fill, args=(iterable,), daemon=True)
+        self.thread.start()
+
+    def _put(self, item) -> bool:
+        "block until there is room, unless the consumer has gone away"
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fill(self, iterable: Iterable) -> None:
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+        except Exception as e:  # re-raised in the consumer
+            self._put(e)
+        self._put(self._DONE)
+
+    def qsize(self) -> int:
+        "the number of items ready"
+        return self.queue.qsize()
+
+    def __iter__(self) -> Iterator:
+        try:
+            while True:
+                item = self.queue.get()
+                if item is self._DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.stopped.set()
+
+
+class _NpyWriter:
+    "Appends rows to a 1-D `.npy` file whose length is not known up front"
+
+    def __init__(self, path: str, dtype: np.dtype) -> None:
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.file = open(path, "wb")
+        self._header()
+        self.offset = self.file.tell()
+
+    def _header(self) -> None:
+        header = {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.rows,),
+        }
+        np.lib.format.write_array_header_1_0(self.file, header)
+
+    def write(self, arr: ndarray) -> None:
+        np.ascontiguousarray(arr, dtype=self.dtype).tofile(self.file)
+        self.rows += len(arr)
+
+    def close(self) -> None:
+        # The header is padded to a fixed size, so it can be rewritten with
+        # the final length without moving the data.
+        try:
+            self.file.seek(0)
+            self._header()
+            if self.file.tell() != self.offset:
+                raise ValueError(f"the header of {self.path} outgrew its padding")
+        finally:
+            self.file.close()
+
+
+def write_columnar(directory: str, columns: Dict[str, ndarray]) -> None:
+    """
+    Write arrays in the columnar format read by `ColumnarReader`: one
+    `.npy` file per column and a `meta.json` with the names and row count.
+
+    Parameters
+    ----------
+    directory: str
+        Created if missing
+    columns: Dict[str, ndarray]
+        Column name to 1-D array, all of the same length
+    """
+    os.makedirs(directory, exist_ok=True)
+    lengths = {len(col) for col in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length")
+    for name, col in columns.items():
+        np.save(os.path.join(directory, f"{name}.npy"), col)
+    _write_meta(directory, list(columns), lengths.pop() if lengths else 0)
+
+
+def _write_meta(directory: str, names: List[str], rows: int) -> None:
+    # written last: its presence marks the directory as complete
+    with open(os.path.join(directory, META), "w") as f:
+        json.dump({"columns": names, "rows": rows}, f)
+
+
+class ColumnarReader:
+    """
+    Reads fixed-size chunks from a directory written by `write_columnar`
+    (or by the `CSVReader` cache). The columns are memory-mapped, so a chunk
+    costs no parsing and memory stays bounded by the page cache.
+
+    Parameters
+    ----------
+    directory: str
+        The columnar directory
+    columns: Sequence[str]
+        Columns to read, by default all of them
+    chunksize: int
+        Rows per chunk
+    """
+
+    def __init__(
+        self, directory: str, columns: Sequence[str] = None, chunksize: int = 65536
+    ) -> None:
+        with open(os.path.join(directory, META)) as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.columns = list(meta["columns"] if columns is None else columns)
+        self.rows = meta["rows"]
+        self.chunksize = chunksize
+
+    def __iter__(self) -> Iterator[Chunk]:
+        arrays = {
+            name: np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+            for name in self.columns
+        }
+        for start in range(0, self.rows, self.chunksize):
+            stop = start + self.chunksize
+            yield {name: arr[start:stop] for name, arr in arrays.items()}
+
+
+class CSVReader:
+    """
+    Streams numeric columns of a CSV file in fixed-size chunks.
+
+    Parsing runs in a background thread with at most `prefetch` chunks
+    waiting. With `cache_dir` the parsed columns are also written out as
+    `.npy` files during the first pass; later passes read those through a
+    `ColumnarReader` and skip parsing entirely. The cache is keyed by the
+    file's path, size and modification time and the columns read.
+
+    Parameters
+    ----------
+    path: str
+        The CSV file
+    columns: Sequence[int or str]
+        Columns to read, by position or, with `header`, by name. By
+        default all columns.
+
+    Raises
+    ------
+    ValueError
+        If a column is given by a name that the header does not have, or
+        without a header
+    chunksize: int
+        Rows per chunk
+    header: bool
+        The first line holds column names
+    delimiter: str
+        Field separator
+    dtype: np.dtype
+        The dtype of every column
+    cache_dir: str
+        Where to cache parsed columns, no cache if not given
+    prefetch: int
+        Chunks parsed ahead of the consumer
+    """
+
+    def __init__(
+        self,
+        path: str,
+        columns: Sequence[Union[int, str]] = None,
+        chunksize: int = 65536,
+        header: bool = False,
+        delimiter: str = ",",
+        dtype: np.dtype = np.float64,
+        cache_dir: str = None,
+        prefetch: int = 2,
+    ) -> None:
+        self.path = path
+        self.chunksize = chunksize
+        self.header = header
+        self.delimiter = delimiter
+        self.dtype = dtype
+        self.prefetch = prefetch
+        with open(path) as f:
+            first = f.readline().rstrip("\n").split(delimiter)
+        names = [n.strip() for n in first] if header else None
+        if columns is None:
+            columns = list(range(len(first)))
+        self.usecols = []
+        for c in columns:
+            if isinstance(c, int):
+                self.usecols.append(c)
+            elif names is None:
+                raise ValueError(f"Column {c!r} is a name, which needs header=True")
+            elif c not in names:
+                raise ValueError(f"No column {c!r} in the header of {path}")
+            else:
+                self.usecols.append(names.index(c))
+        self.names = [names[i] if names else str(i) for i in self.usecols]
+        self.cache = None
+        if cache_dir is not None:
+            stat = os.stat(path)
+            key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+            key += f":{self.usecols}:{np.dtype(dtype).str}"
+            digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+            self.cache = os.path.join(cache_dir, digest)
+        self.loader: Optional[Prefetcher] = None
+
+    @property
+    def cached(self) -> bool:
+        "whether a complete cache of the parsed columns exists"
+        return self.cache is not None and os.path.exists(os.path.join(self.cache, META))
+
+    def _parse(self) -> Iterator[Chunk]:
+        with open(self.path) as f:
+            if self.header:
+                next(f)
+            while True:
+                lines = list(itertools.islice(f, self.chunksize))
+                if not lines:
+                    return
+                arr = np.loadtxt(
+                    lines,
+                    delimiter=self.delimiter,
+                    usecols=self.usecols,
+                    dtype=self.dtype,
+                    ndmin=2,
+                )
+                yield {name: arr[:, i] for i, name in enumerate(self.names)}
+
+    def _parse_and_cache(self) -> Iterator[Chunk]:
+        os.makedirs(self.cache, exist_ok=True)
+        writers = {
+            name: _NpyWriter(os.path.join(self.cache, f"{name}.npy"), self.dtype)
+            for name in self.names
+        }
+        rows = 0
+        complete = False
+        try:
+            for chunk in self._parse():
+                for name, writer in writers.items():
+                    writer.write(chunk[name])
+                rows += len(chunk[self.names[0]])
+                yield chunk
+            complete = True
+        finally:
+            for writer in writers.values():
+                writer.close()
+            # an interrupted pass leaves no meta.json, so it is redone
+            if complete:
+                _write_meta(self.cache, self.names, rows)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        if self.cached:
+            return iter(ColumnarReader(self.cache, self.names, self.chunksize))
+        source = self._parse() if self.cache is None else self._parse_and_cache()
+        self.loader = Prefetcher(source, self.prefetch)
+        return iter(self.loader)
+
+
+class StreamingDataloader:
+    """
+    Turns a stream of chunks into `(x, y)` batches for `Learner.train_loop`,
+    so only a few chunks are ever in memory.
+
+    Parameters
+    ----------
+    reader: Iterable[Dict[str, ndarray]]
+        A `CSVReader`, `ColumnarReader` or anything yielding chunks
+    x: str
+        Name of the independent variable column
+    y: str
+        Name of the dependent variable column
+    bs: int
+        Batch size. Batches may span chunk boundaries.
+    shuffle: bool
+        Shuffle rows within each chunk
+    rng: Generator or int
+        Random generator or seed for shuffling
+    drop_last: bool
+        Drop a ragged last batch
+    transforms: Sequence[Callable]
+        Applied in order to every `(x, y)` batch
+    """
+
+    def __init__(
+        self,
+        reader: Iterable[Chunk],
+        x: str,
+        y: str,
+        bs: int,
+        shuffle: bool = False,
+        rng: RNGLike = None,
+        drop_last: bool = False,
+        transforms: Sequence[Callable[[ndarray, ndarray], Tuple]] = (),
+    ) -> None:
+        self.reader = reader
+        self.x = x
+        self.y = y
+        self.bs = bs
+        self.shuffle = shuffle
+        self.rng = as_generator(rng)
+        self.drop_last = drop_last
+        self.transforms = list(transforms)
+        self.current_batch = 0
+
+    def _batches(self) -> Iterator[Tuple[ndarray, ndarray]]:
+        xs, ys = np.empty(0), np.empty(0)
+        for chunk in self.reader:
+            cx, cy = chunk[self.x], chunk[self.y]
+            if self.shuffle:
+                perm = self.rng.permutation(len(cy))
+                cx, cy = cx[perm], cy[perm]
+            if len(ys):
+                cx, cy = np.concatenate((xs, cx)), np.concatenate((ys, cy))
+            full = len(cy) - len(cy) % self.bs
+            for i in range(0, full, self.bs):
+                yield cx[i : i + self.bs], cy[i : i + self.bs]
+            xs, ys = cx[full:], cy[full:]
+        if len(ys) and not self.drop_last:
+            yield xs, ys
+
+    def __iter__(self):
+        for batch in self._batches():
+            for transform in self.transforms:
+                batch = transform(*batch)
+            yield batch
+            self.current_batch += 1
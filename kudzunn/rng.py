@@ -0,0 +1,57 @@
+import numpy as np
+from numpy.random import Generator, SeedSequence
+from typing import List, Union
+
+RNGLike = Union[None, int, SeedSequence, Generator]
+
+
+def as_generator(seed: RNGLike = None) -> Generator:
+    """
+    Make a random generator from a seed.
+
+    Parameters
+    ----------
+    seed: None, int, SeedSequence or Generator
+        A generator is returned as is, so components handed the same
+        generator share one stream. `None` seeds from the OS.
+
+    Returns
+    -------
+    rng: Generator
+        The generator
+    """
+    if isinstance(seed, Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+def spawn(seed: RNGLike, n: int) -> List[Generator]:
+    """
+    Derive `n` independent child generators from a seed.
+
+    The children come from `SeedSequence.spawn`, so their streams do not
+    overlap and are the same on every run with the same seed, whichever
+    process or thread consumes them.
+
+    Parameters
+    ----------
+    seed: None, int, SeedSequence or Generator
+        The parent. Spawning from a generator advances its spawn counter,
+        so repeated calls give new children.
+    n: int
+        Number of children
+
+    Returns
+    -------
+    rngs: List[Generator]
+        The child generators
+    """
+    if isinstance(seed, Generator):
+        bitgen = seed.bit_generator
+        # `seed_seq` is public from numpy 1.25
+        seq = getattr(bitgen, "seed_seq", None) or bitgen._seed_seq
+    elif isinstance(seed, SeedSequence):
+        seq = seed
+    else:
+        seq = SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seq.spawn(n)]
@@ -0,0 +1,183 @@
+import json
+import struct
+import numpy as np
+from numpy import ndarray
+from typing import Dict, Union
+from kudzunn.function import Function
+
+MAGIC = b"KUDZUNN\x00"
+VERSION = 1
+# Every buffer starts on a 64 byte boundary so memmapped views are aligned
+# for any dtype and for SIMD loads.
+ALIGN = 64
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _classname(func: Function) -> str:
+    return f"{type(func).__module__}.{type(func).__qualname__}"
+
+
+def save(func: Function, path: str) -> None:
+    """
+    Save the parameters of a function to a versioned binary file.
+
+    The file is a fixed preamble (magic, version, header length), a JSON
+    header describing every parameter, and then the raw parameter buffers,
+    each aligned to `ALIGN` bytes.
+
+    Parameters
+    ----------
+    func: Function
+        The function (or container of functions) whose `params` are saved
+    path: str
+        The file to write
+    """
+    arrays = []
+    entries = []
+    for name, param in func.params.items():
+        arr = np.ascontiguousarray(param)
+        arrays.append(arr)
+        entries.append(
+            {
+                "name": name,
+                "dtype": arr.dtype.str,
+                "shape": list(arr.shape),
+                "scalar": not isinstance(param, ndarray),
+            }
+        )
+    # Offsets are relative to the start of the data section, which begins
+    # at the first aligned position after the header.
+    offset = 0
+    for entry, arr in zip(entries, arrays):
+        entry["offset"] = offset
+        offset = _align(offset + arr.nbytes)
+    header = {"class": _classname(func), "params": entries}
+    raw = json.dumps(header).encode("utf-8")
+    start = _align(_PREAMBLE.size + len(raw))
+
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(raw)))
+        f.write(raw)
+        for entry, arr in zip(entries, arrays):
+            f.write(b"\x00" * (start + entry["offset"] - f.tell()))
+            arr.tofile(f)
+
+
+def read_header(path: str) -> Dict:
+    """
+    Read the JSON header of a saved model without touching the weights.
+
+    Parameters
+    ----------
+    path: str
+        The file written by `save`
+
+    Returns
+    -------
+    header: Dict
+        The class name of the saved function, the name, dtype, shape and
+        offset of each parameter, and the start of the data section
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f"{path} is not a kudzunn model file")
+        magic, version, length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a kudzunn model file")
+        if version != VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {VERSION}")
+        header = json.loads(f.read(length).decode("utf-8"))
+    header["start"] = _align(_PREAMBLE.size + length)
+    return header
+
+
+def load_params(path: str, mmap: bool = True) -> Dict[str, Union[float, ndarray]]:
+    """
+    Load the parameters of a saved model.
+
+    Parameters
+    ----------
+    path: str
+        The file written by `save`
+    mmap: bool
+        Map the weights copy-on-write instead of reading them into memory.
+        All processes loading the same file share one page-cached copy
+        until they write: a training step that updates the weights in
+        place (sparse rows, `GD(inplace=True)`) copies just the pages it
+        touches, privately, and the file is never changed.
+
+    Returns
+    -------
+    params: Dict
+        Parameter name to value. Scalar parameters come back as floats.
+    """
+    header = read_header(path)
+    params: Dict[str, Union[float, ndarray]] = {}
+    for entry in header["params"]:
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        count = int(np.prod(shape))
+        offset = header["start"] + entry["offset"]
+        if count == 0:
+            arr = np.empty(shape, dtype=dtype)
+        elif mmap:
+            arr = np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=shape)
+        else:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                arr = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+        if entry["scalar"]:
+            params[entry["name"]] = arr.item()
+        else:
+            params[entry["name"]] = arr
+    return params
+
+
+def load(path: str, func: Function, mmap: bool = True) -> Function:
+    """
+    Load saved parameters into a function.
+
+    Parameters
+    ----------
+    path: str
+        The file written by `save`
+    func: Function
+        A function of the same class and architecture as the one saved:
+        the same parameter names and shapes. Its `params` are replaced by
+        the saved ones.
+    mmap: bool
+        Map the weights copy-on-write instead of reading them into memory
+        (see `load_params`).
+
+    Returns
+    -------
+    func: Function
+        The same function, for chaining
+
+    Raises
+    ------
+    ValueError
+        If the file holds another class, or other parameter names or shapes
+    """
+    header = read_header(path)
+    if header["class"] != _classname(func):
+        raise ValueError(
+            f"{path} holds a {header['class']}, cannot load into {_classname(func)}"
+        )
+    saved = {
+        entry["name"]: () if entry["scalar"] else tuple(entry["shape"])
+        for entry in header["params"]
+    }
+    expected = {name: np.shape(param) for name, param in func.params.items()}
+    if saved != expected:
+        raise ValueError(
+            f"{path} holds parameters {saved}, cannot load into {expected}"
+        )
+    for name, param in load_params(path, mmap=mmap).items():
+        func.params[name] = param
+    return func
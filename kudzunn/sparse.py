@@ -0,0 +1,201 @@
+import numpy as np
+from numpy import ndarray
+from typing import Tuple, Union
+
+
+class CSRMatrix:
+    """
+    A compressed sparse row matrix, for inputs too wide to ever be dense
+    (one-hot or hashed features). Row `i` holds `data[indptr[i]:indptr[i+1]]`
+    at columns `indices[indptr[i]:indptr[i+1]]`.
+
+    Indexing with an index array (or slice) selects rows and returns a new
+    `CSRMatrix`, so `Data` and `Dataloader` batch it like an ndarray.
+
+    Parameters
+    ----------
+    data: ndarray
+        The non-zero values, row by row
+    indices: ndarray
+        The column of every value
+    indptr: ndarray
+        Where each row starts in `data`, with a final entry `len(data)`
+    shape: (int, int)
+        Rows and columns
+    """
+
+    def __init__(
+        self, data: ndarray, indices: ndarray, indptr: ndarray, shape: Tuple[int, int]
+    ) -> None:
+        self.data = np.asarray(data)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.shape = tuple(shape)
+        if len(self.indptr) != self.shape[0] + 1:
+            raise ValueError("indptr must have one more entry than there are rows")
+
+    @classmethod
+    def from_coo(
+        cls, rows: ndarray, cols: ndarray, values: ndarray, shape: Tuple[int, int]
+    ) -> "CSRMatrix":
+        """
+        Build from (row, column, value) triplets, e.g. hashed features.
+        Duplicate entries are kept and add up in products.
+        """
+        order = np.argsort(rows, kind="stable")
+        counts = np.bincount(rows, minlength=shape[0])
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        return cls(np.asarray(values)[order], np.asarray(cols)[order], indptr, shape)
+
+    @classmethod
+    def from_dense(cls, arr: ndarray) -> "CSRMatrix":
+        "Build from a 2-D ndarray, keeping its non-zeros"
+        rows, cols = np.nonzero(arr)
+        return cls.from_coo(rows, cols, arr[rows, cols], arr.shape)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.data.dtype
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.indices.nbytes + self.indptr.nbytes
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, idx: Union[int, slice, ndarray]) -> "CSRMatrix":
+        """
+        Select rows, without a Python loop over them. Negative indexes
+        count from the end, as for an ndarray.
+
+        Returns
+        -------
+        rows: CSRMatrix
+            The selected rows, in the order given
+
+        Raises
+        ------
+        IndexError
+            If an index is out of range
+        """
+        n = self.shape[0]
+        if isinstance(idx, slice):
+            idx = np.arange(*idx.indices(n))
+        idx = np.atleast_1d(np.asarray(idx))
+        if idx.size and (idx.min() < -n or idx.max() >= n):
+            raise IndexError(f"row index out of range for {n} rows")
+        idx = np.where(idx < 0, idx + n, idx)
+        starts = self.indptr[idx]
+        lengths = self.indptr[idx + 1] - starts
+        indptr = np.concatenate(([0], np.cumsum(lengths)))
+        # position in the old arrays of every value of the new rows
+        positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return CSRMatrix(
+            self.data[positions],
+            self.indices[positions],
+            indptr,
+            (len(idx), self.shape[1]),
+        )
+
+    def copy(self) -> "CSRMatrix":
+        return CSRMatrix(
+            self.data.copy(), self.indices.copy(), self.indptr.copy(), self.shape
+        )
+
+    def row_ids(self) -> ndarray:
+        "the row of every stored value"
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def toarray(self) -> ndarray:
+        "The dense matrix. Only for small matrices, e.g. in tests."
+        out = np.zeros(self.shape, dtype=self.dtype)
+        np.add.at(out, (self.row_ids(), self.indices), self.data)
+        return out
+
+    def dot(self, dense: ndarray) -> ndarray:
+        """
+        The product with a dense `(D,)` vector or `(D, K)` matrix, touching
+        only the rows of `dense` that have a non-zero column.
+
+        Returns
+        -------
+        product: ndarray
+            Shape `(N,)` or `(N, K)`
+        """
+        gathered = dense[self.indices]
+        products = gathered * self.data.reshape((-1,) + (1,) * (dense.ndim - 1))
+        out = np.zeros(
+            (self.shape[0],) + dense.shape[1:], dtype=np.result_type(self.data, dense)
+        )
+        nonempty = np.diff(self.indptr) > 0
+        if self.nnz:
+            out[nonempty] = np.add.reduceat(
+                products, self.indptr[:-1][nonempty], axis=0
+            )
+        return out
+
+    def tdot(self, dense: ndarray) -> "SparseGrad":
+        """
+        The product of the transpose with a dense `(N,)` vector or `(N, K)`
+        matrix. Only columns with a non-zero value can be non-zero, so the
+        result is a `SparseGrad` over those.
+
+        Returns
+        -------
+        product: SparseGrad
+            Shape `(D,)` or `(D, K)`, stored for the touched columns only
+        """
+        cols, inverse = np.unique(self.indices, return_inverse=True)
+        products = dense[self.row_ids()] * self.data.reshape(
+            (-1,) + (1,) * (dense.ndim - 1)
+        )
+        values = np.zeros((len(cols),) + dense.shape[1:], dtype=products.dtype)
+        np.add.at(values, inverse.ravel(), products)
+        return SparseGrad(cols, values, (self.shape[1],) + dense.shape[1:])
+
+
+class SparseGrad:
+    """
+    A gradient that is zero outside a few rows of its parameter, stored as
+    the sorted, unique `rows` and their `values`. Optimizers apply it by
+    updating those rows in place, so a step costs the number of touched
+    rows rather than the size of the parameter.
+
+    Parameters
+    ----------
+    rows: ndarray
+        Sorted unique row indices
+    values: ndarray
+        The gradient of those rows, shape `(len(rows),) + shape[1:]`
+    shape: tuple
+        The shape of the full parameter
+    """
+
+    def __init__(self, rows: ndarray, values: ndarray, shape: Tuple[int, ...]) -> None:
+        self.rows = rows
+        self.values = values
+        self.shape = tuple(shape)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.values.nbytes
+
+    def toarray(self) -> ndarray:
+        "The dense gradient"
+        out = np.zeros(self.shape, dtype=self.values.dtype)
+        out[self.rows] = self.values
+        return out
+
+
+def dense(grad: Union[ndarray, SparseGrad]) -> ndarray:
+    "`grad` as a dense array, whether or not it is a `SparseGrad`"
+    return grad.toarray() if isinstance(grad, SparseGrad) else grad
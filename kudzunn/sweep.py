@@ -0,0 +1,181 @@
+import itertools
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from kudzunn.callbacks import EarlyStoppingCallback
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import ZeroBiasAffine
+from kudzunn.loss import MSE
+from kudzunn.optim import GD
+from kudzunn.parallel import SharedData
+from kudzunn.rng import RNGLike, as_generator, spawn
+from kudzunn.train import Learner
+
+Config = Dict[str, Any]
+Space = Dict[str, Union[Sequence, Callable[[np.random.Generator], Any]]]
+
+
+def grid(**space: Sequence) -> List[Config]:
+    """
+    All combinations of the given hyperparameter values.
+
+    Parameters
+    ----------
+    space: Sequence
+        One keyword per hyperparameter, with the values to try
+
+    Returns
+    -------
+    configs: List[Dict]
+        One dict per combination
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def loguniform(low: float, high: float) -> Callable[[np.random.Generator], float]:
+    "A sampler for `random_search`, uniform in log space, e.g. for `lr`"
+    return lambda rng: float(np.exp(rng.uniform(np.log(low), np.log(high))))
+
+
+def random_search(space: Space, n: int, seed: RNGLike = None) -> List[Config]:
+    """
+    Randomly sampled hyperparameter configurations.
+
+    Parameters
+    ----------
+    space: Dict
+        Hyperparameter name to either a sequence of values to choose from or
+        a callable that draws a value from a `np.random.Generator`
+    n: int
+        Number of configurations
+    seed: Generator or int
+        Random generator or seed for reproducible draws
+
+    Returns
+    -------
+    configs: List[Dict]
+        `n` sampled configurations
+    """
+    rng = as_generator(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in space.items():
+            if callable(values):
+                config[name] = values(rng)
+            else:
+                config[name] = values[rng.integers(len(values))]
+        configs.append(config)
+    return configs
+
+
+def default_build(
+    config: Config, data: Data, rng: np.random.Generator
+) -> Tuple[Learner, Dataloader]:
+    """
+    Build a `ZeroBiasAffine` + `MSE` + `GD` learner from a sweep config with
+    `lr`, `batch_size` and `epochs` keys.
+    """
+    initrng, samplerrng = spawn(rng, 2)
+    bs = config.get("batch_size", len(data))
+    sampler = Sampler(data, bs, shuffle=True, rng=samplerrng)
+    func = ZeroBiasAffine(rng=initrng)
+    learner = Learner(
+        GD(config.get("lr", 0.001)), MSE(), func, config.get("epochs", 10)
+    )
+    return learner, Dataloader(data, sampler)
+
+
+def _loss(value) -> Union[float, List[float]]:
+    "a loss for the table: a float, or a list with one per replica"
+    arr = np.asarray(value, dtype=float)
+    return float(arr) if arr.ndim == 0 else arr.tolist()
+
+
+def _rank(row: Dict[str, Any]) -> float:
+    "the best loss of a run, of its best replica; runs without one go last"
+    best = np.asarray(row["best_loss"], dtype=float)
+    return math.inf if np.all(np.isnan(best)) else float(np.nanmin(best))
+
+
+def _run_one(
+    build: Callable,
+    shared: SharedData,
+    config: Config,
+    rng: np.random.Generator,
+    patience: Optional[int],
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    learner, dl = build(config, shared.data(), rng)
+    stopper = EarlyStoppingCallback(learner, patience=patience)
+    learner.set_callbacks([stopper])
+    learner.train_loop(dl)
+    trained = len(stopper.losses) > 0
+    return {
+        **config,
+        "final_loss": _loss(stopper.losses[-1]) if trained else math.nan,
+        "best_loss": _loss(stopper.best) if trained else math.nan,
+        "best_epoch": stopper.best_epoch,
+        "epochs_run": len(stopper.losses),
+        "stopped_early": stopper.stopped_epoch is not None,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def run_sweep(
+    data: Data,
+    configs: List[Config],
+    build: Callable[..., Tuple[Learner, Dataloader]] = default_build,
+    workers: Optional[int] = None,
+    patience: Optional[int] = None,
+    seed: RNGLike = None,
+) -> List[Dict[str, Any]]:
+    """
+    Train one independent learner per configuration in a process pool.
+
+    The data is written once to `.npy` files and memory-mapped read-only by
+    every worker, so it is not copied per process.
+
+    Parameters
+    ----------
+    data: Data
+        The training data
+    configs: List[Dict]
+        As made by `grid` or `random_search`
+    build: Callable
+        Makes a `(Learner, Dataloader)` from a config, the data and a
+        random generator. It must be picklable, i.e. defined at module
+        level.
+    workers: int
+        Number of processes, by default one per CPU. `0` runs serially in
+        this process.
+    patience: int
+        Early stopping patience in epochs, `None` to always run all epochs
+    seed: Generator or int
+        Root seed. Each run gets its own child stream, so results do not
+        depend on the number of workers or the order runs finish in.
+
+    Returns
+    -------
+    table: List[Dict]
+        One row per config, sorted by best loss: the config values, final
+        and best epoch loss, the best epoch, epochs run, whether training
+        stopped early and the wall time in seconds. Losses are NaN when no
+        epoch ran, and lists with one loss per replica for replicated
+        learners, ranked by their best replica.
+    """
+    runs = list(zip(configs, spawn(seed, len(configs))))
+    with SharedData(data) as shared:
+        if workers == 0:
+            rows = [_run_one(build, shared, c, r, patience) for c, r in runs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_run_one, build, shared, c, r, patience)
+                    for c, r in runs
+                ]
+                rows = [f.result() for f in futures]
+    return sorted(rows, key=_rank)
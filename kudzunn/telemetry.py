@@ -0,0 +1,394 @@
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from itertools import accumulate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from kudzunn.callbacks import Callback
+from kudzunn.sparse import SparseGrad
+
+if TYPE_CHECKING:
+    from kudzunn.train import Learner
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from 100us steps of tiny batches to multi-second ones
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _fmt(value: float) -> str:
+    "a sample value as Prometheus spells it"
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def rss_bytes() -> float:
+    """
+    The resident set size of this process: current where `/proc` has it,
+    otherwise the peak from `getrusage`, and NaN where neither exists
+    (Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return math.nan
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def queue_depth(source) -> Optional[int]:
+    """
+    Items waiting in the background queue of a loader: anything with
+    `qsize()` (a `Prefetcher`), or a reader or `StreamingDataloader`
+    reaching one through `loader` or `reader`. `None` if there is none.
+    """
+    for _ in range(4):
+        if source is None:
+            return None
+        if hasattr(source, "qsize"):
+            return source.qsize()
+        source = getattr(source, "loader", None) or getattr(source, "reader", None)
+    return None
+
+
+class Histogram:
+    """
+    A cumulative histogram with fixed upper bounds, like a Prometheus
+    histogram. `observe` is a bisection and two additions, so it is cheap
+    enough for every batch. There is one writer, the training thread;
+    readers such as the HTTP server read without a lock and may see one
+    observation partly recorded, which scrapers tolerate.
+
+    Parameters
+    ----------
+    bounds: Sequence[float]
+        Increasing upper bounds of the buckets; +Inf is implied
+    """
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = list(bounds)
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        "(upper bound, cumulative count) pairs, ending with +Inf"
+        return list(zip(self.bounds + [math.inf], accumulate(self.counts)))
+
+
+class TelemetryCallback(Callback):
+    """
+    A telemetry callback. Keeps run-level counters, gauges and a batch
+    latency histogram, and exports them in the Prometheus text format:
+    served at `http://host:port/metrics` while training runs, and/or
+    written to `path` for the node exporter's textfile collector (at most
+    every `interval` seconds, at every epoch end and at the end). The file
+    is replaced atomically, so collectors never read a partial file.
+
+    Per batch this costs a few clock reads and float additions; the
+    gradient norm, the RSS and the loader queue depth are only computed
+    when the metrics are exported.
+
+    The server stops at `fit_end`. If training raises before that, call
+    `close`, or use the callback as a context manager, to free the port:
+    the serving thread keeps the callback alive, so it is not stopped when
+    the callback goes out of scope.
+
+    Exported, all prefixed with "kudzunn_":
+
+    - samples_total, batches_total, epochs_total: counters
+    - samples_per_second: moving average of the throughput, data loading
+      included
+    - batch_latency_seconds: histogram of batch_start to batch_end
+    - loss: the last batch loss (the mean over replicas)
+    - grad_norm: the global gradient norm, from the optimizer when it
+      computes one (with `clip_norm`), else computed if `grad_norm=True`
+    - loader_queue_depth: batches or chunks waiting in `loader`
+    - rss_bytes: the resident memory of the process
+
+    Parameters
+    ----------
+    learner: Learner
+        The learner to watch
+    port: int
+        Serve the metrics on this port, 0 for any free one (see
+        `address`); `None` to not serve
+    path: str
+        Write the metrics to this file; `None` to not write
+    host: str
+        The interface to serve on, local only by default
+    interval: float
+        Seconds between writes of `path` during an epoch
+    labels: Dict[str, str]
+        Labels added to every sample, e.g. {"job": "nightly"}
+    loader: object
+        The data loader, to report its queue depth (see `queue_depth`)
+    grad_norm: bool
+        Compute the gradient norm when the optimizer does not
+    smoothing: float
+        Weight of the newest batch in `samples_per_second`
+    """
+
+    def __init__(
+        self,
+        learner: "Learner",
+        port: Optional[int] = None,
+        path: Optional[str] = None,
+        host: str = "127.0.0.1",
+        interval: float = 10.0,
+        labels: Optional[Dict[str, str]] = None,
+        loader=None,
+        grad_norm: bool = True,
+        smoothing: float = 0.05,
+    ) -> None:
+        super().__init__(learner)
+        self.port = port
+        self.path = path
+        self.host = host
+        self.interval = interval
+        self.labels = labels or {}
+        self.loader = loader
+        self.compute_norm = grad_norm
+        self.smoothing = smoothing
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.server: Optional[ThreadingHTTPServer] = None
+        # the gradients of the last finished batch, while serving
+        self.grads: Optional[Dict] = None
+        self.samples = 0
+        self.batches = 0
+        self.epochs = 0
+        self.rate = math.nan
+        self.loss = math.nan
+
+    @property
+    def address(self) -> Optional[Tuple[str, int]]:
+        "(host, port) being served, or `None`"
+        return None if self.server is None else self.server.server_address[:2]
+
+    @property
+    def grad_norm(self) -> float:
+        """
+        The gradient norm of the last step: from the optimizer if it has
+        one, else computed now (NaN with `grad_norm=False`). While serving,
+        it is computed from the gradients of the last finished batch.
+        """
+        norm = self.learner.opt.grad_norm
+        if norm is not None:
+            return norm
+        if not self.compute_norm:
+            return math.nan
+        grads = self.learner.func.grads if self.grads is None else self.grads
+        total = 0.0
+        for grad in grads.values():
+            if isinstance(grad, float):
+                total += grad * grad
+                continue
+            values = np.asarray(grad.values if isinstance(grad, SparseGrad) else grad)
+            total += float(np.vdot(values, values))
+        return math.sqrt(total)
+
+    def fit_start(self) -> bool:
+        if self.port is not None and self.server is None:
+            self.server = ThreadingHTTPServer((self.host, self.port), _handler(self))
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.written = time.monotonic()
+        return True
+
+    def epoch_start(self, epoch: int) -> bool:
+        self.last = time.perf_counter()
+        return True
+
+    def batch_start(self, current_batch: int) -> bool:
+        self.started = time.perf_counter()
+        return True
+
+    def after_loss(self, loss: float) -> bool:
+        # replicated functions have one loss per replica
+        self.loss = loss if isinstance(loss, float) else float(np.mean(loss))
+        return True
+
+    def batch_end(self) -> bool:
+        now = time.perf_counter()
+        self.latency.observe(now - self.started)
+        n = len(self.learner.targets)
+        self.samples += n
+        self.batches += 1
+        # throughput from the end of the previous batch, so loading counts
+        rate = n / max(now - self.last, 1e-9)
+        if math.isnan(self.rate):
+            self.rate = rate
+        else:
+            self.rate += self.smoothing * (rate - self.rate)
+        self.last = now
+        if self.server is not None:
+            # backward replaces gradient arrays rather than writing into
+            # them, so holding on to this batch's keeps a scrape from
+            # mixing them with the next batch's
+            self.grads = dict(self.learner.func.grads)
+        if self.path is not None and time.monotonic() - self.written >= self.interval:
+            self.write()
+        return True
+
+    def epoch_end(self) -> bool:
+        self.epochs += 1
+        if self.path is not None:
+            self.write()
+        return True
+
+    def fit_end(self) -> bool:
+        if self.path is not None:
+            self.write()
+        self.close()
+        return True
+
+    def close(self) -> None:
+        "Stop serving, if serving, and free the port"
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.grads = None
+
+    def __enter__(self) -> "TelemetryCallback":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def collect(self) -> List[Tuple[str, str, str, List[Tuple[str, float]]]]:
+        """
+        The metrics as (name, type, help, [(suffix and labels, value)]).
+        """
+        base = ",".join(f'{k}="{_escape(v)}"' for k, v in self.labels.items())
+
+        def labelled(extra: str = "") -> str:
+            inner = ",".join(part for part in (base, extra) if part)
+            return f"{{{inner}}}" if inner else ""
+
+        buckets = []
+        for le, count in self.latency.buckets():
+            bound = 'le="' + _fmt(le) + '"'
+            buckets.append((f"_bucket{labelled(bound)}", count))
+        buckets += [
+            (f"_sum{labelled()}", self.latency.sum),
+            (f"_count{labelled()}", self.latency.count),
+        ]
+        metrics = [
+            ("samples_total", "counter", "Samples trained on", self.samples),
+            ("batches_total", "counter", "Batches trained on", self.batches),
+            ("epochs_total", "counter", "Epochs completed", self.epochs),
+            (
+                "samples_per_second",
+                "gauge",
+                "Moving average of training throughput",
+                self.rate,
+            ),
+            ("loss", "gauge", "Loss of the last batch", self.loss),
+            ("grad_norm", "gauge", "Global gradient norm", self.grad_norm),
+            ("rss_bytes", "gauge", "Resident memory of the process", rss_bytes()),
+        ]
+        depth = queue_depth(self.loader)
+        if depth is not None:
+            metrics.append(
+                ("loader_queue_depth", "gauge", "Items waiting in the loader", depth)
+            )
+        out = [
+            (name, kind, text, [(labelled(), value)])
+            for name, kind, text, value in metrics
+        ]
+        out.append(
+            (
+                "batch_latency_seconds",
+                "histogram",
+                "Time from batch start to batch end",
+                buckets,
+            )
+        )
+        return out
+
+    def render(self) -> str:
+        "The metrics in the Prometheus text exposition format"
+        lines = []
+        for name, kind, text, samples in self.collect():
+            name = f"kudzunn_{name}"
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{suffix} {_fmt(value)}" for suffix, value in samples)
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        "Write the metrics to `path` atomically"
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, self.path)
+        self.written = time.monotonic()
+
+
+def _handler(telemetry: TelemetryCallback):
+    "a request handler class serving `telemetry` at /metrics"
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = telemetry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            # scrapes every few seconds would flood stderr
+            pass
+
+    return Handler
@@ -0,0 +1,211 @@
+from contextlib import contextmanager
+from types import ModuleType
+import numpy as np
+import pytest
+import kudzunn.backend
+import kudzunn.function
+import kudzunn.loss
+import kudzunn.optim
+from kudzunn.backend import get_backend, get_namespace, require_numpy, set_backend
+from kudzunn.data import Data
+from kudzunn.function import (
+    GELU,
+    Embedding,
+    LeakyReLU,
+    Linear,
+    ReLU,
+    Sigmoid,
+    Softmax,
+    Tanh,
+    ZeroBiasAffine,
+)
+from kudzunn.loss import (
+    MAE,
+    MSE,
+    BinaryCrossEntropy,
+    Huber,
+    SoftmaxCrossEntropy,
+)
+from kudzunn.optim import GD, LBFGS, Adam
+from kudzunn.train import Learner
+
+
+def test_get_namespace():
+    assert get_namespace(np.zeros(2), 1.0) is np
+    assert get_namespace(np.float64(1.0)) is np
+    assert get_namespace(1.0, None) is get_backend()
+
+
+def test_set_backend():
+    previous = set_backend("numpy")
+    assert get_backend() is np
+    set_backend(previous)
+    with pytest.raises(ValueError):
+        set_backend("json")
+
+
+# The conformance suite runs the core components on every backend and
+# compares with NumPy. "numpy-portable" takes the code paths meant for
+# other libraries, with NumPy underneath.
+BACKENDS = ["numpy", "numpy-portable", "array_api_strict"]
+PORTED = (kudzunn.function, kudzunn.loss, kudzunn.optim)
+
+
+@pytest.fixture(params=BACKENDS)
+def xp(request, monkeypatch):
+    if request.param == "array_api_strict":
+        module = pytest.importorskip("array_api_strict")
+        previous = set_backend(module)
+        yield module
+        set_backend(previous)
+        return
+    if request.param == "numpy-portable":
+        for module in PORTED:
+            monkeypatch.setattr(module, "is_numpy", lambda xp: False)
+    yield np
+
+
+@contextmanager
+def fast_paths():
+    "compute the NumPy reference with the NumPy fast paths"
+    saved = [module.is_numpy for module in PORTED]
+    for module in PORTED:
+        module.is_numpy = kudzunn.backend.is_numpy
+    try:
+        yield
+    finally:
+        for module, is_numpy in zip(PORTED, saved):
+            module.is_numpy = is_numpy
+
+
+def to_numpy(arr):
+    if hasattr(arr, "__dlpack__") and not isinstance(arr, np.ndarray):
+        return np.from_dlpack(arr)
+    return np.asarray(arr)
+
+
+@pytest.mark.parametrize("cls", [ReLU, Sigmoid, Tanh])
+def test_activations(xp, cls):
+    x = np.linspace(-2, 2, 9)
+    g = np.linspace(1, 2, 9)
+    with fast_paths():
+        ref = cls()
+        expected = ref(x), ref.backward(g)
+    f = cls()
+    assert np.allclose(to_numpy(f(xp.asarray(x))), expected[0])
+    assert np.allclose(to_numpy(f.backward(xp.asarray(g))), expected[1])
+
+
+@pytest.mark.parametrize("weights", [None, np.array([1.0, 2.0, 0.0, 1.0])])
+def test_mse(xp, weights):
+    p, a = np.array([0.3, 0.2, 0.9, 0.6]), np.array([0.5, -1.0, 2.0, 0.0])
+    with fast_paths():
+        expected = MSE()(p, a, weights), MSE().backward(p, a, weights)
+    w = None if weights is None else xp.asarray(weights)
+    loss = MSE()
+    value = loss(xp.asarray(p), xp.asarray(a), w)
+    assert np.isclose(float(value), expected[0])
+    grad = loss.backward(xp.asarray(p), xp.asarray(a), w)
+    assert np.allclose(to_numpy(grad), expected[1])
+
+
+def replicated_run(xp, x, per_replica):
+    "outputs, loss, gradients for shared and per-replica inputs"
+    f, loss = ZeroBiasAffine(winit=0.5, replicas=3), MSE(replicas=True)
+    out = f(xp.asarray(x))
+    results = [out, loss(out, xp.asarray(x))]
+    results.append(f.backward(loss.backward(out, xp.asarray(x))))
+    results.append(f.grads["w"])
+    f(xp.asarray(per_replica))
+    f.backward(xp.ones((3, 5)))
+    results.append(f.grads["w"])
+    return [to_numpy(r) for r in results]
+
+
+def test_replicas(xp):
+    x = np.linspace(-1, 1, 5)
+    per_replica = np.stack([x, 2 * x, 3 * x])
+    with fast_paths():
+        set_backend(np)
+        expected = replicated_run(np, x, per_replica)
+        set_backend(xp)
+    for got, want in zip(replicated_run(xp, x, per_replica), expected):
+        assert np.allclose(got, want)
+
+
+def test_replicas_clip_norm(xp):
+    f = ZeroBiasAffine(winit=0.0, replicas=3)
+    f.grads["w"] = xp.asarray([30.0, 0.5, 0.0])
+    GD(1.0, clip_norm=1.0, l1=0.01).step(f)
+    assert np.allclose(to_numpy(f.params["w"]), [-1.0, -0.5, 0.0])
+
+
+class Batches:
+    "a minimal loader of fixed batches"
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.current_batch = 0
+
+    def __iter__(self):
+        return iter(self.batches)
+
+
+@pytest.mark.parametrize("settings", [{}, {"clip_norm": 0.5, "l1": 0.01}])
+def test_learner(xp, settings):
+    x = np.linspace(-1, 1, 20)
+    batches = [(x[i : i + 5], 2.0 * x[i : i + 5]) for i in range(0, 20, 5)]
+    ported = [(xp.asarray(a), xp.asarray(b)) for a, b in batches]
+    with fast_paths():
+        ref = Learner(GD(0.2, **settings), MSE(), ZeroBiasAffine(winit=0.0), 10)
+        expected = ref.train_loop(Batches(batches))
+    learner = Learner(GD(0.2, **settings), MSE(), ZeroBiasAffine(winit=0.0), 10)
+    loss = learner.train_loop(Batches(ported))
+    assert np.isclose(float(loss), float(expected))
+    assert np.isclose(float(learner.func.params["w"]), ref.func.params["w"])
+
+
+class Foreign:
+    "an array of a library kudzunn has no portable path for"
+
+    namespace = ModuleType("foreign")
+
+    def __array_namespace__(self, api_version=None):
+        return self.namespace
+
+
+def with_foreign_params(func):
+    for name in func.params:
+        func.params[name], func.grads[name] = Foreign(), Foreign()
+    return func
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda: Linear(3)(Foreign()),
+        lambda: Embedding(5, 2)(Foreign()),
+        lambda: LeakyReLU()(Foreign()),
+        lambda: GELU()(Foreign()),
+        lambda: Softmax()(Foreign()),
+        lambda: MAE()(Foreign(), Foreign()),
+        lambda: Huber().backward(Foreign(), Foreign()),
+        lambda: BinaryCrossEntropy()(Foreign(), Foreign()),
+        lambda: SoftmaxCrossEntropy().backward(Foreign(), Foreign()),
+        lambda: Adam().step(with_foreign_params(Linear(3))),
+        lambda: LBFGS().step(with_foreign_params(Linear(3))),
+        lambda: Data(Foreign(), Foreign()),
+    ],
+)
+def test_unported_components_reject_foreign_arrays(call):
+    with pytest.raises(TypeError, match="only supports NumPy"):
+        call()
+
+
+def test_require_numpy_passes_numpy_and_scalars():
+    require_numpy("test", np.zeros(2), 1.0, None)
+    previous = set_backend(np)
+    try:
+        require_numpy("test", 1.0)
+    finally:
+        set_backend(previous)
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from kudzunn.cache import BatchCache, SampleCache, fingerprint, transform_key
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.normalize import Normalizer
+
+
+class Counting:
+    "a row-wise transform that counts its calls"
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, x, y):
+        self.calls += 1
+        return x * 2.0, y + 1.0
+
+    def cache_key(self):
+        return "double-x-increment-y"
+
+
+def make_data(n=40, **kwargs):
+    x = np.arange(n, dtype=float)
+    return Data(x, -x, **kwargs)
+
+
+def epochs(dl, n=3):
+    return [[(x.copy(), y.copy()) for x, y in dl] for _ in range(n)]
+
+
+def test_fingerprint_and_transform_key():
+    assert fingerprint(np.arange(3.0)) == fingerprint(np.arange(3.0))
+    assert fingerprint(np.arange(3.0)) != fingerprint(np.arange(3))
+    assert fingerprint(make_data()) != fingerprint(make_data(41))
+    fitted = Normalizer().fit([(np.arange(5.0), np.arange(5.0))])
+    assert transform_key([fitted]) != transform_key([Normalizer()])
+    assert transform_key([Counting()]) == transform_key([Counting()])
+
+
+def scaled(k):
+    return lambda x, y: (k * x, y)
+
+
+def test_transform_key_of_functions():
+    double, half = lambda x, y: (2.0 * x, y), lambda x, y: (0.5 * x, y)
+    assert transform_key([double]) != transform_key([half])
+    assert transform_key([double]) == transform_key([lambda x, y: (2.0 * x, y)])
+    assert transform_key([scaled(2.0)]) != transform_key([scaled(3.0)])
+    assert transform_key([scaled(2.0)]) == transform_key([scaled(2.0)])
+    assert transform_key([scaled(np.ones(2))]) != transform_key([scaled(np.zeros(2))])
+    assert transform_key([np.log]) == transform_key([np.log])
+
+
+def test_batch_cache_skips_transforms():
+    t = Counting()
+    data = make_data(shuffle=False)
+    cache = BatchCache()
+    dl = Dataloader(data, Sampler(data, 8), [t], cache=cache)
+    cached = epochs(dl)
+    assert t.calls == 5
+    assert (cache.hits, cache.misses) == (10, 5)
+    plain = epochs(Dataloader(data, Sampler(data, 8), [Counting()]))
+    for a, b in zip(cached[2], plain[2]):
+        assert np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+    x, _ = next(iter(dl))
+    assert not x.flags.writeable
+
+
+def test_batch_cache_spills_to_disk(tmp_path):
+    t = Counting()
+    data = make_data(shuffle=False)
+    # room for two 8-row batches of x and y
+    cache = BatchCache(budget=2 * 2 * 64, directory=tmp_path)
+    dl = Dataloader(data, Sampler(data, 8), [t], cache=cache)
+    first = epochs(dl, 1)[0]
+    assert len(cache.ram) == 2 and len(list(tmp_path.glob("*-x.npy"))) == 3
+    second = epochs(dl, 1)[0]
+    assert t.calls == 5
+    for a, b in zip(first, second):
+        assert np.array_equal(a[0], b[0])
+    # a new run with the same data and transforms reuses the spilled files
+    again = Dataloader(
+        data, Sampler(data, 8), [Counting()], cache=BatchCache(0, tmp_path)
+    )
+    epochs(again, 1)
+    assert again.cache.hits == 3
+
+
+@pytest.mark.parametrize("mode", ["copy", "index"])
+def test_sample_cache_with_shuffling(mode, tmp_path):
+    t = Counting()
+    data = make_data(shuffle=mode, rng=0)
+    cache = SampleCache(budget=0, directory=tmp_path)
+    dl = Dataloader(data, Sampler(data, 8, shuffle=True, rng=0), [t], cache=cache)
+    for epoch in epochs(dl):
+        for x, y in epoch:
+            # the pairs stay aligned and transformed
+            assert np.array_equal(x, -2.0 * (y - 1.0))
+    assert t.calls == 5 and cache.hits == 10
+
+
+def test_cache_rejects_inplace_shuffle():
+    data = make_data(shuffle="inplace")
+    dl = Dataloader(data, Sampler(data, 8), cache=BatchCache())
+    with pytest.raises(ValueError):
+        next(iter(dl))
+
+
+def test_normalizer_is_cached_by_statistics():
+    data = make_data(shuffle=False)
+    norm = Normalizer().fit([(data.x, data.y)])
+    cache = BatchCache()
+    dl = Dataloader(data, Sampler(data, 8), [norm], cache=cache)
+    cached = epochs(dl, 2)
+    assert cache.hits == 5
+    # the cache holds copies, not the normalizer's reused buffers
+    assert not np.array_equal(cached[1][0][0], cached[1][1][0])
+    assert np.isclose(np.concatenate([x for x, _ in cached[1]]).mean(), 0.0)
+
+
+def test_refit_normalizer_invalidates_cache():
+    data = make_data(shuffle=False)
+    norm = Normalizer().fit([(data.x, data.y)])
+    dl = Dataloader(data, Sampler(data, 8), [norm], cache=BatchCache())
+    before = epochs(dl, 1)[0]
+    # refit on shifted data: the mean moves, so the served batches must too
+    norm.fit([(data.x + 100.0, data.y)])
+    after = epochs(dl, 1)[0]
+    x = np.concatenate([x for x, _ in after])
+    assert np.allclose(x, (data.x - norm.xstats.mean) / (norm.xstats.std + norm.eps))
+    assert not np.allclose(x, np.concatenate([x for x, _ in before]))
@@ -0,0 +1,69 @@
+import tracemalloc
+import numpy as np
+import pytest
+from kudzunn.callbacks import Callback, EarlyStoppingCallback, MemoryCallback
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import Sequential, Tanh, ZeroBiasAffine
+from kudzunn.loss import MSE
+from kudzunn.optim import GD
+from kudzunn.train import Learner
+
+
+def test_early_stopping():
+    x = np.linspace(-1, 1, 20)
+    data = Data(x, 2.0 * x)
+    dl = Dataloader(data, Sampler(data, 20))
+    learner = Learner(GD(0.0), MSE(), ZeroBiasAffine(winit=1.0), 100)
+    stopper = EarlyStoppingCallback(learner, patience=2)
+    learner.set_callbacks([stopper])
+    learner.train_loop(dl)
+    assert stopper.best_epoch == 0
+    assert stopper.stopped_epoch == 2
+    assert len(stopper.losses) == 3
+
+
+class Leaky(Callback):
+    "keeps a batch-sized array every batch"
+
+    def __init__(self, learner):
+        super().__init__(learner)
+        self.kept = []
+
+    def batch_end(self):
+        self.kept.append(np.ones(1000))
+        return True
+
+
+def memory_run(extra=()):
+    x = np.linspace(-1, 1, 400)
+    data = Data(x, 2.0 * x)
+    dl = Dataloader(data, Sampler(data, 100))
+    learner = Learner(GD(0.1), MSE(), Sequential(ZeroBiasAffine(rng=0), Tanh()), 3)
+    memory = MemoryCallback(learner, warmup=2)
+    learner.set_callbacks([memory, *(cb(learner) for cb in extra)])
+    learner.train_loop(dl)
+    return memory
+
+
+def test_memory_phases_and_layers():
+    memory = memory_run()
+    assert not tracemalloc.is_tracing()
+    assert len(memory.epochs) == 3
+    epoch = memory.epochs[-1]
+    assert set(epoch) == {"data", "forward", "backward", "step", "epoch"}
+    # the batch copies and the forward temporaries are 100 float64s or more
+    assert epoch["data"]["peak"] >= 800
+    assert epoch["forward"]["peak"] >= 800
+    assert epoch["epoch"]["peak"] > 0
+    # ZeroBiasAffine keeps its inputs, Tanh its output
+    assert memory.layers == {"0.ZeroBiasAffine": 800, "1.Tanh": 800}
+    assert memory.leaks == []
+
+
+def test_memory_flags_growth():
+    with pytest.warns(ResourceWarning):
+        memory = memory_run([Leaky])
+    # 12 batches, the first of each epoch has no baseline, 2 are warm-up
+    assert len(memory.leaks) == 8
+    assert all(growth >= 8000 for _, _, growth in memory.leaks)
+    assert memory.epochs[-1]["epoch"]["allocated"] >= 4 * 8000
@@ -0,0 +1,66 @@
+import json
+import numpy as np
+import pytest
+from kudzunn.bin import train
+from kudzunn.config import build, load_config, make_schedule
+from kudzunn.serialize import load_params
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    x = np.linspace(-1, 1, 50)
+    np.save(tmp_path / "x.npy", x)
+    np.save(tmp_path / "y.npy", 3.0 * x)
+    config = {
+        "data": {"x": "x.npy", "y": "y.npy"},
+        "model": {"name": "ZeroBiasAffine", "winit": 0.5},
+        "loss": {"name": "MSE"},
+        "optimizer": {"name": "GD", "lr": 0.5},
+        "schedule": {"name": "step", "step_size": 50, "gamma": 0.5},
+        "train": {"epochs": 100, "batch_size": 10},
+    }
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+    return path
+
+
+def test_build_and_train(config_path):
+    learner, dl = build(load_config(config_path), root=config_path.parent)
+    learner.train_loop(dl)
+    assert np.isclose(learner.func.params["w"], 3.0)
+    assert np.isclose(learner.opt.lr, 0.25)
+
+
+def test_toml_config(tmp_path):
+    path = tmp_path / "config.toml"
+    path.write_text('[model]\nname = "ZeroBiasAffine"\n[train]\nepochs = 3\n')
+    config = load_config(path)
+    assert config["model"]["name"] == "ZeroBiasAffine"
+    assert config["train"]["epochs"] == 3
+
+
+def test_bad_config(tmp_path, config_path):
+    config = load_config(config_path)
+    config["model"]["name"] = "MSE"
+    with pytest.raises(ValueError):
+        build(config, root=config_path.parent)
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps({"modle": {}}))
+    with pytest.raises(ValueError):
+        load_config(path)
+
+
+def test_schedules():
+    assert make_schedule({"name": "exponential", "gamma": 0.5}, 1.0)(2) == 0.25
+    cosine = make_schedule({"name": "cosine"}, 1.0, epochs=10)
+    assert np.isclose(cosine(0), 1.0) and np.isclose(cosine(10), 0.0)
+    assert make_schedule({"name": "cosine"}, 1.0, epochs=0)(0) == 1.0
+
+
+def test_cli(monkeypatch, config_path):
+    output = config_path.parent / "model.kzn"
+    monkeypatch.setattr(
+        "sys.argv", ["kudzunn-train", str(config_path), "-o", str(output)]
+    )
+    train.main()
+    assert np.isclose(load_params(output)["w"], 3.0)
@@ -35,3 +35,32 @@ def data_dir() -> Path:
 def loaded_example_values(data_dir) -> Dict[str, int]:
     with open(data_dir / "example_values.json", "r") as read_in:
         return json.load(read_in)
+
+
+# The gradient check harness: any test asking for `function_cls` or
+# `loss_cls` runs once per concrete Function or Loss in the package, so a
+# new subclass is checked (or fails for want of a test case) automatically.
+SHAPES = [(7,), (4, 5), (2, 3, 4)]
+DTYPES = ["float64", "float32"]
+
+
+def pytest_generate_tests(metafunc):
+    from kudzunn.function import Activation, Function
+    from kudzunn.gradcheck import implementations
+    from kudzunn.loss import Loss, PointwiseLoss
+
+    bases = {
+        "function_cls": implementations(Function, [Activation]),
+        "loss_cls": implementations(Loss, [PointwiseLoss]),
+    }
+    harness = False
+    for name, classes in bases.items():
+        if name in metafunc.fixturenames:
+            metafunc.parametrize(name, classes, ids=[c.__name__ for c in classes])
+            harness = True
+    # only harness tests get the shapes and dtypes; others parametrize
+    # their own
+    if harness and "shape" in metafunc.fixturenames:
+        metafunc.parametrize("shape", SHAPES, ids=str)
+    if harness and "dtype" in metafunc.fixturenames:
+        metafunc.parametrize("dtype", DTYPES)
@@ -1,5 +1,13 @@
 import numpy as np
-from kudzunn.data import Data
+import pytest
+from kudzunn.data import (
+    BucketSampler,
+    Data,
+    Dataloader,
+    Sampler,
+    StratifiedSampler,
+    WeightedSampler,
+)
 
 
 def test_data_length():
@@ -15,3 +23,98 @@ def test_data_getitem():
     d = Data(x, y)
     for i in range(10):
         assert d[i] == (i, i)
+
+
+def test_data_shuffle_none():
+    x = np.arange(10)
+    d = Data(x, x.copy(), shuffle=False)
+    sx, sy = d.shuffle()
+    assert sx is x
+    assert np.array_equal(sx, np.arange(10))
+
+
+def test_data_shuffle_copy():
+    x = np.arange(10)
+    d = Data(x, 2 * x, shuffle=True, rng=0)
+    sx, sy = d.shuffle()
+    assert np.array_equal(x, np.arange(10))
+    assert np.array_equal(sy, 2 * sx)
+    assert sorted(sx) == list(range(10))
+
+
+def test_data_shuffle_inplace():
+    x = np.arange(100)
+    y = np.stack([x, -x], axis=1)
+    d = Data(x, y, shuffle="inplace", rng=0)
+    sx, sy = d.shuffle()
+    assert sx is x and sy is y
+    assert not np.array_equal(x, np.arange(100))
+    assert np.array_equal(y[:, 0], x) and np.array_equal(y[:, 1], -x)
+    assert sorted(x) == list(range(100))
+
+
+def test_data_shuffle_index():
+    x = np.arange(10)
+    d = Data(x, 2 * x, shuffle="index", rng=0)
+    perm = d.shuffle()
+    assert np.array_equal(x, np.arange(10))
+    for i in range(10):
+        assert d[i] == (perm[i], 2 * perm[i])
+
+
+def test_data_shuffle_bad_mode():
+    with pytest.raises(ValueError):
+        Data(np.zeros(3), np.zeros(3), shuffle="sometimes")
+
+
+def test_dataloader_reshuffles_inplace():
+    x = np.arange(20)
+    d = Data(x, 2 * x, shuffle="inplace", rng=1)
+    dl = Dataloader(d, Sampler(d, 5))
+    first = np.concatenate([bx for bx, by in dl])
+    second = np.concatenate([bx for bx, by in dl])
+    assert not np.array_equal(first, second)
+    assert sorted(first) == sorted(second) == list(range(20))
+
+
+def test_sampler_drop_last():
+    d = Data(np.arange(23.0), np.arange(23.0))
+    sampler = Sampler(d, 5, shuffle=True, rng=0, drop_last=True)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 4
+    assert all(len(b) == 5 for b in batches)
+    assert len(Sampler(d, 5)) == 5
+
+
+def test_weighted_sampler():
+    d = Data(np.arange(4.0), np.arange(4.0))
+    weights = np.array([1.0, 0.0, 3.0, 4.0])
+    sampler = WeightedSampler(d, 1000, weights, num_samples=80000, rng=0)
+    counts = np.bincount(np.concatenate(list(sampler)), minlength=4)
+    assert counts[1] == 0
+    assert np.allclose(counts / counts.sum(), weights / weights.sum(), atol=0.01)
+
+
+def test_stratified_sampler():
+    y = np.repeat([0, 1, 2], [10, 20, 30])
+    d = Data(np.arange(60.0), y)
+    batches = list(StratifiedSampler(d, 6, rng=0))
+    assert sorted(np.concatenate(batches)) == list(range(60))
+    for b in batches:
+        assert list(np.bincount(y[b], minlength=3)) == [1, 2, 3]
+
+
+def test_stratified_sampler_bins():
+    y = np.linspace(0, 1, 40)
+    d = Data(y, y)
+    for b in StratifiedSampler(d, 4, bins=[0.5], rng=0):
+        assert (y[b] < 0.5).sum() == 2
+
+
+def test_bucket_sampler():
+    lengths = np.arange(20) % 5
+    d = Data(np.arange(20.0), np.arange(20.0))
+    batches = list(BucketSampler(d, 4, lengths, rng=0))
+    assert sorted(np.concatenate(batches)) == list(range(20))
+    for b in batches:
+        assert len(set(lengths[b])) == 1
@@ -1,5 +1,19 @@
 import numpy as np
-from kudzunn.function import ZeroBiasAffine
+import pytest
+from kudzunn.function import (
+    GELU,
+    Embedding,
+    LeakyReLU,
+    ReLU,
+    Sequential,
+    Sigmoid,
+    Softmax,
+    Tanh,
+    ZeroBiasAffine,
+)
+from kudzunn.gradcheck import gradcheck
+from kudzunn.optim import GD
+from kudzunn.serialize import load, save
 
 
 def test_zba_constructor():
@@ -30,3 +44,160 @@ def test_zba_grad_dw():
     incoming_grads = np.ones(3)
     f.backward(incoming_grads)
     assert np.isclose(f.grads["w"], 3.0)
+
+
+def test_zba_replicas_shapes():
+    f = ZeroBiasAffine(winit=1.0, replicas=4)
+    assert f.params["w"].shape == (4,)
+    assert f.grads["w"].shape == (4,)
+    out = f(np.ones(3))
+    assert out.shape == (4, 3)
+    dfdx = f.backward(np.ones((4, 3)))
+    assert dfdx.shape == (4, 3)
+    assert np.allclose(f.grads["w"], 3.0)
+
+
+def test_zba_replicas_per_replica_inputs():
+    f = ZeroBiasAffine(replicas=2)
+    f.params["w"] = np.array([1.0, 2.0])
+    inputs = np.array([[1.0, 2.0], [3.0, 4.0]])
+    assert np.allclose(f(inputs), [[1.0, 2.0], [6.0, 8.0]])
+    f.backward(np.ones((2, 2)))
+    assert np.allclose(f.grads["w"], [3.0, 7.0])
+
+
+ACTIVATIONS = [ReLU, LeakyReLU, Sigmoid, Tanh, GELU, Softmax]
+
+
+def numerical_input_grad(f, inputs, grad, eps=1e-6):
+    num = np.zeros_like(inputs)
+    for i in np.ndindex(inputs.shape):
+        up, down = inputs.copy(), inputs.copy()
+        up[i] += eps
+        down[i] -= eps
+        num[i] = ((f(up) - f(down)) * grad).sum() / (2 * eps)
+    return num
+
+
+@pytest.mark.parametrize("cls", ACTIVATIONS)
+def test_activation_grads(cls):
+    rng = np.random.default_rng(0)
+    inputs = rng.normal(size=(4, 3))
+    grad = rng.normal(size=(4, 3))
+    f = cls()
+    out = f(inputs)
+    dfdx = f.backward(grad)
+    assert np.allclose(dfdx, numerical_input_grad(cls(), inputs, grad))
+    g = cls(inplace=True)
+    inplace_inputs, inplace_grad = inputs.copy(), grad.copy()
+    assert np.allclose(g(inplace_inputs), out)
+    assert np.allclose(g.backward(inplace_grad), dfdx)
+    if cls is not GELU:
+        assert np.shares_memory(g(inplace_inputs), inplace_inputs)
+
+
+def test_activation_caches():
+    inputs = np.linspace(-1, 1, 6)
+    relu = ReLU()
+    relu(inputs)
+    assert relu.mask.dtype == bool
+    for f in (ReLU(), LeakyReLU(), Sigmoid(), Tanh(), Softmax()):
+        f(inputs)
+        assert not hasattr(f, "inputs")
+
+
+def test_sequential_params_write_through():
+    first, second = ZeroBiasAffine(winit=2.0), ZeroBiasAffine(winit=3.0)
+    f = Sequential(first, ReLU(), second)
+    assert list(f.params) == ["0.w", "2.w"]
+    assert np.allclose(f(np.array([-1.0, 1.0])), [0.0, 6.0])
+    assert np.allclose(f.backward(np.ones(2)), [0.0, 6.0])
+    assert np.isclose(f.grads["0.w"], 3.0) and np.isclose(f.grads["2.w"], 2.0)
+    GD(lr=0.1).step(f)
+    assert np.isclose(first.params["w"], 1.7) and np.isclose(second.params["w"], 2.8)
+    with pytest.raises(KeyError):
+        f.params["1.w"] = 1.0
+
+
+def test_sequential_save_load(tmp_path):
+    save(Sequential(ZeroBiasAffine(winit=2.0), Tanh()), tmp_path / "seq.kzn")
+    f = load(tmp_path / "seq.kzn", Sequential(ZeroBiasAffine(winit=0.0), Tanh()))
+    assert f.layers[0].params["w"] == 2.0
+
+
+def deep(checkpoint=None, inplace=False):
+    layers = []
+    for i in range(4):
+        layers += [ZeroBiasAffine(rng=i), Tanh(inplace=inplace)]
+    return Sequential(*layers, checkpoint=checkpoint)
+
+
+@pytest.mark.parametrize("checkpoint", [1, 2, 3, 8])
+@pytest.mark.parametrize("inplace", [False, True])
+def test_sequential_checkpoint_matches(checkpoint, inplace):
+    inputs = np.linspace(-1, 1, 9)
+    plain, checkpointed = deep(), deep(checkpoint, inplace)
+    assert np.allclose(checkpointed(inputs.copy()), plain(inputs.copy()))
+    grad = np.linspace(1, 2, 9)
+    assert np.allclose(checkpointed.backward(grad.copy()), plain.backward(grad))
+    for name in plain.grads:
+        assert np.isclose(checkpointed.grads[name], plain.grads[name])
+    assert gradcheck(deep(checkpoint, inplace), inputs, rng=0)
+
+
+def test_sequential_rejects_inplace_after_output_cache():
+    for before in (Sigmoid(), Tanh(), Softmax(), Sequential(ReLU(), Tanh())):
+        with pytest.raises(ValueError, match="overwrite"):
+            Sequential(before, ReLU(inplace=True))
+    with pytest.raises(ValueError):
+        Sequential(Sigmoid(), Sequential(LeakyReLU(inplace=True), ReLU()))
+    # these return fresh arrays, or only overwrite the gradient in place
+    Sequential(ZeroBiasAffine(), ReLU(inplace=True), Tanh(inplace=True))
+    Sequential(Tanh(), GELU(inplace=True))
+
+
+def nested(checkpoint=None):
+    layers = []
+    for i in range(3):
+        inner = Sequential(LeakyReLU(inplace=True), ZeroBiasAffine(rng=2 * i + 1))
+        layers += [ZeroBiasAffine(rng=2 * i), inner]
+    return Sequential(*layers, checkpoint=checkpoint)
+
+
+def test_sequential_checkpoint_nested_inplace():
+    inputs = np.linspace(-1, 1, 9)
+    plain, checkpointed = nested(), nested(checkpoint=1)
+    assert np.allclose(checkpointed(inputs.copy()), plain(inputs.copy()))
+    grad = np.linspace(1, 2, 9)
+    assert np.allclose(checkpointed.backward(grad.copy()), plain.backward(grad))
+    for name in plain.grads:
+        assert np.isclose(checkpointed.grads[name], plain.grads[name])
+
+
+def test_sequential_checkpoint_releases():
+    f = deep(checkpoint=3)
+    f(np.linspace(-1, 1, 9))
+    # only the inputs of the first two segments and the last segment's caches
+    assert len(f.checkpoints) == 2
+    assert [hasattr(layer, layer.cache[0]) for layer in f.layers] == [
+        *[False] * 6,
+        True,
+        True,
+    ]
+    f.backward(np.ones(9))
+    assert f.checkpoints == []
+    assert not any(hasattr(layer, layer.cache[0]) for layer in f.layers[:6])
+
+
+def test_embedding_sparse_rows():
+    table = np.arange(12.0).reshape(6, 2)
+    f = Embedding(6, 2, winit=table)
+    ids = np.array([[4, 1], [4, 0]])
+    assert np.array_equal(f(ids), table[ids])
+    assert f.backward(np.ones((2, 2, 2))) is None
+    grad = f.grads["w"]
+    assert np.array_equal(grad.rows, [0, 1, 4])
+    assert np.array_equal(grad.values, [[1.0, 1.0], [1.0, 1.0], [2.0, 2.0]])
+    GD(lr=0.5).step(f)
+    assert np.array_equal(f.params["w"][[2, 3, 5]], table[[2, 3, 5]])
+    assert np.array_equal(f.params["w"][4], table[4] - 1.0)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from kudzunn.bin import bench_fused
+from kudzunn.callbacks import AccCallback
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import ReLU, ZeroBiasAffine
+from kudzunn.fused import FusedStep, _zba_mse_loop, _zba_mse_numpy, zba_mse
+from kudzunn.loss import MAE, MSE
+from kudzunn.metrics import MeanSquaredError, MetricsCallback
+from kudzunn.optim import GD
+from kudzunn.train import Learner
+
+
+def make_loader(seed=0, dtype="float64"):
+    rng = np.random.default_rng(seed)
+    x = rng.standard_normal(50).astype(dtype)
+    data = Data(x, (2.0 * x + 0.1 * rng.standard_normal(50)).astype(dtype), rng=1)
+    return Dataloader(data, Sampler(data, 8, rng=2))
+
+
+@pytest.mark.parametrize("kernel", [_zba_mse_loop, _zba_mse_numpy, zba_mse])
+def test_kernels_match_separate_steps(kernel):
+    rng = np.random.default_rng(0)
+    x, y = rng.standard_normal(9), rng.standard_normal(9)
+    f, loss = ZeroBiasAffine(winit=0.7), MSE()
+    predicted = f(x)
+    f.backward(loss.backward(predicted, y))
+    out = np.empty(9)
+    value, grad = kernel(x, y, 0.7, out)
+    assert np.allclose(out, predicted)
+    assert np.isclose(value, loss(predicted, y))
+    assert np.isclose(grad, f.grads["w"])
+
+
+@pytest.mark.parametrize(
+    "settings", [{}, {"momentum": 0.9}, {"clip_norm": 0.5, "weight_decay": 0.1}]
+)
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+def test_fused_training_matches(settings, dtype):
+    results = []
+    for fused in (False, True):
+        func = ZeroBiasAffine(winit=0.0)
+        learner = Learner(GD(0.1, **settings), MSE(), func, 5, fused=fused)
+        acc = AccCallback(learner)
+        metrics = MetricsCallback(learner, {"mse": MeanSquaredError()})
+        learner.set_callbacks([acc, metrics])
+        loss = learner.train_loop(make_loader(dtype=dtype))
+        results.append((loss, func.params["w"], acc.batch_losses, metrics.history))
+    (loss, w, losses, history), expected = results
+    tol = 1e-5 if dtype == "float32" else 1e-12
+    assert np.isclose(loss, expected[0], rtol=tol)
+    assert np.isclose(w, expected[1], rtol=tol)
+    assert np.allclose(losses, expected[2], rtol=tol)
+    assert len(history) == 5
+    for row, want in zip(history, expected[3]):
+        assert np.isclose(row["train_mse"], want["train_mse"], rtol=tol)
+
+
+def test_fused_falls_back():
+    assert not FusedStep.applies(ZeroBiasAffine(replicas=3), MSE(replicas=True))
+    assert not FusedStep.applies(ZeroBiasAffine(), MAE())
+    assert not FusedStep.applies(ReLU(), MSE())
+    with pytest.raises(TypeError):
+        FusedStep(ZeroBiasAffine(), MAE())
+    step = FusedStep(ZeroBiasAffine(), MSE())
+    assert step.accepts(np.zeros(3), np.zeros(3))
+    assert not step.accepts(np.zeros(3), np.zeros(3, dtype="float32"))
+    assert not step.accepts(np.zeros((3, 2)), np.zeros((3, 2)))
+    assert not step.accepts(np.arange(3), np.arange(3))
+    # unsupported combinations train as usual
+    func = ZeroBiasAffine(winit=0.0)
+    assert Learner(GD(0.1), MAE(), func, 3, fused=True).train_loop(make_loader()) > 0
+
+
+def test_benchmark_cli(monkeypatch, capsys):
+    monkeypatch.setattr(
+        "sys.argv", ["kudzunn-bench-fused", "-b", "4", "64", "-n", "256", "-r", "1"]
+    )
+    bench_fused.main()
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 4 and lines[-1].split()[0] == "64"
@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+from kudzunn.function import (
+    GELU,
+    Embedding,
+    LeakyReLU,
+    Linear,
+    ReLU,
+    Sequential,
+    Sigmoid,
+    Softmax,
+    Tanh,
+    ZeroBiasAffine,
+)
+from kudzunn.gradcheck import GradcheckError, gradcheck, losscheck
+from kudzunn.loss import (
+    MAE,
+    MSE,
+    BinaryCrossEntropy,
+    Huber,
+    LogCosh,
+    SoftmaxCrossEntropy,
+)
+
+
+def away_from_zero(rng, shape, dtype):
+    "normal draws at least 0.1 from zero, clear of the kinks of ReLU and MAE"
+    z = rng.standard_normal(shape)
+    return (np.sign(z) * (0.1 + np.abs(z))).astype(dtype)
+
+
+def ids(rng, shape, dtype):
+    return rng.integers(0, 10, shape)
+
+
+# How to build each Function, the input ranks it supports (None: any) and,
+# optionally, how to draw its inputs. A Function added to the package
+# without an entry here fails the harness.
+FUNCTIONS = {
+    ZeroBiasAffine: (lambda: ZeroBiasAffine(rng=0), (1,)),
+    Sequential: (
+        lambda: Sequential(ZeroBiasAffine(rng=0), Tanh(), ZeroBiasAffine(rng=1)),
+        (1,),
+    ),
+    Linear: (lambda: Linear(5, 3, rng=0), (2,)),
+    Embedding: (lambda: Embedding(10, 3, rng=0), None, ids),
+    ReLU: (ReLU, None),
+    LeakyReLU: (lambda **kw: LeakyReLU(0.1, **kw), None),
+    Sigmoid: (Sigmoid, None),
+    Tanh: (Tanh, None),
+    GELU: (GELU, None),
+    Softmax: (Softmax, None),
+}
+
+
+def pointwise_case(loss):
+    def make(rng, shape, dtype):
+        predicted = rng.standard_normal(shape).astype(dtype)
+        return loss, predicted, predicted - away_from_zero(rng, shape, dtype)
+
+    return make
+
+
+def bce_case(from_logits):
+    def make(rng, shape, dtype):
+        predicted = rng.standard_normal(shape)
+        if not from_logits:
+            predicted = rng.uniform(0.05, 0.95, shape)
+        actual = rng.integers(0, 2, shape).astype(dtype)
+        loss = BinaryCrossEntropy(from_logits=from_logits)
+        return loss, predicted.astype(dtype), actual
+
+    return make
+
+
+def softmax_case(labels):
+    def make(rng, shape, dtype):
+        if len(shape) != 2:
+            pytest.skip("softmax cross-entropy takes (N, C) logits")
+        predicted = rng.standard_normal(shape).astype(dtype)
+        actual = rng.integers(0, shape[1], shape[0])
+        if not labels:
+            actual = rng.dirichlet(np.ones(shape[1]), shape[0]).astype(dtype)
+        return SoftmaxCrossEntropy(), predicted, actual
+
+    return make
+
+
+# Each Loss maps to the cases that build it with predictions and targets.
+LOSSES = {
+    MSE: [pointwise_case(MSE())],
+    MAE: [pointwise_case(MAE())],
+    Huber: [pointwise_case(Huber(0.5))],
+    LogCosh: [pointwise_case(LogCosh())],
+    BinaryCrossEntropy: [bce_case(True), bce_case(False)],
+    SoftmaxCrossEntropy: [softmax_case(True), softmax_case(False)],
+}
+
+
+def test_function_gradients(function_cls, shape, dtype):
+    assert function_cls in FUNCTIONS, f"add a gradcheck case for {function_cls}"
+    make, ndims, draw = (*FUNCTIONS[function_cls], away_from_zero)[:3]
+    if ndims is not None and len(shape) not in ndims:
+        pytest.skip(f"{function_cls.__name__} takes {ndims}-D inputs")
+    rng = np.random.default_rng(0)
+    inputs = draw(rng, shape, dtype)
+    assert gradcheck(make(), inputs, rng=1)
+    if "inplace" in function_cls.__init__.__code__.co_varnames:
+        assert gradcheck(make(inplace=True), inputs, rng=1)
+
+
+def test_loss_gradients(loss_cls, shape, dtype):
+    assert loss_cls in LOSSES, f"add a gradcheck case for {loss_cls}"
+    rng = np.random.default_rng(0)
+    for make in LOSSES[loss_cls]:
+        loss, predicted, actual = make(rng, shape, dtype)
+        assert losscheck(loss, predicted, actual, rng=1)
+        weights = rng.uniform(0.0, 2.0, shape[0])
+        assert losscheck(loss, predicted, actual, weights, rng=1)
+
+
+def test_replicated_gradients():
+    rng = np.random.default_rng(0)
+    func = ZeroBiasAffine(replicas=3, rng=0)
+    assert gradcheck(func, rng.standard_normal(5), rng=1)
+    assert gradcheck(func, rng.standard_normal((3, 5)), rng=1)
+    predicted = rng.standard_normal((3, 5))
+    assert losscheck(MSE(replicas=True), predicted, rng.standard_normal(5), rng=1)
+
+
+def test_gradcheck_restores_params():
+    func = ZeroBiasAffine(winit=2.0)
+    gradcheck(func, np.linspace(-1, 1, 5), rng=0)
+    assert func.params["w"] == 2.0
+    assert isinstance(func.params["w"], float)
+
+
+def test_gradcheck_catches_wrong_backward():
+    class Wrong(Tanh):
+        def backward(self, grad):
+            return grad * (1.0 - self.output)
+
+    with pytest.raises(GradcheckError):
+        gradcheck(Wrong(), np.linspace(-1, 1, 5), rng=0)
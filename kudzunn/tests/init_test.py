@@ -0,0 +1,53 @@
+import subprocess
+import sys
+from pathlib import Path
+import kudzunn
+
+ROOT = Path(kudzunn.__file__).parent.parent
+
+
+def _run(code: str) -> str:
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+    )
+    return out.stdout.strip()
+
+
+def test_import_loads_no_submodules():
+    code = (
+        "import sys, kudzunn\n"
+        "print(sorted(m for m in sys.modules if m.startswith('kudzunn.')))"
+    )
+    assert _run(code) == "[]"
+
+
+def test_import_time():
+    # Generous bound: the package itself should cost a few milliseconds on
+    # top of numpy, which every user already pays for.
+    code = (
+        "import time, numpy\n"
+        "t = time.perf_counter()\n"
+        "import kudzunn\n"
+        "print(time.perf_counter() - t)"
+    )
+    assert float(_run(code)) < 0.05
+
+
+def test_callbacks_import_first():
+    code = "import kudzunn.callbacks, kudzunn.train\nprint('ok')"
+    assert _run(code) == "ok"
+
+
+def test_lazy_attributes():
+    from kudzunn.train import Learner
+    from kudzunn.function import ZeroBiasAffine
+
+    assert kudzunn.Learner is Learner
+    assert kudzunn.ZeroBiasAffine is ZeroBiasAffine
+    assert "Dataloader" in dir(kudzunn)
+    for name in kudzunn.__all__:
+        assert getattr(kudzunn, name) is not None
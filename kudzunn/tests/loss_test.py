@@ -1,5 +1,17 @@
 import numpy as np
-from kudzunn.loss import MSE
+import pytest
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import ZeroBiasAffine
+from kudzunn.loss import (
+    MAE,
+    MSE,
+    BinaryCrossEntropy,
+    Huber,
+    LogCosh,
+    SoftmaxCrossEntropy,
+)
+from kudzunn.optim import GD
+from kudzunn.train import Learner
 
 
 def test_loss_value():
@@ -16,3 +28,102 @@ def test_loss_grad():
     el = MSE()
     grads = el.backward(preds, actuals)
     assert np.allclose(grads, np.array([0.1, 0.1]))
+
+
+def test_loss_replicas():
+    preds = np.array([[1.1, 1.1], [1.2, 1.2]])
+    actuals = np.array([1.0, 1.0])
+    el = MSE(replicas=True)
+    assert np.allclose(el(preds, actuals), [0.01, 0.04])
+    assert np.allclose(el.backward(preds, actuals), [[0.1, 0.1], [0.2, 0.2]])
+
+
+def numerical_grad(loss, preds, actuals, weights=None, eps=1e-6):
+    grad = np.zeros_like(preds)
+    for i in np.ndindex(preds.shape):
+        up, down = preds.copy(), preds.copy()
+        up[i] += eps
+        down[i] -= eps
+        grad[i] = (loss(up, actuals, weights) - loss(down, actuals, weights)) / (
+            2 * eps
+        )
+    return grad
+
+
+@pytest.mark.parametrize(
+    "loss, actuals",
+    [
+        (MSE(), np.array([0.5, -1.0, 2.0, 0.0])),
+        (MAE(), np.array([0.5, -1.0, 2.0, 0.0])),
+        (Huber(delta=0.5), np.array([0.5, -1.0, 2.0, 0.0])),
+        (LogCosh(), np.array([0.5, -1.0, 2.0, 0.0])),
+        (BinaryCrossEntropy(), np.array([0.0, 1.0, 1.0, 0.0])),
+        (BinaryCrossEntropy(from_logits=False), np.array([0.0, 1.0, 1.0, 0.0])),
+    ],
+)
+@pytest.mark.parametrize("weights", [None, np.array([1.0, 2.0, 0.5, 0.0])])
+def test_pointwise_loss_grads(loss, actuals, weights):
+    preds = np.array([0.3, 0.2, 0.9, 0.6])
+    grads = loss.backward(preds, actuals, weights)
+    assert np.allclose(grads, numerical_grad(loss, preds, actuals, weights))
+    out = np.empty(4)
+    assert loss.backward(preds, actuals, weights, out=out) is out
+    assert np.allclose(out, grads)
+
+
+def test_huber_values():
+    el = Huber(delta=1.0)
+    assert np.isclose(el(np.array([0.5]), np.array([0.0])), 0.125)
+    assert np.isclose(el(np.array([3.0]), np.array([0.0])), 2.5)
+
+
+def test_logits_losses_stable():
+    big = np.array([1000.0, -1000.0])
+    assert np.allclose(BinaryCrossEntropy()(big, np.array([1.0, 0.0])), 0.0)
+    assert np.allclose(LogCosh()(big, np.zeros(2)), 1000.0 - np.log(2.0))
+    logits = np.array([[1000.0, 0.0], [0.0, 1000.0]])
+    sce = SoftmaxCrossEntropy()
+    assert np.isclose(sce(logits, np.array([0, 1])), 0.0)
+    assert np.all(np.isfinite(sce.backward(logits, np.array([1, 0]))))
+
+
+@pytest.mark.parametrize("weights", [None, np.array([1.0, 3.0, 0.5])])
+def test_softmax_cross_entropy(weights):
+    logits = np.array([[0.1, 0.5, -0.3], [1.0, 0.0, 0.2], [0.3, 0.3, 0.9]])
+    labels = np.array([1, 0, 2])
+    onehot = np.eye(3)[labels]
+    sce = SoftmaxCrossEntropy()
+    assert np.isclose(sce(logits, labels, weights), sce(logits, onehot, weights))
+    grads = sce.backward(logits, labels, weights)
+    assert np.allclose(grads, sce.backward(logits, onehot, weights))
+    assert np.allclose(grads, numerical_grad(sce, logits, labels, weights))
+
+
+def test_weighted_loss_replicas():
+    preds = np.array([[1.0, 2.0], [3.0, 4.0]])
+    el = MSE(replicas=True)
+    weights = np.array([[1.0, 0.0], [0.0, 1.0]])
+    assert np.allclose(el(preds, np.zeros(2), weights), [1.0, 16.0])
+
+
+@pytest.mark.parametrize(
+    "loss", [MSE(), MAE(), Huber(delta=0.5), LogCosh(), BinaryCrossEntropy()]
+)
+def test_integer_inputs(loss):
+    preds, actuals = np.array([3, 0, 1, 2]), np.array([1, 0, 1, 0])
+    grads = loss.backward(preds, actuals)
+    assert grads.dtype == np.float64
+    assert np.allclose(grads, loss.backward(preds * 1.0, actuals * 1.0))
+    single = preds.astype(np.float32), actuals.astype(np.float32)
+    assert loss.backward(*single).dtype == np.float32
+    logits, labels = np.array([[2, 0], [0, 1]]), np.array([0, 1])
+    grads = SoftmaxCrossEntropy().backward(logits, labels)
+    assert np.allclose(grads, SoftmaxCrossEntropy().backward(logits * 1.0, labels))
+
+
+def test_integer_training():
+    x = np.arange(10)
+    data = Data(x, 2 * x)
+    learner = Learner(GD(0.01), MSE(), ZeroBiasAffine(winit=1), 20)
+    learner.train_loop(Dataloader(data, Sampler(data, 5)))
+    assert np.isclose(learner.func.params["w"], 2.0, atol=0.05)
@@ -0,0 +1,140 @@
+import threading
+import numpy as np
+import pytest
+from kudzunn.callbacks import Callback
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import ZeroBiasAffine
+from kudzunn.loss import MSE
+from kudzunn.normalize import Normalizer
+from kudzunn.metrics import (
+    AUC,
+    MeanAbsoluteError,
+    MeanSquaredError,
+    MetricsCallback,
+    R2Score,
+    evaluate,
+)
+from kudzunn.optim import GD
+from kudzunn.train import Learner
+
+
+def exact_auc(scores, labels):
+    pos, neg = scores[labels == 1], scores[labels == 0]
+    wins = (pos[:, None] > neg[None, :]).sum() + 0.5 * (pos[:, None] == neg).sum()
+    return wins / (len(pos) * len(neg))
+
+
+@pytest.mark.parametrize(
+    "metric, expected",
+    [
+        (MeanSquaredError, lambda p, a: np.mean((p - a) ** 2)),
+        (MeanAbsoluteError, lambda p, a: np.mean(np.abs(p - a))),
+        (R2Score, lambda p, a: 1 - np.sum((p - a) ** 2) / np.sum((a - a.mean()) ** 2)),
+    ],
+)
+def test_streaming_and_merge(metric, expected):
+    rng = np.random.default_rng(0)
+    p, a = rng.standard_normal(100), rng.standard_normal(100)
+    streamed = metric()
+    for i in range(0, 100, 30):
+        streamed.update(p[i : i + 30], a[i : i + 30])
+    assert np.isclose(streamed.result(), expected(p, a))
+    left, right = metric(), metric()
+    left.update(p[:40], a[:40])
+    right.update(p[40:], a[40:])
+    assert np.isclose(left.merge(right).result(), expected(p, a))
+    assert streamed.empty().n == 0
+    assert np.isnan(metric().result())
+
+
+def test_auc():
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, 2000)
+    scores = np.clip(0.5 + 0.2 * (labels - 0.5) + 0.2 * rng.standard_normal(2000), 0, 1)
+    auc = AUC(bins=10000)
+    auc.update(scores[:1000], labels[:1000])
+    other = AUC(bins=10000)
+    other.update(scores[1000:], labels[1000:])
+    assert np.isclose(auc.merge(other).result(), exact_auc(scores, labels), atol=1e-3)
+    logits = AUC(from_logits=True)
+    logits.update(np.log(scores / (1 - scores + 1e-12) + 1e-12), labels)
+    assert np.isclose(logits.result(), exact_auc(scores, labels), atol=1e-2)
+    with pytest.raises(ValueError):
+        AUC().update(scores - 0.5, labels)
+    logits.update(scores - 0.5, labels)
+    assert np.isnan(AUC().result())
+
+
+def test_evaluate():
+    f = ZeroBiasAffine(winit=2.0)
+    x = np.linspace(-1, 1, 10)
+    results = evaluate(f, (x, 2.0 * x + 0.1), {"mae": MeanAbsoluteError()})
+    assert np.isclose(results["mae"], 0.1)
+
+
+class Release(Callback):
+    "lets the validation run only once training has finished"
+
+    def __init__(self, learner, gate):
+        super().__init__(learner)
+        self.gate = gate
+
+    def fit_end(self):
+        self.gate.set()
+        return True
+
+
+def test_metrics_callback_runs_off_the_training_thread():
+    x = np.linspace(-1, 1, 40)
+    data = Data(x, 2.0 * x, shuffle=False)
+    dl = Dataloader(data, Sampler(data, 10))
+    gate = threading.Event()
+
+    def validation():
+        assert gate.wait(10)
+        yield x, 2.0 * x
+
+    class Batches:
+        def __iter__(self):
+            return validation()
+
+    learner = Learner(GD(0.1), MSE(), ZeroBiasAffine(winit=0.0), 5)
+    metrics = {"mse": MeanSquaredError(), "r2": R2Score()}
+    cb = MetricsCallback(learner, metrics, validation=Batches())
+    learner.set_callbacks([Release(learner, gate), cb])
+    learner.train_loop(dl)
+    assert len(cb.history) == 5
+    # evaluated after training, yet each against its own epoch's parameters
+    val = [row["val_mse"] for row in cb.history]
+    assert all(a > b for a, b in zip(val, val[1:]))
+    train = [row["train_mse"] for row in cb.history]
+    assert all(a > b for a, b in zip(train, train[1:]))
+    assert np.isclose(cb.history[-1]["val_r2"], 1.0 - val[-1] / np.var(2.0 * x))
+    assert cb.executor is None
+
+
+def test_metrics_callback_reraises():
+    x = np.linspace(-1, 1, 10)
+    data = Data(x, x)
+    learner = Learner(GD(0.1), MSE(), ZeroBiasAffine(winit=0.0), 2)
+    cb = MetricsCallback(learner, {"mse": MeanSquaredError()}, validation=(x, x[:3]))
+    learner.set_callbacks([cb])
+    with pytest.raises(ValueError):
+        learner.train_loop(Dataloader(data, Sampler(data, 5)))
+
+
+def test_metrics_callback_shares_normalizer():
+    rng = np.random.default_rng(0)
+    x = rng.normal(3.0, 2.0, 400)
+    data = Data(x, 4.0 * x - 1.0, rng=1)
+    norm = Normalizer().fit(Dataloader(data, Sampler(data, 100)))
+    # the same normalizer, with buffers of the same shape, on both threads
+    train = Dataloader(data, Sampler(data, 20, rng=2), transforms=[norm])
+    val = Dataloader(data, Sampler(data, 20, shuffle=False), transforms=[norm])
+    learner = Learner(GD(0.1), MSE(), ZeroBiasAffine(winit=0.0), 20)
+    cb = MetricsCallback(learner, {"mse": MeanSquaredError()}, validation=val)
+    learner.set_callbacks([cb])
+    learner.train_loop(train)
+    assert np.isclose(learner.func.params["w"], 1.0)
+    assert cb.history[-1]["train_mse"] < 1e-12
+    assert cb.history[-1]["val_mse"] < 1e-12
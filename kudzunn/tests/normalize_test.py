@@ -0,0 +1,61 @@
+import threading
+import numpy as np
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import ZeroBiasAffine
+from kudzunn.loss import MSE
+from kudzunn.normalize import Normalizer, RunningStats
+from kudzunn.optim import GD
+from kudzunn.train import Learner
+
+
+def test_running_stats_matches_numpy():
+    x = np.random.default_rng(0).normal(3.0, 2.0, size=(101, 3))
+    stats = RunningStats()
+    for i in range(0, 101, 10):
+        stats.update(x[i : i + 10])
+    assert np.allclose(stats.mean, x.mean(axis=0))
+    assert np.allclose(stats.var, x.var(axis=0))
+
+
+def test_running_stats_merge():
+    x = np.random.default_rng(1).normal(size=50)
+    merged = RunningStats().update(x[:20]).merge(RunningStats().update(x[20:]))
+    assert merged.n == 50
+    assert np.isclose(merged.mean, x.mean()) and np.isclose(merged.std, x.std())
+
+
+def test_normalizer_reuses_buffers():
+    x = np.arange(20.0)
+    data = Data(x, 3.0 * x + 5.0)
+    norm = Normalizer().fit(Dataloader(data, Sampler(data, 6)))
+    dl = Dataloader(data, Sampler(data, 5), transforms=[norm])
+    seen = []
+    for bx, by in dl:
+        seen.append(bx)
+        assert np.allclose(by, bx)
+    assert all(b is seen[0] for b in seen)
+    assert np.isclose(norm.xstats.mean, x.mean())
+
+
+def test_normalizer_buffers_per_thread():
+    x = np.arange(5.0)
+    norm = Normalizer().fit([(x, x)])
+    bx, _ = norm(x, x)
+    expected = bx.copy()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(norm(x + 1.0, x)))
+    thread.start()
+    thread.join()
+    assert other[0][0] is not bx
+    assert np.array_equal(bx, expected)
+    assert norm(x, x)[0] is bx
+
+
+def test_normalizer_predict():
+    x = np.linspace(0.0, 10.0, 40)
+    data = Data(x, 2.0 * x + 1.0)
+    norm = Normalizer().fit(Dataloader(data, Sampler(data, 40)))
+    dl = Dataloader(data, Sampler(data, 8), transforms=[norm])
+    func = ZeroBiasAffine(winit=0.0)
+    Learner(GD(0.5), MSE(), func, 50).train_loop(dl)
+    assert np.allclose(norm.predict(func, np.array([0.0, 5.0])), [1.0, 11.0])
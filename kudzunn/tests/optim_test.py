@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import Embedding, Function, Sequential, Tanh, ZeroBiasAffine
+from kudzunn.loss import MSE, LogCosh
+from kudzunn.optim import GD, LBFGS, Adam
+from kudzunn.sparse import SparseGrad
+from kudzunn.train import Learner
+
+
+class Params(Function):
+    def __init__(self, **params) -> None:
+        super().__init__()
+        for name, (value, grad) in params.items():
+            self.params[name] = np.array(value, dtype=float)
+            self.grads[name] = np.array(grad, dtype=float)
+
+
+def test_gd_step():
+    f = Params(a=([1.0, 2.0], [0.5, -0.5]))
+    GD(lr=0.1).step(f)
+    assert np.allclose(f.params["a"], [0.95, 2.05])
+
+
+def test_weight_decay():
+    f = Params(a=([1.0, -2.0], [0.0, 0.0]))
+    GD(lr=0.1, weight_decay=0.5).step(f)
+    assert np.allclose(f.params["a"], [0.95, -1.9])
+    g = Params(a=([1.0, -2.0], [0.0, 0.0]))
+    GD(lr=0.1, weight_decay=0.5, decoupled=True).step(g)
+    assert np.allclose(g.params["a"], f.params["a"])
+
+
+def test_l1():
+    f = Params(a=([1.0, -2.0, 0.0], [0.0, 0.0, 0.0]))
+    GD(lr=0.1, l1=1.0).step(f)
+    assert np.allclose(f.params["a"], [0.9, -1.9, 0.0])
+
+
+def test_clip_norm_is_global():
+    f = Params(a=([0.0], [3.0]), b=([0.0], [4.0]))
+    opt = GD(lr=1.0, clip_norm=1.0)
+    opt.step(f)
+    assert np.isclose(opt.grad_norm, 5.0)
+    assert np.allclose(f.params["a"], [-0.6]) and np.allclose(f.params["b"], [-0.8])
+
+
+def test_clip_norm_leaves_small_grads():
+    f = Params(a=([0.0], [0.3]))
+    GD(lr=1.0, clip_norm=1.0).step(f)
+    assert np.allclose(f.params["a"], [-0.3])
+
+
+def test_clip_norm_per_replica():
+    f = ZeroBiasAffine(winit=0.0, replicas=3)
+    f.grads["w"] = np.array([30.0, 0.5, 0.0])
+    opt = GD(lr=1.0, clip_norm=1.0)
+    opt.step(f)
+    # only the diverging replica is clipped
+    assert np.allclose(f.params["w"], [-1.0, -0.5, 0.0])
+    assert np.isclose(opt.grad_norm, np.sqrt(900.25))
+
+
+def test_clip_value():
+    f = Params(a=([0.0, 0.0], [3.0, -0.1]))
+    GD(lr=1.0, clip_value=0.5).step(f)
+    assert np.allclose(f.params["a"], [-0.5, 0.1])
+
+
+def test_lbfgs_quadratic():
+    # minimize 0.5 * sum(c * (p - t)^2) with a badly scaled c
+    c = np.array([100.0, 1.0, 0.01])
+    t = np.array([1.0, -2.0, 3.0])
+    f = Params(a=(np.zeros(3), np.zeros(3)))
+    opt = LBFGS(lr=1.0)
+    for _ in range(30):
+        f.grads["a"] = c * (f.params["a"] - t)
+        opt.step(f)
+    assert np.allclose(f.params["a"], t, atol=1e-4)
+
+
+def test_lbfgs_trains_nonlinear_model():
+    x = np.linspace(-2, 2, 50)
+    data = Data(x, np.tanh(1.5 * x))
+    func = Sequential(ZeroBiasAffine(winit=0.1), Tanh())
+    learner = Learner(LBFGS(), LogCosh(), func, 40)
+    learner.train_loop(Dataloader(data, Sampler(data, 50)))
+    assert np.isclose(func.params["0.w"], 1.5, atol=1e-3)
+
+
+def test_momentum():
+    f = Params(a=([0.0], [1.0]))
+    opt = GD(lr=0.1, momentum=0.5)
+    opt.step(f)
+    opt.step(f)
+    # velocities 1 and 1.5
+    assert np.allclose(f.params["a"], [-0.25])
+
+
+def test_adam_first_step_is_lr():
+    f = Params(a=([1.0, 1.0], [0.3, -20.0]))
+    Adam(lr=0.1).step(f)
+    assert np.allclose(f.params["a"], [0.9, 1.1])
+
+
+def test_adam_minimizes_quadratic():
+    f = Params(a=([3.0, -2.0], [0.0, 0.0]))
+    opt = Adam(lr=0.05)
+    for _ in range(500):
+        f.grads["a"] = 2 * f.params["a"]
+        opt.step(f)
+    assert np.allclose(f.params["a"], 0.0, atol=1e-2)
+
+
+@pytest.mark.parametrize("opt", [Adam(lr=0.1), GD(lr=0.1, momentum=0.9)])
+def test_sparse_state_is_lazy(opt):
+    f = Embedding(5, 2, rng=0)
+    before = f.params["w"].copy()
+    for rows in ([1, 3], [3]):
+        f.grads["w"] = SparseGrad(np.array(rows), np.ones((len(rows), 2)), (5, 2))
+        opt.step(f)
+    untouched = [0, 2, 4]
+    assert np.array_equal(f.params["w"][untouched], before[untouched])
+    for (_, key), state in opt.state.items():
+        assert not state[untouched].any(), key
+    # a sparse step on the touched rows matches a dense step on those rows
+    dense = Params(a=(before[3], [1.0, 1.0]))
+    fresh = type(opt)(lr=0.1, **({"momentum": 0.9} if isinstance(opt, GD) else {}))
+    fresh.step(dense)
+    fresh.step(dense)
+    assert np.allclose(f.params["w"][3], dense.params["a"])
+
+
+def test_embedding_training():
+    rng = np.random.default_rng(0)
+    ids = rng.integers(0, 50, 400)
+    target = np.linspace(-1, 1, 50)[ids, None]
+    data = Data(ids, target, shuffle=False)
+    dl = Dataloader(data, Sampler(data, 40))
+    emb = Embedding(50, 1, rng=0)
+    learner = Learner(Adam(lr=0.1), MSE(), emb, 60)
+    assert learner.train_loop(dl) < 1e-3
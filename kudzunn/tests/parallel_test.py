@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from kudzunn import parallel
+from kudzunn.data import Data
+from kudzunn.function import Embedding, ZeroBiasAffine
+from kudzunn.loss import MSE
+from kudzunn.optim import GD, Adam
+from kudzunn.parallel import SharedParams, train_async
+from kudzunn.train import Learner
+
+
+def make_data():
+    x = np.linspace(-1, 1, 200)
+    return Data(x, 2.0 * x)
+
+
+def test_shared_params_roundtrip():
+    f = ZeroBiasAffine(winit=1.5)
+    with SharedParams(f) as shared:
+        worker = ZeroBiasAffine(winit=0.0)
+        arrays = shared.attach(worker)
+        assert isinstance(worker.params["w"], np.memmap)
+        arrays["w"] -= 0.5
+        shared.load(f)
+    assert f.params["w"] == 1.0 and isinstance(f.params["w"], float)
+
+
+def test_gd_inplace_updates_shared_array():
+    f = ZeroBiasAffine(winit=1.0, wgrad=2.0)
+    with SharedParams(f) as shared:
+        arrays = shared.attach(f)
+        GD(lr=0.25, inplace=True).step(f)
+        assert f.params["w"] is arrays["w"]
+        assert np.load(shared.paths["w"]) == 0.5
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+@pytest.mark.parametrize("sync_every", [None, 3])
+def test_train_async(workers, sync_every):
+    learner = Learner(GD(0.2), MSE(), ZeroBiasAffine(winit=0.0), 20)
+    losses = train_async(
+        learner, make_data(), bs=10, workers=workers, sync_every=sync_every, seed=0
+    )
+    assert len(losses) == max(workers, 1)
+    assert np.isclose(learner.func.params["w"], 2.0, atol=1e-3)
+    assert isinstance(learner.func.params["w"], float)
+
+
+def test_train_async_sparse_rows():
+    ids = np.arange(400) % 40
+    data = Data(ids, np.linspace(-1, 1, 40)[ids, None])
+    learner = Learner(GD(0.5), MSE(), Embedding(40, 1, winit=np.zeros(40)), 30)
+    train_async(learner, data, bs=20, workers=2, seed=0)
+    assert np.allclose(learner.func.params["w"][:, 0], np.linspace(-1, 1, 40))
+
+
+def test_hogwild_needs_inplace_optimizer():
+    learner = Learner(Adam(), MSE(), ZeroBiasAffine(winit=0.0), 1)
+    with pytest.raises(TypeError):
+        train_async(learner, make_data(), bs=10, workers=0)
+    # bounded staleness works with any optimizer
+    train_async(learner, make_data(), bs=10, workers=0, sync_every=2)
+
+
+def test_in_process_keeps_global_lock():
+    learner = Learner(GD(0.1), MSE(), ZeroBiasAffine(winit=0.0), 2)
+    train_async(learner, make_data(), bs=10, workers=0, sync_every=2)
+    assert parallel._LOCK is None
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from kudzunn.readers import (
+    ColumnarReader,
+    CSVReader,
+    Prefetcher,
+    StreamingDataloader,
+    write_columnar,
+)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "data.csv"
+    rows = [f"{i},{2 * i},{i % 3}" for i in range(25)]
+    path.write_text("x,y,z\n" + "\n".join(rows) + "\n")
+    return path
+
+
+def test_csv_chunks(csv_path):
+    reader = CSVReader(csv_path, columns=["x", "y"], chunksize=10, header=True)
+    chunks = list(reader)
+    assert [len(c["x"]) for c in chunks] == [10, 10, 5]
+    assert np.array_equal(np.concatenate([c["y"] for c in chunks]), 2 * np.arange(25))
+
+
+def test_csv_named_columns_need_header(csv_path):
+    with pytest.raises(ValueError, match="header=True"):
+        CSVReader(csv_path, columns=["x"])
+    with pytest.raises(ValueError, match="No column"):
+        CSVReader(csv_path, columns=["w"], header=True)
+
+
+def test_csv_cache(csv_path, tmp_path):
+    cache = tmp_path / "cache"
+    reader = CSVReader(csv_path, [0, 2], chunksize=10, header=True, cache_dir=cache)
+    assert not reader.cached
+    first = np.concatenate([c["z"] for c in reader])
+    assert reader.cached
+    column = np.load(cache / next(cache.iterdir()).name / "z.npy")
+    assert np.array_equal(column, np.arange(25) % 3)
+    second = list(reader)
+    assert np.array_equal(np.concatenate([c["z"] for c in second]), first)
+    assert isinstance(second[0]["z"], np.memmap)
+
+
+def test_columnar_roundtrip(tmp_path):
+    write_columnar(tmp_path / "cols", {"a": np.arange(7.0), "b": np.ones(7)})
+    chunks = list(ColumnarReader(tmp_path / "cols", ["a"], chunksize=3))
+    assert [list(c) for c in chunks] == [["a"]] * 3
+    assert np.array_equal(np.concatenate([c["a"] for c in chunks]), np.arange(7.0))
+
+
+def test_prefetcher_reraises():
+    def broken():
+        yield 1
+        raise RuntimeError("parse error")
+
+    with pytest.raises(RuntimeError):
+        list(Prefetcher(broken()))
+
+
+def test_streaming_dataloader(csv_path):
+    reader = CSVReader(csv_path, ["x", "y"], chunksize=7, header=True)
+    dl = StreamingDataloader(reader, "x", "y", bs=4, shuffle=True, rng=0)
+    batches = list(dl)
+    assert [len(b[0]) for b in batches] == [4] * 6 + [1]
+    xs = np.concatenate([b[0] for b in batches])
+    ys = np.concatenate([b[1] for b in batches])
+    assert np.array_equal(ys, 2 * xs)
+    assert sorted(xs) == list(range(25))
+    assert dl.current_batch == 7
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from kudzunn.function import Embedding, Function, Sequential, Tanh, ZeroBiasAffine
+from kudzunn.optim import GD
+from kudzunn.serialize import ALIGN, load, load_params, read_header, save
+
+
+class Table(Function):
+    def __init__(self) -> None:
+        super().__init__()
+        self.params["table"] = np.arange(12, dtype=np.float32).reshape(3, 4)
+        self.params["bias"] = np.ones(5)
+        self.grads["table"] = np.zeros((3, 4), dtype=np.float32)
+        self.grads["bias"] = np.zeros(5)
+
+
+def test_save_load_scalar(tmp_path):
+    path = tmp_path / "zba.kzn"
+    save(ZeroBiasAffine(winit=1.5), path)
+    f = load(path, ZeroBiasAffine(winit=0.1))
+    assert f.params["w"] == 1.5
+    assert np.allclose(f(np.ones(3)), 1.5)
+
+
+def test_load_is_copy_on_write_memmap(tmp_path):
+    path = tmp_path / "table.kzn"
+    save(Table(), path)
+    header = read_header(path)
+    params = load_params(path)
+    assert isinstance(params["table"], np.memmap)
+    assert params["table"].dtype == np.float32
+    assert np.array_equal(params["table"], Table().params["table"])
+    assert np.array_equal(params["bias"], np.ones(5))
+    for entry in header["params"]:
+        assert (header["start"] + entry["offset"]) % ALIGN == 0
+
+
+def test_loaded_params_train_in_place(tmp_path):
+    path = tmp_path / "embedding.kzn"
+    save(Embedding(6, 2, rng=0), path)
+    before = load_params(path)["w"].copy()
+    func = load(path, Embedding(6, 2))
+    func(np.array([1, 4]))
+    func.backward(np.ones((2, 2)))
+    GD(0.5).step(func)
+    assert np.allclose(func.params["w"][[1, 4]], before[[1, 4]] - 0.5)
+    # the file is untouched
+    assert np.array_equal(load_params(path)["w"], before)
+
+
+def test_load_without_mmap(tmp_path):
+    path = tmp_path / "table.kzn"
+    save(Table(), path)
+    params = load_params(path, mmap=False)
+    assert not isinstance(params["table"], np.memmap)
+    assert np.array_equal(params["table"], Table().params["table"])
+
+
+def test_load_wrong_class(tmp_path):
+    path = tmp_path / "table.kzn"
+    save(Table(), path)
+    with pytest.raises(ValueError):
+        load(path, ZeroBiasAffine())
+
+
+def test_load_other_architecture(tmp_path):
+    path = tmp_path / "zba.kzn"
+    save(ZeroBiasAffine(replicas=3), path)
+    with pytest.raises(ValueError, match="parameters"):
+        load(path, ZeroBiasAffine(replicas=2))
+    with pytest.raises(ValueError, match="parameters"):
+        load(path, ZeroBiasAffine())
+    path = tmp_path / "seq.kzn"
+    save(Sequential(ZeroBiasAffine(), Tanh()), path)
+    with pytest.raises(ValueError, match="parameters"):
+        load(path, Sequential(ZeroBiasAffine(), Tanh(), ZeroBiasAffine()))
+    with pytest.raises(ValueError, match="parameters"):
+        load(path, Sequential(Tanh(), ZeroBiasAffine()))
+    assert load(path, Sequential(ZeroBiasAffine(), Tanh())) is not None
+
+
+def test_load_not_a_model(tmp_path):
+    path = tmp_path / "junk.kzn"
+    path.write_bytes(b"not a model file at all")
+    with pytest.raises(ValueError):
+        load_params(path)
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import Linear
+from kudzunn.gradcheck import gradcheck
+from kudzunn.loss import MSE
+from kudzunn.optim import GD, LBFGS
+from kudzunn.sparse import CSRMatrix, SparseGrad
+from kudzunn.train import Learner
+
+
+def random_dense(rng, shape=(8, 20), density=0.2):
+    dense = rng.standard_normal(shape)
+    dense[rng.random(shape) > density] = 0.0
+    dense[3] = 0.0  # an empty row
+    return dense
+
+
+def test_csr_roundtrip_and_rows():
+    rng = np.random.default_rng(0)
+    dense = random_dense(rng)
+    X = CSRMatrix.from_dense(dense)
+    assert X.shape == (8, 20) and len(X) == 8
+    assert np.array_equal(X.toarray(), dense)
+    idx = np.array([5, 3, 0, 5])
+    assert np.array_equal(X[idx].toarray(), dense[idx])
+    assert np.array_equal(X[2:6].toarray(), dense[2:6])
+
+
+def test_csr_negative_rows():
+    rng = np.random.default_rng(0)
+    dense = random_dense(rng)
+    X = CSRMatrix.from_dense(dense)
+    assert np.array_equal(X[-1].toarray(), dense[[-1]])
+    idx = np.array([-1, 0, -8, -5])
+    assert np.array_equal(X[idx].toarray(), dense[idx])
+    assert np.array_equal(X[-3:].toarray(), dense[-3:])
+
+
+def test_csr_rows_out_of_range_and_in_data():
+    rng = np.random.default_rng(0)
+    dense = random_dense(rng)
+    X = CSRMatrix.from_dense(dense)
+    for bad in (8, -9, [0, 8]):
+        with pytest.raises(IndexError):
+            X[bad]
+    # the rows Data and the Dataloader batch with
+    data = Data(X, np.arange(8.0), shuffle="index", rng=0)
+    x, y = data[np.array([-1, -2])]
+    assert np.array_equal(x.toarray(), dense[data.starts[[-1, -2]]])
+    assert np.array_equal(y, data.starts[[-1, -2]])
+
+
+def test_csr_products():
+    rng = np.random.default_rng(0)
+    dense = random_dense(rng)
+    X = CSRMatrix.from_dense(dense)
+    for shape in [(20,), (20, 3)]:
+        w = rng.standard_normal(shape)
+        assert np.allclose(X.dot(w), dense @ w)
+    for shape in [(8,), (8, 3)]:
+        g = rng.standard_normal(shape)
+        product = X.tdot(g)
+        assert isinstance(product, SparseGrad)
+        assert np.array_equal(product.rows, np.unique(np.nonzero(dense)[1]))
+        assert np.allclose(product.toarray(), dense.T @ g)
+
+
+def test_from_coo_sums_duplicates():
+    X = CSRMatrix.from_coo(
+        np.array([1, 0, 1]), np.array([2, 0, 2]), np.array([1.0, 2.0, 3.0]), (2, 4)
+    )
+    assert np.array_equal(X.toarray(), [[2.0, 0, 0, 0], [0, 0, 4.0, 0]])
+
+
+@pytest.mark.parametrize("n_out", [None, 3])
+def test_linear_sparse_matches_dense(n_out):
+    rng = np.random.default_rng(0)
+    dense = random_dense(rng)
+    sparse_f, dense_f = Linear(20, n_out, rng=1), Linear(20, n_out, rng=1)
+    out = sparse_f(CSRMatrix.from_dense(dense))
+    assert np.allclose(out, dense_f(dense))
+    grad = rng.standard_normal(out.shape)
+    assert sparse_f.backward(grad) is None
+    dense_f.backward(grad)
+    assert isinstance(sparse_f.grads["w"], SparseGrad)
+    assert np.allclose(sparse_f.grads["w"].toarray(), dense_f.grads["w"])
+    assert np.allclose(sparse_f.grads["b"], dense_f.grads["b"])
+    assert gradcheck(Linear(20, n_out, rng=1), CSRMatrix.from_dense(dense), rng=0)
+    assert gradcheck(Linear(20, n_out, rng=1), dense, rng=0)
+
+
+@pytest.mark.parametrize(
+    "settings", [{}, {"weight_decay": 0.1}, {"clip_norm": 0.1, "l1": 0.01}]
+)
+def test_gd_sparse_step_touches_rows(settings):
+    rng = np.random.default_rng(0)
+    dense = random_dense(rng)
+    sparse_f, dense_f = Linear(20, rng=1), Linear(20, rng=1)
+    before = sparse_f.params["w"].copy()
+    grad = rng.standard_normal(8)
+    sparse_f(CSRMatrix.from_dense(dense))
+    sparse_f.backward(grad)
+    dense_f(dense)
+    dense_f.backward(grad)
+    touched = sparse_f.grads["w"].rows
+    GD(0.1, **settings).step(sparse_f)
+    untouched = np.setdiff1d(np.arange(20), touched)
+    assert np.array_equal(sparse_f.params["w"][untouched], before[untouched])
+    # on the touched rows, lazy regularization matches the dense step
+    GD(0.1, **settings).step(dense_f)
+    assert np.allclose(sparse_f.params["w"][touched], dense_f.params["w"][touched])
+
+
+def test_sparse_training():
+    rng = np.random.default_rng(0)
+    X = CSRMatrix.from_coo(
+        np.repeat(np.arange(200), 3),
+        rng.integers(0, 1000, 600),
+        np.ones(600),
+        (200, 1000),
+    )
+    truth = rng.standard_normal(1000)
+    data = Data(X, X.dot(truth), shuffle="index", rng=0)
+    dl = Dataloader(data, Sampler(data, 20))
+    batch, _ = next(iter(dl))
+    assert isinstance(batch, CSRMatrix) and batch.shape == (20, 1000)
+    func = Linear(1000, bias=False, winit=np.zeros(1000))
+    learner = Learner(GD(0.5), MSE(), func, 100)
+    assert learner.train_loop(dl) < 1e-2
+    with pytest.raises(ValueError):
+        Data(X, X.dot(truth), shuffle="inplace")
+
+
+def test_lbfgs_densifies_sparse_grads():
+    rng = np.random.default_rng(0)
+    dense = random_dense(rng)
+    func = Linear(20, rng=1)
+    func(CSRMatrix.from_dense(dense))
+    func.backward(rng.standard_normal(8))
+    LBFGS().step(func)
+    assert func.params["w"].shape == (20,)
@@ -0,0 +1,77 @@
+import numpy as np
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import ZeroBiasAffine
+from kudzunn.loss import MSE
+from kudzunn.optim import GD
+from kudzunn.parallel import SharedData
+from kudzunn.sweep import grid, loguniform, random_search, run_sweep
+from kudzunn.train import Learner
+
+
+def make_data():
+    x = np.linspace(-1, 1, 40)
+    return Data(x, 2.0 * x)
+
+
+def test_grid():
+    configs = grid(lr=[0.1, 0.01], batch_size=[4, 8, 16])
+    assert len(configs) == 6
+    assert {"lr": 0.01, "batch_size": 16} in configs
+
+
+def test_random_search():
+    space = {"lr": loguniform(1e-3, 1e-1), "batch_size": [4, 8]}
+    configs = random_search(space, 5, seed=0)
+    assert configs == random_search(space, 5, seed=0)
+    for config in configs:
+        assert 1e-3 <= config["lr"] <= 1e-1
+        assert config["batch_size"] in (4, 8)
+
+
+def test_shared_data_is_readonly_map():
+    with SharedData(make_data()) as shared:
+        data = shared.data()
+        assert isinstance(data.x, np.memmap)
+        assert not data.x.flags.writeable
+        assert np.array_equal(data.y, make_data().y)
+
+
+def test_run_sweep_parallel():
+    configs = grid(lr=[0.5, 1e-6], batch_size=[10], epochs=[50])
+    table = run_sweep(make_data(), configs, workers=2, patience=3)
+    assert [row["lr"] for row in table] == [0.5, 1e-6]
+    best = table[0]
+    assert best["best_loss"] < 1e-6
+    assert best["stopped_early"] and best["epochs_run"] < 50
+    assert all(row["seconds"] > 0 for row in table)
+
+
+def test_run_sweep_serial():
+    configs = grid(lr=[0.5], epochs=[5])
+    table = run_sweep(make_data(), configs, workers=0)
+    assert table[0]["epochs_run"] == 5 and not table[0]["stopped_early"]
+
+
+def test_run_sweep_seeded_is_reproducible():
+    configs = grid(lr=[0.1, 0.01], batch_size=[7], epochs=[3])
+    serial = run_sweep(make_data(), configs, workers=0, seed=4)
+    parallel = run_sweep(make_data(), configs, workers=2, seed=4)
+    for a, b in zip(serial, parallel):
+        assert a["final_loss"] == b["final_loss"]
+
+
+def replicated_build(config, data, rng):
+    func = ZeroBiasAffine(replicas=2, rng=rng)
+    learner = Learner(GD(np.array([0.5, 1e-6])), MSE(replicas=True), func, 3)
+    return learner, Dataloader(data, Sampler(data, 10, rng=rng))
+
+
+def test_run_sweep_edge_cases():
+    table = run_sweep(make_data(), grid(lr=[0.5], epochs=[0, 2]), workers=0)
+    assert table[0]["epochs"] == 2 and table[1]["epochs"] == 0
+    assert np.isnan(table[1]["final_loss"]) and np.isnan(table[1]["best_loss"])
+    assert table[1]["epochs_run"] == 0
+    table = run_sweep(make_data(), [{}], build=replicated_build, workers=0)
+    losses = table[0]["best_loss"]
+    assert isinstance(losses, list) and len(losses) == 2
+    assert losses[0] < losses[1]
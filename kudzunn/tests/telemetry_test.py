@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import urllib.request
+import numpy as np
+import pytest
+from kudzunn.callbacks import Callback
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import ZeroBiasAffine
+from kudzunn.loss import MSE
+from kudzunn.optim import GD
+from kudzunn.readers import CSVReader, Prefetcher, StreamingDataloader
+from kudzunn.telemetry import (
+    CONTENT_TYPE,
+    Histogram,
+    TelemetryCallback,
+    queue_depth,
+    rss_bytes,
+)
+from kudzunn.train import Learner
+
+
+def parse(text):
+    "sample name with labels -> value, checking every sample has a TYPE"
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE"):
+            _, _, name, kind = line.split()
+            types[name] = kind
+        elif not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            assert any(key.startswith(name) for name in types)
+            samples[key] = float(value)
+    return samples, types
+
+
+def make_learner(epochs=3, **settings):
+    x = np.linspace(-1, 1, 40)
+    data = Data(x, 2.0 * x)
+    dl = Dataloader(data, Sampler(data, 8))
+    learner = Learner(GD(0.1, **settings), MSE(), ZeroBiasAffine(winit=0.0), epochs)
+    return learner, dl
+
+
+def test_histogram():
+    h = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 3.0):
+        h.observe(value)
+    assert h.buckets() == [(0.1, 2), (1.0, 3), (np.inf, 4)]
+    assert h.count == 4 and np.isclose(h.sum, 3.65)
+
+
+def test_render_and_textfile(tmp_path):
+    path = str(tmp_path / "kudzunn.prom")
+    learner, dl = make_learner()
+    telemetry = TelemetryCallback(learner, path=path, labels={"job": 'a "b"'})
+    learner.set_callbacks([telemetry])
+    learner.train_loop(dl)
+    assert os.listdir(tmp_path) == ["kudzunn.prom"]
+    with open(path) as f:
+        samples, types = parse(f.read())
+    label = '{job="a \\"b\\""}'
+    assert types["kudzunn_batch_latency_seconds"] == "histogram"
+    assert types["kudzunn_samples_total"] == "counter"
+    assert samples[f"kudzunn_samples_total{label}"] == 120
+    assert samples[f"kudzunn_batches_total{label}"] == 15
+    assert samples[f"kudzunn_epochs_total{label}"] == 3
+    assert samples[f"kudzunn_samples_per_second{label}"] > 0
+    assert samples[f"kudzunn_rss_bytes{label}"] > 0
+    assert np.isclose(samples[f"kudzunn_loss{label}"], telemetry.loss)
+    norm = abs(learner.func.grads["w"])
+    assert np.isclose(samples[f"kudzunn_grad_norm{label}"], norm)
+    inf = '{job="a \\"b\\"",le="+Inf"}'
+    assert samples[f"kudzunn_batch_latency_seconds_bucket{inf}"] == 15
+    assert samples[f"kudzunn_batch_latency_seconds_count{label}"] == 15
+    assert "kudzunn_loader_queue_depth" not in types
+
+
+def test_grad_norm_from_optimizer():
+    learner, dl = make_learner(clip_norm=1e-3)
+    telemetry = TelemetryCallback(learner)
+    learner.set_callbacks([telemetry])
+    learner.train_loop(dl)
+    assert telemetry.grad_norm == learner.opt.grad_norm
+
+
+class Scraper(Callback):
+    "fetches the served metrics in the middle of training"
+
+    def __init__(self, learner, telemetry):
+        super().__init__(learner)
+        self.telemetry = telemetry
+        self.pages = []
+
+    def epoch_end(self):
+        host, port = self.telemetry.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            self.pages.append(response.read().decode())
+        return True
+
+
+def test_http_endpoint(tmp_path):
+    path = tmp_path / "data.csv"
+    rows = [f"{i},{2 * i}" for i in range(50)]
+    path.write_text("x,y\n" + "\n".join(rows) + "\n")
+    reader = CSVReader(path, ["x", "y"], chunksize=10, header=True, prefetch=2)
+    dl = StreamingDataloader(reader, "x", "y", bs=5)
+    learner = Learner(GD(0.001), MSE(), ZeroBiasAffine(winit=0.0), 2)
+    telemetry = TelemetryCallback(learner, port=0, loader=dl)
+    scraper = Scraper(learner, telemetry)
+    learner.set_callbacks([telemetry, scraper])
+    learner.train_loop(dl)
+    assert telemetry.address is None
+    samples, types = parse(scraper.pages[-1])
+    assert samples["kudzunn_batches_total"] == 20
+    assert types["kudzunn_loader_queue_depth"] == "gauge"
+    assert 0 <= samples["kudzunn_loader_queue_depth"] <= 2
+    assert np.isfinite(samples["kudzunn_grad_norm"])
+
+
+class Failing(Callback):
+    def batch_end(self):
+        raise RuntimeError("diverged")
+
+
+def test_close_after_failed_training():
+    learner, dl = make_learner()
+    with TelemetryCallback(learner, port=0) as telemetry:
+        learner.set_callbacks([telemetry, Failing(learner)])
+        with pytest.raises(RuntimeError):
+            learner.train_loop(dl)
+        assert telemetry.address is not None
+    assert telemetry.address is None
+    telemetry.close()
+
+
+def test_rss_bytes_without_proc_or_resource(monkeypatch):
+    assert rss_bytes() > 0
+
+    def no_proc(*args, **kwargs):
+        raise OSError
+
+    monkeypatch.setattr("builtins.open", no_proc)
+    assert rss_bytes() > 0
+    monkeypatch.setitem(sys.modules, "resource", None)
+    assert np.isnan(rss_bytes())
+
+
+def test_queue_depth():
+    assert queue_depth(None) is None
+    learner, dl = make_learner()
+    assert queue_depth(dl) is None
+    loader = Prefetcher(range(5), depth=3)
+    while loader.qsize() < 3:
+        time.sleep(0.001)
+    assert queue_depth(loader) == 3
+    assert list(loader) == [0, 1, 2, 3, 4]
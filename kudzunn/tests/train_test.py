@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from kudzunn.data import Data, Dataloader, Sampler
+from kudzunn.function import Linear, ZeroBiasAffine
+from kudzunn.loss import MAE, MSE
+from kudzunn.optim import GD
+from kudzunn.sparse import CSRMatrix
+from kudzunn.train import Learner
+
+
+def make_loader():
+    x = np.linspace(-1, 1, 30)
+    data = Data(x, 2.0 * x)
+    return Dataloader(data, Sampler(data, 10))
+
+
+def test_train_replicas_matches_separate_runs():
+    lrs = np.array([0.01, 0.1, 0.5])
+    winits = np.array([-1.0, 0.5, 3.0])
+    func = ZeroBiasAffine(replicas=3)
+    func.params["w"] = winits.copy()
+    learner = Learner(GD(lrs), MSE(replicas=True), func, 20)
+    losses = learner.train_loop(make_loader())
+    assert losses.shape == (3,)
+    for k in range(3):
+        single = ZeroBiasAffine(winit=winits[k])
+        loss = Learner(GD(lrs[k]), MSE(), single, 20).train_loop(make_loader())
+        assert np.isclose(func.params["w"][k], single.params["w"])
+        assert np.isclose(losses[k], loss)
+
+
+@pytest.mark.parametrize("method", ["normal", "qr"])
+def test_fit_exact(method):
+    x = np.linspace(-1, 1, 30)
+    y = 2.0 * x + np.sin(7 * x)
+    data = Data(x, y)
+    dl = Dataloader(data, Sampler(data, 7))
+    func = ZeroBiasAffine(winit=0.0)
+    loss = Learner(GD(), MSE(), func, 1).fit_exact(dl, method=method)
+    w = (x @ y) / (x @ x)
+    assert np.isclose(func.params["w"], w)
+    assert np.isclose(loss, np.mean((w * x - y) ** 2))
+
+
+@pytest.mark.parametrize("method", ["normal", "qr"])
+@pytest.mark.parametrize("n_out", [None, 2])
+@pytest.mark.parametrize("sparse", [False, True])
+def test_fit_exact_linear(method, n_out, sparse):
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((40, 3))
+    x[x < 0] = 0.0
+    shape = (3,) if n_out is None else (3, n_out)
+    y = x @ rng.standard_normal(shape) + 0.5
+    y += 0.01 * rng.standard_normal(y.shape)
+    data = Data(CSRMatrix.from_dense(x) if sparse else x, y)
+    func = Linear(3, n_out, rng=1)
+    loss = Learner(GD(), MSE(), func, 1).fit_exact(
+        Dataloader(data, Sampler(data, 9)), method=method
+    )
+    X = np.column_stack((x, np.ones(40)))
+    coef = np.linalg.lstsq(X, y, rcond=None)[0]
+    assert np.allclose(func.params["w"], coef[:3])
+    assert np.allclose(func.params["b"], coef[3])
+    assert np.isclose(loss, np.mean((func(x) - y) ** 2))
+    nobias = Linear(3, n_out, bias=False, rng=1)
+    Learner(GD(), MSE(), nobias, 1).fit_exact(Dataloader(data, Sampler(data, 9)))
+    assert np.allclose(nobias.params["w"], np.linalg.lstsq(x, y, rcond=None)[0])
+
+
+def test_fit_exact_needs_mse():
+    learner = Learner(GD(), MAE(), ZeroBiasAffine(), 1)
+    with pytest.raises(TypeError):
+        learner.fit_exact(make_loader())
@@ -1,8 +1,10 @@
+import numpy as np
 from kudzunn.optim import Optimizer
-from kudzunn.loss import Loss
+from kudzunn.loss import MSE, Loss
 from kudzunn.function import Function
 from kudzunn.callbacks import Callback
 from kudzunn.data import Dataloader
+from kudzunn.fused import FusedStep
 from typing import List
 
 
@@ -14,21 +16,39 @@ class Learner:
     Parameters
     ----------
     opt: Optimizer
-        optim to use. currently only an instance of `GD()`
+        optim to use, e.g. `GD()`, `Adam()` or `LBFGS()`
     loss: Loss
         the class representing the loss function
     func: Function
-        currently the function in this 1-layer network
+        the function to train, a single layer or a `Sequential`
     epochs: int
         The number of epochs to train the model
+    fused: bool
+        Run forward, loss and backward as one kernel per batch when there
+        is one for the function and loss (see `kudzunn.fused.FusedStep`),
+        compiled by numba if it is installed (the `jit` extra). Other
+        combinations train as usual. Only the gradient computation is
+        fused: the optimizer step still runs separately afterwards, so
+        every optimizer works. The hooks fire in the usual order, but the
+        gradient is computed before `after_loss`.
     """
 
-    def __init__(self, opt: Optimizer, loss: Loss, func: Function, epochs: int) -> None:
+    def __init__(
+        self,
+        opt: Optimizer,
+        loss: Loss,
+        func: Function,
+        epochs: int,
+        fused: bool = False,
+    ) -> None:
         self.loss = loss
         self.func = func
         self.opt = opt
         self.epochs = epochs
+        self.fused = fused
         self.cbs: List[Callback] = []
+        # Callbacks set this to end training after the current epoch
+        self.stop = False
 
     def set_callbacks(self, cblist: List[Callback]) -> None:
         """
@@ -72,7 +92,8 @@ class Learner:
         The calculation of the loss, and then the backpropagation,
         and finally the optimizer step.
 
-        Callbacks are run at appropriate spots.
+        Callbacks are run at appropriate spots. A callback can end
+        training early by setting `stop` on the learner.
 
         Parameters
         ----------
@@ -82,27 +103,101 @@ class Learner:
         Returns
         -------
         finalloss: float
-            loss at end of all the epochs
+            loss at end of all the epochs, NaN if no batch ran
         """
+        self.stop = False
+        # returned as is when there are no epochs or batches
+        epochloss = np.nan
+        fused = None
+        if self.fused and FusedStep.applies(self.func, self.loss):
+            fused = FusedStep(self.func, self.loss)
         self("fit_start")
         for epoch in range(self.epochs):
             self("epoch_start", epoch)
             for inputs, targets in dl:
                 self("batch_start", dl.current_batch)
-                # make predictions
-                predicted = self.func(inputs)
-
-                # actual loss value
-                epochloss = self.loss(predicted, targets)
-                self("after_loss", epochloss)
-
-                # calculate gradient
-                intermed = self.loss.backward(predicted, targets)
-                self.func.backward(intermed)
+                if fused is not None and fused.accepts(inputs, targets):
+                    # predictions, loss and gradient in one kernel
+                    predicted, epochloss = fused(inputs, targets)
+                    self.predicted, self.targets = predicted, targets
+                    self("after_loss", epochloss)
+                else:
+                    # make predictions
+                    predicted = self.func(inputs)
+
+                    # kept for callbacks, e.g. metrics
+                    self.predicted, self.targets = predicted, targets
+
+                    # actual loss value
+                    epochloss = self.loss(predicted, targets)
+                    self("after_loss", epochloss)
+
+                    # calculate gradient
+                    intermed = self.loss.backward(predicted, targets)
+                    self.func.backward(intermed)
+                self("after_backward")
 
                 # update parameter with gradient
                 self.opt.step(self.func)
                 self("batch_end")
             self("epoch_end")
+            if self.stop:
+                break
         self("fit_end")
         return epochloss
+
+    def fit_exact(self, dl: Dataloader, method: str = "normal") -> float:
+        """
+        Solve for the parameters directly instead of iterating epochs.
+
+        Only for linear functions (those with `design` and `set_solution`:
+        `ZeroBiasAffine` and `Linear`, dense or sparse) under the `MSE`
+        loss. Use an iterative
+        optimizer such as `LBFGS` for other smooth losses.
+
+        Parameters
+        ----------
+        dl: DataLoader
+            The data, visited once
+        method: str
+            "normal" accumulates the sufficient statistics X^T X, X^T y and
+            y^T y batch by batch, so memory does not grow with the data,
+            and solves the normal equations. "qr" stacks the design matrix
+            and solves by QR, which is better conditioned but holds all the
+            data in memory.
+
+        Returns
+        -------
+        finalloss: float
+            The MSE at the solution
+        """
+        if not (isinstance(self.loss, MSE) and hasattr(self.func, "design")):
+            raise TypeError("fit_exact needs a linear function and the MSE loss")
+        if method not in ("normal", "qr"):
+            raise ValueError(f"Unknown method {method}")
+        self("fit_start")
+        xtx, xty, yty, n = 0.0, 0.0, 0.0, 0
+        blocks, targets = [], []
+        for inputs, y in dl:
+            X = self.func.design(inputs)
+            if method == "qr":
+                blocks.append(X)
+                targets.append(y)
+            else:
+                xtx = xtx + X.T @ X
+                xty = xty + X.T @ y
+            yty = yty + np.sum(y * y)
+            n += len(y)
+        if method == "qr":
+            Q, R = np.linalg.qr(np.concatenate(blocks))
+            y = np.concatenate(targets)
+            coef = np.linalg.solve(R, Q.T @ y)
+            finalloss = np.sum((Q @ (Q.T @ y) - y) ** 2) / y.size
+        else:
+            coef = np.linalg.solve(xtx, xty)
+            # ||X c - y||^2 = y.y - 2 c.X^T y + c.X^T X c
+            sse = yty - 2 * np.sum(coef * xty) + np.sum(coef * (xtx @ coef))
+            finalloss = max(float(sse), 0.0) / (n * (np.size(xty) // len(coef)))
+        self.func.set_solution(coef)
+        self("fit_end")
+        return finalloss
@@ -13,6 +13,8 @@ setup_requirements = [
 ]
 
 test_requirements = [
+    # a non-NumPy namespace for the kudzunn.backend conformance tests
+    "array-api-strict",
     "black>=19.10b0",
     "codecov>=2.1.4",
     "flake8>=3.8.3",
@@ -39,12 +41,14 @@ dev_requirements = [
     "numpy",
 ]
 
-requirements = ["numpy"]
+requirements = ["numpy", 'tomli; python_version < "3.11"']
 
 extra_requirements = {
     "setup": setup_requirements,
     "test": test_requirements,
     "dev": dev_requirements,
+    # compiles the fused training kernels of kudzunn.fused
+    "jit": ["numba"],
     "all": [
         *requirements,
         *dev_requirements,
@@ -65,7 +69,11 @@ setup(
     ],
     description="Neural Network library for Learning",
     entry_points={
-        "console_scripts": ["my_example=kudzunn.bin.my_example:main"],
+        "console_scripts": [
+            "my_example=kudzunn.bin.my_example:main",
+            "kudzunn-train=kudzunn.bin.train:main",
+            "kudzunn-bench-fused=kudzunn.bin.bench_fused:main",
+        ],
     },
     install_requires=requirements,
     license="MIT license",